@@ -0,0 +1,305 @@
+"""
+Topic analytics over classified traffic.
+
+Usage:
+    python analytics.py backfill                    # parse responses already in the conversation store
+    python analytics.py top topic --days 7 -n 20    # most frequent topics of the last week
+    python analytics.py summary --user user_20250320080831
+
+Each classification is parsed once, when it is recorded: its routing fields
+go into a `classifications` fact table and a set of per-day, per-user
+counters (topic, sub-topic, core topic, category, agent, scope) is
+incremented in the same transaction. Classifications are keyed by the id
+of their turn in the conversation store, so a backfill skips turns that
+were already recorded live. Dashboard queries read the counters
+through their primary key, so they never rescan raw JSON and their cost
+depends on the number of distinct values, not on the amount of traffic.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_PATH = os.path.join("conversations", "analytics.db")
+
+# Counter dimensions and the response field each one is read from
+DIMENSIONS = {
+    "topic": "topics",
+    "sub_topic": "sub-topics",
+    "core_topic": "core_topic",
+    "category": "query_category",
+    "target": "target",
+    "agent": "next_agent",
+    "scope": "is_in_upsc_scope",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    turn_id INTEGER,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    core_topic TEXT,
+    query_category TEXT,
+    target TEXT,
+    next_agent TEXT,
+    in_scope INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_classifications_day ON classifications(day);
+CREATE INDEX IF NOT EXISTS idx_classifications_user_day ON classifications(user_id, day);
+
+CREATE TABLE IF NOT EXISTS counters (
+    dimension TEXT NOT NULL,
+    day TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, day, user_id, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_counters_user ON counters(user_id, dimension, day);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def _values(response: Dict[str, Any], field: str) -> List[str]:
+    """Normalized values of one response field (lists are flattened, booleans become in/out)."""
+    value = response.get(field)
+    if field == "is_in_upsc_scope":
+        return ["in" if value else "out"] if isinstance(value, bool) else []
+    values = value if isinstance(value, list) else [value]
+    return [v.strip()[:80] for v in values if isinstance(v, str) and v.strip()]
+
+
+class AnalyticsStore:
+    """
+    SQLite store of parsed classifications with incrementally maintained counters.
+    """
+    def __init__(self, path: str = DEFAULT_ANALYTICS_PATH):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Stores created before classifications were keyed by turn lack the column
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(classifications)")]
+        if "turn_id" not in columns:
+            self._db.execute("ALTER TABLE classifications ADD COLUMN turn_id INTEGER")
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_classifications_turn ON classifications(turn_id)")
+        self._db.commit()
+
+    def record(self, user_id: str, response: Dict[str, Any], timestamp: Optional[float] = None,
+               turn_id: Optional[int] = None) -> bool:
+        """
+        Parse one classification and fold it into the aggregates.
+
+        Args:
+            user_id: User who sent the query
+            response: Parsed classifier response
+            timestamp: Time of the query, defaults to now
+            turn_id: Id of the assistant turn in the conversation store, if it was stored
+
+        Returns:
+            True if the response was a classification and was recorded (not already recorded for turn_id)
+        """
+        with self._lock:
+            recorded = self._record(user_id, response, timestamp or time.time(), turn_id)
+            self._db.commit()
+        return recorded
+
+    def _record(self, user_id: str, response: Dict[str, Any], timestamp: float,
+                turn_id: Optional[int] = None) -> bool:
+        if not isinstance(response, dict) or "query_category" not in response:
+            return False
+        day = _day(timestamp)
+        scope = response.get("is_in_upsc_scope")
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO classifications (turn_id, user_id, timestamp, day, core_topic, query_category, "
+            "target, next_agent, in_scope) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (turn_id, user_id, timestamp, day, response.get("core_topic"), response.get("query_category"),
+             response.get("target"), response.get("next_agent"),
+             int(scope) if isinstance(scope, bool) else None)
+        ).rowcount
+        if not inserted:
+            return False
+        self._db.executemany(
+            "INSERT INTO counters (dimension, day, user_id, value, count) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT (dimension, day, user_id, value) DO UPDATE SET count = count + 1",
+            [(dimension, day, user_id, value)
+             for dimension, field in DIMENSIONS.items() for value in set(_values(response, field))]
+        )
+        return True
+
+    def backfill(self, store) -> int:
+        """
+        Record assistant turns of a conversation store not seen by an earlier backfill.
+
+        Turns already recorded live (or by a backfill of the same store) are
+        skipped through their turn id.
+
+        Args:
+            store: ConversationStore to read
+
+        Returns:
+            Number of classifications recorded
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'backfilled_turn_id'").fetchone()
+        last_id = int(row[0]) if row else 0
+        recorded = 0
+        for turn_id, user_id, timestamp, content in store.iter_responses(after_id=last_id):
+            last_id = turn_id
+            try:
+                response = json.loads(content)
+            except ValueError:
+                continue
+            with self._lock:
+                recorded += self._record(user_id, response, timestamp, turn_id)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('backfilled_turn_id', ?)", (str(last_id),))
+            self._db.commit()
+        logger.info(f"Backfilled {recorded} classifications up to turn {last_id}")
+        return recorded
+
+    def top(self, dimension: str, user_id: Optional[str] = None, days: Optional[int] = None,
+            limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Most frequent values of a dimension.
+
+        Args:
+            dimension: One of DIMENSIONS
+            user_id: Restrict to one user, all users when None
+            days: Restrict to the last N days, all time when None
+            limit: Number of values to return
+
+        Returns:
+            List of (value, count), most frequent first
+        """
+        where, params = self._filter(dimension, user_id, days)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT value, SUM(count) AS total FROM counters WHERE {where} "
+                "GROUP BY value ORDER BY total DESC, value LIMIT ?", (*params, limit)
+            ).fetchall()
+
+    def daily(self, dimension: str, user_id: Optional[str] = None, days: Optional[int] = None,
+              values: Optional[List[str]] = None) -> List[Tuple[str, str, int]]:
+        """
+        Per-day counts of a dimension.
+
+        Args:
+            dimension: One of DIMENSIONS
+            user_id: Restrict to one user, all users when None
+            days: Restrict to the last N days, all time when None
+            values: Restrict to these values (e.g. the top topics)
+
+        Returns:
+            List of (day, value, count), oldest day first
+        """
+        where, params = self._filter(dimension, user_id, days)
+        if values:
+            where += f" AND value IN ({', '.join('?' * len(values))})"
+            params = (*params, *values)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT day, value, SUM(count) FROM counters WHERE {where} GROUP BY day, value ORDER BY day",
+                params
+            ).fetchall()
+
+    def summary(self, user_id: Optional[str] = None, days: Optional[int] = None) -> Dict[str, Any]:
+        """Classified queries, out-of-scope queries and the out-of-scope rate."""
+        scope = dict(self.top("scope", user_id, days))
+        queries = scope.get("in", 0) + scope.get("out", 0)
+        return {
+            "queries": queries,
+            "out_of_scope": scope.get("out", 0),
+            "out_of_scope_rate": scope.get("out", 0) / queries if queries else 0.0,
+            "agents": dict(self.top("agent", user_id, days)),
+        }
+
+    def _filter(self, dimension: str, user_id: Optional[str], days: Optional[int]) -> Tuple[str, tuple]:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        where, params = "dimension = ?", (dimension,)
+        if days is not None:
+            where += " AND day >= ?"
+            params = (*params, _day(time.time() - (days - 1) * 86400))
+        if user_id is not None:
+            where += " AND user_id = ?"
+            params = (*params, user_id)
+        return where, params
+
+
+_default_analytics: Optional[AnalyticsStore] = None
+_default_lock = threading.Lock()
+
+
+def get_default_analytics() -> AnalyticsStore:
+    """Get the process-wide analytics store at ZENE_ANALYTICS_PATH (default conversations/analytics.db)."""
+    global _default_analytics
+    with _default_lock:
+        if _default_analytics is None:
+            _default_analytics = AnalyticsStore(os.getenv("ZENE_ANALYTICS_PATH", DEFAULT_ANALYTICS_PATH))
+    return _default_analytics
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("ZENE_ANALYTICS_PATH", DEFAULT_ANALYTICS_PATH), help="SQLite file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill", help="Parse responses already in the conversation store")
+    backfill.add_argument("--store", default=None, help="Conversation store, defaults to ZENE_STORE_PATH")
+
+    top = subparsers.add_parser("top", help="Print the most frequent values of a dimension")
+    top.add_argument("dimension", choices=sorted(DIMENSIONS))
+    top.add_argument("--user", default=None)
+    top.add_argument("--days", type=int, default=None)
+    top.add_argument("-n", type=int, default=10)
+
+    summary = subparsers.add_parser("summary", help="Print query counts, out-of-scope rate and agents")
+    summary.add_argument("--user", default=None)
+    summary.add_argument("--days", type=int, default=None)
+
+    args = parser.parse_args()
+    analytics = AnalyticsStore(args.db)
+    if args.command == "backfill":
+        from store import ConversationStore, get_default_store
+        analytics.backfill(ConversationStore(args.store) if args.store else get_default_store())
+    elif args.command == "top":
+        for value, count in analytics.top(args.dimension, args.user, args.days, args.n):
+            print(f"{count:8d}  {value}")
+    else:
+        print(json.dumps(analytics.summary(args.user, args.days), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,13 @@
 import streamlit as st
-import json
 import os
 import pandas as pd
 from datetime import datetime
-import time
 import logging
 from main import SnowBlaze
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from cascade import CASCADE
+from chat_view import CHAT_STYLE, DEFAULT_WINDOW, chat_message, visible_window
+from jobs import FAILED, get_default_executor
+import telemetry
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +16,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Serve /metrics when ZENE_METRICS_PORT is set (once per process, shared by all sessions)
+telemetry.start_metrics_server()
+
 # Page configuration
 st.set_page_config(
     page_title="Zene AI Assistant",
@@ -32,14 +33,26 @@ if 'conversation_agent' not in st.session_state:
     st.session_state.conversation_agent = None
 if 'user_id' not in st.session_state:
     st.session_state.user_id = "user_" + datetime.now().strftime("%Y%m%d%H%M%S")
-if 'token_usage' not in st.session_state:
-    st.session_state.token_usage = {
-        "total_prompt_tokens": 0,
-        "total_completion_tokens": 0,
-        "total_tokens": 0,
-        "total_latency_seconds": 0,
-        "calls": 0
-    }
+if 'chat_window' not in st.session_state:
+    st.session_state.chat_window = DEFAULT_WINDOW
+if 'pending_job' not in st.session_state:
+    st.session_state.pending_job = None
+
+# Turns run on a process-wide pool, so a rerun does not cancel them
+executor = get_default_executor()
+
+def drop_pending_turn():
+    """Cancel and forget the in-flight turn; its API call still completes, on the agent it was started with."""
+    pending = executor.get(st.session_state.pending_job)
+    if pending:
+        pending.cancel()
+        executor.forget(pending.id)
+    st.session_state.pending_job = None
+
+def fresh_agent(user_id):
+    """New SnowBlaze with the current agent's model settings, so an orphaned turn cannot write into it."""
+    previous_agent = st.session_state.conversation_agent
+    return SnowBlaze(user_id=user_id, model_name=previous_agent.model_name, cascade=previous_agent.cascade)
 
 # App title and description
 st.title("🧠 Zene AI Assistant")
@@ -58,82 +71,79 @@ with col1:
         user_input = st.text_area("Enter your message:", height=100)
         col_submit, col_clear = st.columns([1, 5])
         with col_submit:
-            submit_button = st.form_submit_button("Send")
+            submit_button = st.form_submit_button("Send", disabled=st.session_state.pending_job is not None)
         with col_clear:
             clear_button = st.form_submit_button("Clear Conversation")
     
     # Clear conversation if requested
     if clear_button:
+        # A turn in flight finishes on the old agent, which nobody uses any more
+        drop_pending_turn()
         st.session_state.chat_history = []
-        st.session_state.conversation_agent.conversations = []
-        st.session_state.token_usage = {
-            "total_prompt_tokens": 0,
-            "total_completion_tokens": 0,
-            "total_tokens": 0,
-            "total_latency_seconds": 0,
-            "calls": 0
-        }
+        st.session_state.chat_window = DEFAULT_WINDOW
+        st.session_state.conversation_agent = fresh_agent(st.session_state.user_id)
         st.success("Conversation cleared!")
     
-    # Process the query when submitted
+    # Submit the query to the background executor; this script run returns right away
     if submit_button and user_input:
-        with st.spinner('Processing your message...'):
-            try:
-                # Process the message
-                start_time = time.time()
-                response_json = st.session_state.conversation_agent(user_input)
-                end_time = time.time()
-                processing_time = end_time - start_time
-                
-                # Get the most recent output from agent's history
-                latest_usage = {}
-                if st.session_state.conversation_agent.output_history:
-                    latest_output = st.session_state.conversation_agent.output_history[-1]
-                    latest_usage = latest_output.get("usage", {})
-                
-                # Update token usage statistics
-                st.session_state.token_usage["total_prompt_tokens"] += latest_usage.get("prompt_tokens", 0)
-                st.session_state.token_usage["total_completion_tokens"] += latest_usage.get("completion_tokens", 0)
-                st.session_state.token_usage["total_tokens"] += latest_usage.get("total_tokens", 0)
-                st.session_state.token_usage["total_latency_seconds"] += latest_usage.get("latency_seconds", 0)
-                st.session_state.token_usage["calls"] += 1
-                
-                # Add to chat history
-                st.session_state.chat_history.append({
-                    "role": "user",
-                    "content": user_input,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                })
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": response_json,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "usage": latest_usage,
-                    "processing_time": processing_time
-                })
-                
-            except Exception as e:
-                st.error(f"Error processing message: {str(e)}")
+        job = executor.submit(st.session_state.conversation_agent, user_input, stream=True, kind="zene_turn")
+        st.session_state.pending_job = job.id
+        st.session_state.pending_input = user_input
+    
+    @st.fragment(run_every=0.5)
+    def show_pending_turn():
+        """Poll the in-flight turn, rendering each classification field as soon as it is complete."""
+        job = executor.get(st.session_state.pending_job)
+        if job is None:
+            # Expired while the session was away
+            st.session_state.pending_job = None
+            st.rerun()
+        
+        if not job.done:
+            st.caption(f"You: {st.session_state.pending_input}")
+            streamed_fields = {event["name"]: event["value"] for event in job.events_since(0) if event["type"] == "field"}
+            if streamed_fields:
+                st.markdown("\n".join(f"- **{name}**: {value}" for name, value in streamed_fields.items()))
+            else:
+                st.info("Processing your message...")
+            return
+        
+        executor.forget(job.id)
+        st.session_state.pending_job = None
+        if job.status == FAILED:
+            st.session_state.turn_error = f"Error processing message: {str(job.error)}"
+            st.rerun()
+        
+        response_json = next((event["response"] for event in reversed(job.events) if event["type"] == "done"), {})
+        
+        # Get the most recent output from agent's history (totals are aggregated there)
+        latest_usage = {}
+        if st.session_state.conversation_agent.output_history:
+            latest_usage = st.session_state.conversation_agent.output_history[-1].get("usage", {})
+        
+        # Add to chat history (each message's HTML is rendered once, here)
+        st.session_state.chat_history.append(chat_message(
+            "user",
+            st.session_state.pending_input,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        ))
+        st.session_state.chat_history.append(chat_message(
+            "assistant",
+            response_json,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            usage=latest_usage,
+            processing_time=job.elapsed
+        ))
+        st.rerun()
+    
+    # Only poll while a turn is in flight (also after a rerun or a reconnect)
+    if st.session_state.pending_job:
+        show_pending_turn()
+    if "turn_error" in st.session_state:
+        st.error(st.session_state.pop("turn_error"))
     
     # Display chat history with custom styling
-    st.markdown("""
-    <style>
-    .user-message {
-        background-color: #e6f7ff;
-        padding: 10px;
-        border-radius: 10px;
-        margin: 5px 0;
-        border-left: 5px solid #1e90ff;
-    }
-    .assistant-message {
-        background-color: #f0f0f0;
-        padding: 10px;
-        border-radius: 10px;
-        margin: 5px 0;
-        border-left: 5px solid #2e8b57;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(CHAT_STYLE, unsafe_allow_html=True)
     
     st.subheader("Conversation")
     
@@ -142,32 +152,13 @@ with col1:
     else:
         chat_container = st.container()
         with chat_container:
-            for message in st.session_state.chat_history:
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="user-message">
-                        <strong>You ({message["timestamp"]}):</strong><br>
-                        {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    # For assistant messages, process the JSON or string content
-                    content_display = message["content"]
-                    if isinstance(content_display, dict):
-                        # Extract the main response from the JSON
-                        if "response" in content_display:
-                            content_display = content_display["response"]
-                        elif "explanation" in content_display:
-                            content_display = content_display["explanation"]
-                        else:
-                            content_display = json.dumps(content_display, indent=2)
-                    
-                    st.markdown(f"""
-                    <div class="assistant-message">
-                        <strong>Zene ({message["timestamp"]}):</strong><br>
-                        {content_display}
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Only the most recent messages are rendered; older ones load on demand
+            hidden, chat_html = visible_window(st.session_state.chat_history, st.session_state.chat_window)
+            if hidden:
+                if st.button(f"⬆️ Load older messages ({hidden} hidden)"):
+                    st.session_state.chat_window += DEFAULT_WINDOW
+                    st.rerun()
+            st.markdown(chat_html, unsafe_allow_html=True)
             
             # Option to save conversation
             if st.button("💾 Save Conversation"):
@@ -179,14 +170,14 @@ with col1:
 
 with col2:
     # Create tabs for different details
-    tabs = st.tabs(["Token Usage", "Response Analysis", "Settings"])
+    tabs = st.tabs(["Token Usage", "Response Analysis", "Topic Analytics", "Settings"])
     
     # Token Usage Tab
     with tabs[0]:
         st.header("Token Usage Statistics")
         
         # Show summary metrics
-        token_usage = st.session_state.token_usage
+        token_usage = st.session_state.conversation_agent.output_history.summary()
         calls = token_usage["calls"]
         
         col_total, col_prompt, col_completion = st.columns(3)
@@ -197,15 +188,69 @@ with col2:
         with col_completion:
             st.metric("Completion Tokens", f"{token_usage['total_completion_tokens']:,}")
         
-        # Show latency metrics
-        total_latency = token_usage["total_latency_seconds"]
-        avg_latency = total_latency / calls if calls > 0 else 0
-        
-        col_latency, col_calls = st.columns(2)
+        # Show latency metrics (model calls only; cache and fast-path answers are counted separately)
+        col_latency, col_calls, col_trimmed = st.columns(3)
         with col_latency:
-            st.metric("Avg Latency", f"{avg_latency:.2f}s")
+            st.metric("Avg Latency", f"{token_usage['avg_latency_seconds']:.2f}s",
+                      help="Average over API calls; cache hits and fast-path answers are excluded")
         with col_calls:
-            st.metric("API Calls", calls)
+            st.metric("API Calls", calls, help="Queries sent to the model")
+        with col_trimmed:
+            st.metric("History Tokens Trimmed", f"{token_usage.get('total_trimmed_tokens', 0):,}",
+                      help="Tokens dropped from the conversation window to stay within the model's budget")
+
+        col_responses, col_cache_hits, col_fast_path = st.columns(3)
+        with col_responses:
+            st.metric("Responses", token_usage["responses"], help="API calls plus queries answered without one")
+        with col_cache_hits:
+            st.metric("Cache Hits", token_usage["cache_hits"])
+        with col_fast_path:
+            st.metric("Fast-Path Answers", token_usage["fast_path_answers"])
+
+        col_p50, col_p95, col_p99 = st.columns(3)
+        with col_p50:
+            st.metric("p50 Latency", f"{token_usage['p50_latency_seconds']:.2f}s")
+        with col_p95:
+            st.metric("p95 Latency", f"{token_usage['p95_latency_seconds']:.2f}s")
+        with col_p99:
+            st.metric("p99 Latency", f"{token_usage['p99_latency_seconds']:.2f}s")
+
+        # Show provider prompt cache effectiveness (prompt prefixes reused from earlier calls)
+        total_cached = token_usage["total_cached_tokens"]
+        prompt_total = token_usage["total_prompt_tokens"]
+        st.metric("Cached Prompt Tokens", f"{total_cached:,}",
+                  delta=f"{total_cached / prompt_total:.0%} of prompt tokens" if prompt_total else None,
+                  delta_color="off",
+                  help="Prompt tokens served from OpenAI's prompt cache, billed at a discount")
+        
+        # Show response cache effectiveness
+        response_cache = st.session_state.conversation_agent.cache
+        if response_cache is not None:
+            cache_stats = response_cache.stats
+            st.caption(f"Response cache: {response_cache.hit_rate():.0%} hit rate "
+                       f"({cache_stats['exact_hits']} exact, {cache_stats['similar_hits']} similar, "
+                       f"{cache_stats['misses']} misses)")
+
+        # Show how many trivial queries the local fast path answered without an API call
+        fast_path = st.session_state.conversation_agent.fast_path
+        if fast_path is not None:
+            st.caption(f"Fast path: {fast_path.stats['answered']} answered locally, "
+                       f"{fast_path.stats['fallbacks']} sent to the model "
+                       f"(threshold {fast_path.threshold:.2f})")
+
+        # Show per-tier cascade results, to tune the escalation threshold
+        cascade = st.session_state.conversation_agent.cascade
+        if any(tier["calls"] for tier in cascade.stats.values()):
+            st.subheader("Model Cascade")
+            tiers = cascade.summary()
+            st.dataframe(pd.DataFrame({
+                'Tier': list(tiers),
+                'Hit Rate': [f"{tier['hit_rate']:.0%}" for tier in tiers.values()],
+                'Calls': [tier['calls'] for tier in tiers.values()],
+                'Avg Latency': [f"{tier['avg_latency_seconds']:.2f}s" for tier in tiers.values()],
+                'Cost': [f"${tier['cost_usd']:.4f}" for tier in tiers.values()],
+            }), hide_index=True)
+            st.caption(f"Escalating below {cascade.threshold:.2f} confidence")
         
         # Show token distribution chart
         if calls > 0:
@@ -246,6 +291,9 @@ with col2:
             if latest_response:
                 # Show processing time
                 st.info(f"Processing time: {latest_response.get('processing_time', 0):.2f} seconds")
+                time_to_first_field = latest_response.get("usage", {}).get("time_to_first_field_seconds")
+                if time_to_first_field is not None:
+                    st.info(f"Time to first field: {time_to_first_field:.2f} seconds")
                 
                 # Show the raw JSON response
                 st.subheader("Raw Response")
@@ -267,30 +315,93 @@ with col2:
         else:
             st.info("No responses to analyze yet. Start a conversation to see analysis.")
     
-    # Settings Tab
+    # Topic Analytics Tab: aggregates are maintained as responses arrive, so this never rescans history
     with tabs[2]:
+        st.header("Topic Analytics")
+        
+        analytics = st.session_state.conversation_agent.analytics
+        if analytics is None:
+            st.info("Topic analytics are disabled for this session.")
+        else:
+            audience_col, period_col = st.columns(2)
+            with audience_col:
+                audience = st.radio("Traffic", ["This user", "All users"], horizontal=True)
+            with period_col:
+                period = st.selectbox("Period", ["Last 7 days", "Last 30 days", "All time"])
+            user_filter = st.session_state.user_id if audience == "This user" else None
+            days = {"Last 7 days": 7, "Last 30 days": 30, "All time": None}[period]
+            
+            summary = analytics.summary(user_filter, days)
+            if not summary["queries"]:
+                st.info("No classified queries in this period yet.")
+            else:
+                col_queries, col_scope, col_agent = st.columns(3)
+                with col_queries:
+                    st.metric("Classified Queries", summary["queries"])
+                with col_scope:
+                    st.metric("Out-of-Scope Rate", f"{summary['out_of_scope_rate']:.1%}")
+                with col_agent:
+                    st.metric("Top Agent", max(summary["agents"], key=summary["agents"].get) if summary["agents"] else "-")
+                
+                st.subheader("Top Topics")
+                top_topics = analytics.top("topic", user_filter, days, limit=10)
+                st.bar_chart(pd.DataFrame(top_topics, columns=["Topic", "Queries"]).set_index("Topic"))
+                
+                # Daily trend of the five most frequent topics
+                daily_topics = analytics.daily("topic", user_filter, days, values=[topic for topic, _ in top_topics[:5]])
+                if daily_topics:
+                    st.subheader("Topic Frequency per Day")
+                    st.line_chart(pd.DataFrame(daily_topics, columns=["Day", "Topic", "Queries"])
+                                  .pivot(index="Day", columns="Topic", values="Queries").fillna(0))
+                
+                daily_scope = pd.DataFrame(analytics.daily("scope", user_filter, days), columns=["Day", "Scope", "Queries"])
+                daily_scope = daily_scope.pivot(index="Day", columns="Scope", values="Queries").fillna(0)
+                if "out" in daily_scope:
+                    st.subheader("Out-of-Scope Rate per Day")
+                    st.line_chart(daily_scope["out"] / daily_scope.sum(axis=1))
+                
+                st.subheader("Agent Distribution")
+                st.bar_chart(pd.DataFrame(list(summary["agents"].items()), columns=["Agent", "Queries"]).set_index("Agent"))
+                
+                st.subheader("Top Sub-topics")
+                st.dataframe(pd.DataFrame(analytics.top("sub_topic", user_filter, days, limit=15),
+                                          columns=["Sub-topic", "Queries"]), hide_index=True)
+    
+    # Settings Tab
+    with tabs[3]:
         st.header("Settings")
         
         # User ID settings
         st.subheader("User ID")
         new_user_id = st.text_input("Change User ID", value=st.session_state.user_id)
         if st.button("Update User ID"):
-            # Create a new agent with the new user ID
+            # Create a new agent with the new user ID; a turn in flight stays with the previous user's agent
+            drop_pending_turn()
             st.session_state.user_id = new_user_id
-            st.session_state.conversation_agent = SnowBlaze(user_id=new_user_id)
-            st.success(f"User ID updated to {new_user_id}")
+            st.session_state.conversation_agent = fresh_agent(new_user_id)
+            resumed = st.session_state.conversation_agent.resume()
+            st.success(f"User ID updated to {new_user_id}" + (f", resumed {resumed} messages" if resumed else ""))
         
         # Model settings
         st.subheader("Model Settings")
-        model_options = ["gpt-4o","gpt-4o-mini"]
+        agent = st.session_state.conversation_agent
+        model_options = ["gpt-4o","gpt-4o-mini",CASCADE]
         selected_model = st.selectbox(
             "Select Model", 
             options=model_options,
-            index=0,  # Default to first option
-            help="Choose the OpenAI model to use for responses"
+            index=model_options.index(agent.model_name) if agent.model_name in model_options else 0,
+            help="Choose the OpenAI model to use for responses. "
+                 f"{CASCADE} answers with {agent.cascade.cheap_model} and escalates unsure classifications "
+                 f"to {agent.cascade.strong_model}"
+        )
+        cascade_threshold = st.slider(
+            "Cascade Confidence Threshold", min_value=0.5, max_value=1.0, value=float(agent.cascade.threshold),
+            step=0.01, disabled=selected_model != CASCADE,
+            help="Lowest routing-field probability at which the cheap model's answer is kept"
         )
         if st.button("Update Model"):
-            # The model setting would need to be passed to the get_response method
+            agent.model_name = selected_model
+            agent.cascade.threshold = cascade_threshold
             st.success(f"Model updated to {selected_model}")
             st.info("This will apply to your next message")
         
@@ -0,0 +1,318 @@
+"""
+Bulk classification of aspirant queries with the Zene classifier.
+
+Usage:
+    python batch.py classify queries.jsonl results.jsonl --workers 8
+    python batch.py classify queries.jsonl results.parquet --format parquet
+    python batch.py batch-api queries.jsonl batch_input.jsonl
+
+Input files hold one query per line, either a JSON object with "query" and
+an optional "id", or a bare JSON string. Runs are resumable: queries whose
+id is already present in the output file are skipped.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+import openai
+from clients import get_client
+from prompts import Zene
+from ratelimit import BATCH
+
+logger = logging.getLogger(__name__)
+
+# The OpenAI Batch API accepts at most this many requests per input file
+BATCH_API_MAX_REQUESTS = 50000
+
+
+def read_queries(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream queries from a JSONL file.
+
+    Args:
+        path: JSONL file with one query per line
+
+    Yields:
+        {"id": ..., "query": ...} dicts; ids default to the line number
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            yield {"id": str(record.get("id", line_number)), "query": record["query"]}
+
+
+def classification_body(query: str, model_name: str = "gpt-4o") -> Dict[str, Any]:
+    """Build the chat completion request body for a single-turn classification."""
+    return {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": Zene["system_prompt"]},
+            {"role": "user", "content": query}
+        ],
+        "temperature": 0.0,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": Zene["response_schema"]
+        },
+    }
+
+
+class _Backoff:
+    """Shared pause so every worker backs off together after a 429."""
+    def __init__(self):
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        delay = self._resume_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.time() + seconds)
+
+
+def _retry_after(error: openai.APIStatusError, attempt: int) -> float:
+    """Seconds to wait before retrying, from the response headers or exponential backoff."""
+    header = error.response.headers.get("retry-after") if error.response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 60)
+
+
+def _classify_one(client: openai.OpenAI, item: Dict[str, str], model_name: str,
+                  backoff: _Backoff, max_attempts: int) -> Dict[str, Any]:
+    """Classify one query, retrying rate limit and transient errors."""
+    result = {"id": item["id"], "query": item["query"], "response": None, "error": None}
+    for attempt in range(1, max_attempts + 1):
+        backoff.wait()
+        start_time = time.time()
+        try:
+            response = client.chat.completions.create(**classification_body(item["query"], model_name))
+            result["latency_seconds"] = time.time() - start_time
+            result["usage"] = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+            result["response"] = json.loads(response.choices[0].message.content)
+            result["error"] = None
+            return result
+        except openai.RateLimitError as e:
+            delay = _retry_after(e, attempt)
+            logger.warning(f"Rate limited on {item['id']}, pausing all workers for {delay:.1f}s")
+            backoff.pause(delay)
+            result["error"] = f"Rate limited: {str(e)}"
+        except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            time.sleep(min(2 ** attempt, 60))
+            result["error"] = str(e)
+        except Exception as e:
+            result["error"] = str(e)
+            break
+    logger.error(f"Failed to classify {item['id']}: {result['error']}")
+    return result
+
+
+def classify_many(queries: Iterable[Dict[str, str]], model_name: str = "gpt-4o", max_workers: int = 8,
+                  client: Optional[openai.OpenAI] = None, max_attempts: int = 5,
+                  skip_ids: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Classify many queries with bounded parallelism.
+
+    Queries are pulled lazily, so arbitrarily large inputs stream through
+    with at most 2 * max_workers requests queued at a time. Results are
+    yielded in completion order.
+
+    Args:
+        queries: Iterable of {"id": ..., "query": ...} dicts
+        model_name: Name of the OpenAI model to use
+        max_workers: Maximum number of concurrent requests
+        client: Optional OpenAI client, defaults to the pooled batch-priority client
+        max_attempts: Attempts per query before recording an error
+        skip_ids: Ids to skip, e.g. those already completed by an earlier run
+
+    Yields:
+        Result dicts with id, query, parsed response, usage and error
+    """
+    client = client or get_client(priority=BATCH)
+    skip_ids = skip_ids or set()
+    backoff = _Backoff()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="classify") as executor:
+        pending = set()
+        for item in queries:
+            if item["id"] in skip_ids:
+                continue
+            pending.add(executor.submit(_classify_one, client, item, model_name, backoff, max_attempts))
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Read the ids already written to a JSONL results file (the run checkpoint)."""
+    ids = set()
+    if not os.path.exists(output_path):
+        return ids
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line
+                continue
+            if record.get("error") is None:
+                ids.add(record["id"])
+    return ids
+
+
+def run_classification(input_path: str, output_path: str, model_name: str = "gpt-4o",
+                       max_workers: int = 8, output_format: str = "jsonl") -> Dict[str, int]:
+    """
+    Classify a JSONL file of queries, resuming from any earlier partial run.
+
+    Results are appended to a JSONL checkpoint as they complete. For Parquet
+    output the checkpoint is converted once the run finishes.
+
+    Args:
+        input_path: JSONL file of queries
+        output_path: Results file (.jsonl or .parquet)
+        model_name: Name of the OpenAI model to use
+        max_workers: Maximum number of concurrent requests
+        output_format: "jsonl" or "parquet"
+
+    Returns:
+        Counts of classified, failed and skipped queries
+    """
+    checkpoint_path = output_path if output_format == "jsonl" else output_path + ".jsonl"
+    done = completed_ids(checkpoint_path)
+    stats = {"classified": 0, "failed": 0, "skipped": len(done)}
+    logger.info(f"Resuming with {len(done)} queries already classified")
+
+    start_time = time.time()
+    with open(checkpoint_path, "a") as out:
+        for result in classify_many(read_queries(input_path), model_name, max_workers, skip_ids=done):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            stats["failed" if result["error"] else "classified"] += 1
+            if (stats["classified"] + stats["failed"]) % 100 == 0:
+                elapsed = time.time() - start_time
+                logger.info(f"Progress: {stats} ({stats['classified'] / elapsed:.1f} queries/s)")
+
+    if output_format == "parquet":
+        _write_parquet(checkpoint_path, output_path)
+    logger.info(f"Batch classification finished in {time.time() - start_time:.1f}s: {stats}")
+    return stats
+
+
+def _write_parquet(jsonl_path: str, parquet_path: str) -> None:
+    """Convert the JSONL checkpoint to Parquet, keeping the latest result per id."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+
+    latest = {}
+    with open(jsonl_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            latest[record["id"]] = record
+
+    rows = [{
+        "id": record["id"],
+        "query": record["query"],
+        "response": json.dumps(record["response"]) if record["response"] is not None else None,
+        "error": record["error"],
+        "prompt_tokens": record.get("usage", {}).get("prompt_tokens"),
+        "completion_tokens": record.get("usage", {}).get("completion_tokens"),
+        "latency_seconds": record.get("latency_seconds"),
+    } for record in latest.values()]
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+    logger.info(f"Wrote {len(rows)} results to {parquet_path}")
+
+
+def write_batch_api_input(input_path: str, output_path: str, model_name: str = "gpt-4o") -> int:
+    """
+    Write OpenAI Batch API input files for an overnight run.
+
+    Inputs larger than the Batch API limit are split into numbered files.
+
+    Args:
+        input_path: JSONL file of queries
+        output_path: Batch input file; parts after the first get a .N suffix
+        model_name: Name of the OpenAI model to use
+
+    Returns:
+        Number of requests written
+    """
+    count = 0
+    out = None
+    try:
+        for item in read_queries(input_path):
+            if count % BATCH_API_MAX_REQUESTS == 0:
+                if out:
+                    out.close()
+                part = count // BATCH_API_MAX_REQUESTS
+                out = open(output_path if part == 0 else f"{output_path}.{part}", "w")
+            out.write(json.dumps({
+                "custom_id": item["id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": classification_body(item["query"], model_name)
+            }) + "\n")
+            count += 1
+    finally:
+        if out:
+            out.close()
+    logger.info(f"Wrote {count} Batch API requests to {output_path}")
+    return count
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    classify = subparsers.add_parser("classify", help="Classify queries through the chat completions API")
+    classify.add_argument("input", help="JSONL file of queries")
+    classify.add_argument("output", help="Results file, appended to when resuming")
+    classify.add_argument("--model", default="gpt-4o", help="OpenAI model to use")
+    classify.add_argument("--workers", type=int, default=8, help="Maximum concurrent requests")
+    classify.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format")
+
+    batch_api = subparsers.add_parser("batch-api", help="Write OpenAI Batch API input files")
+    batch_api.add_argument("input", help="JSONL file of queries")
+    batch_api.add_argument("output", help="Batch API input JSONL file")
+    batch_api.add_argument("--model", default="gpt-4o", help="OpenAI model to use")
+
+    args = parser.parse_args()
+    if args.command == "classify":
+        run_classification(args.input, args.output, args.model, args.workers, args.format)
+    else:
+        write_batch_api_input(args.input, args.output, args.model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark the sync SnowBlaze path against AsyncSnowBlaze on a local stub server.
+
+Usage:
+    python bench_async.py --requests 100 --latency 0.25
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from stub_server import start_stub_server
+
+
+def run_sync(n_requests: int) -> float:
+    """Serve every user one after another from a single worker thread."""
+    from main import SnowBlaze
+
+    agents = [SnowBlaze(user_id=f"user{i}", cache=False, store=False, fast_path=False, profiles=False,
+                        analytics=False) for i in range(n_requests)]
+    start_time = time.perf_counter()
+    for agent in agents:
+        agent("Explain Chola administration")
+    return n_requests / (time.perf_counter() - start_time)
+
+
+def run_async(n_requests: int) -> float:
+    """Serve every user concurrently from one event loop."""
+    from main import AsyncSnowBlaze
+
+    async def drive():
+        agents = [AsyncSnowBlaze(user_id=f"user{i}", cache=False, store=False, fast_path=False,
+                                 profiles=False, analytics=False) for i in range(n_requests)]
+        start_time = time.perf_counter()
+        await asyncio.gather(*(agent("Explain Chola administration") for agent in agents))
+        return n_requests / (time.perf_counter() - start_time)
+
+    return asyncio.run(drive())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Number of classification sessions")
+    parser.add_argument("--latency", type=float, default=0.25, help="Simulated model latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=64, help="AsyncSnowBlaze semaphore size")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    from main import AsyncSnowBlaze
+    logging.getLogger().setLevel(logging.WARNING)
+    AsyncSnowBlaze.max_concurrency = args.concurrency
+
+    sync_rps = run_sync(args.requests)
+    async_rps = run_async(args.requests)
+    server.shutdown()
+
+    print(f"requests={args.requests} latency={args.latency}s concurrency={args.concurrency}")
+    print(f"sync  SnowBlaze:      {sync_rps:8.1f} req/s")
+    print(f"async AsyncSnowBlaze: {async_rps:8.1f} req/s ({async_rps / sync_rps:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark Streamlit rerun time of the Zene app as the conversation grows.
+
+Usage:
+    python bench_chat_render.py                      # 10, 100 and 1000 turns
+    python bench_chat_render.py --turns 50 500 --reruns 10
+
+Each rerun executes app.py headlessly with streamlit.testing's AppTest,
+with a pre-filled chat history of the given number of turns (one user and
+one assistant message each). Three transcripts are compared:
+
+    legacy    the previous per-message st.markdown loop with json.dumps on
+              every rerun (transcript only, so a lower bound for the old app)
+    all       cached per-message HTML, every message rendered
+    windowed  cached per-message HTML, only the last ZENE_CHAT_WINDOW messages
+
+The legacy and all rows render the whole history, the windowed row stays
+flat. No API calls are made: the agent points at a local stub server.
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from chat_view import DEFAULT_WINDOW, chat_message
+from stub_server import start_stub_server
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def legacy_app():
+    """app.py before windowing, reduced to the chat transcript loop."""
+    import json
+    import streamlit as st
+
+    for message in st.session_state.chat_history:
+        if message["role"] == "user":
+            st.markdown(f"""
+            <div class="user-message">
+                <strong>You ({message["timestamp"]}):</strong><br>
+                {message["content"]}
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            content_display = message["content"]
+            if isinstance(content_display, dict):
+                if "response" in content_display:
+                    content_display = content_display["response"]
+                elif "explanation" in content_display:
+                    content_display = content_display["explanation"]
+                else:
+                    content_display = json.dumps(content_display, indent=2)
+            st.markdown(f"""
+            <div class="assistant-message">
+                <strong>Zene ({message["timestamp"]}):</strong><br>
+                {content_display}
+            </div>
+            """, unsafe_allow_html=True)
+
+
+def make_history(turns):
+    """Chat history of classification-sized turns; every third reply has no response field."""
+    history = []
+    for i in range(turns):
+        timestamp = f"2024-01-01 10:{i // 60 % 60:02d}:{i % 60:02d}"
+        history.append(chat_message("user", f"Explain topic {i} of the Chola administration", timestamp))
+        content = {"core_topic": f"topic {i}", "topics": ["history", "polity"], "sub-topics": ["chola"],
+                   "query_category": "concept", "next_agent": "Milo",
+                   "vector_database_retrieval_queries": [f"chola administration {i}"] * 3}
+        if i % 3:
+            content["response"] = "The Chola administration was organised into mandalams and nadus. " * 6
+        history.append(chat_message("assistant", content, timestamp, usage={"total_tokens": 900},
+                                    processing_time=1.2))
+    return history
+
+
+def time_reruns(app, history, window, reruns, agent=None):
+    """Median wall time of one script run over the given history."""
+    timings = []
+    for _ in range(reruns):
+        app.session_state["chat_history"] = history
+        if window is not None:
+            app.session_state["chat_window"] = window
+        if agent is not None:
+            app.session_state["conversation_agent"] = agent
+        start_time = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start_time)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000], help="Conversation lengths")
+    parser.add_argument("--reruns", type=int, default=5, help="Timed reruns per measurement")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=0.0)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from main import SnowBlaze
+    agent = SnowBlaze(user_id="bench", cache=False, store=False, fast_path=False, profiles=False,
+                      analytics=False)
+
+    print(f"window={DEFAULT_WINDOW} messages, median of {args.reruns} reruns")
+    print(f"{'turns':>6} {'legacy':>10} {'all':>10} {'windowed':>10}")
+    for turns in args.turns:
+        history = make_history(turns)
+        legacy = time_reruns(AppTest.from_function(legacy_app, default_timeout=600), history, None, args.reruns)
+        full = time_reruns(AppTest.from_file(APP, default_timeout=600), history, len(history), args.reruns, agent)
+        windowed = time_reruns(AppTest.from_file(APP, default_timeout=600), history, DEFAULT_WINDOW,
+                               args.reruns, agent)
+        print(f"{turns:>6} {legacy * 1000:>8.1f}ms {full * 1000:>8.1f}ms {windowed * 1000:>8.1f}ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
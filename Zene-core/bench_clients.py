@@ -0,0 +1,73 @@
+"""
+Microbenchmark SnowBlaze construction cost and first-request latency with and
+without the pooled client registry.
+
+Usage:
+    python bench_clients.py --instances 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+
+from stub_server import start_stub_server
+
+
+def fresh_client_agent(user_id: str):
+    """Build an agent the way SnowBlaze did before the registry existed."""
+    import openai
+    from dotenv import load_dotenv
+    from main import SnowBlaze
+
+    load_dotenv()
+    return SnowBlaze(user_id=user_id, client=openai.OpenAI(), cache=False, store=False, fast_path=False,
+                     profiles=False, analytics=False)
+
+
+def pooled_client_agent(user_id: str):
+    """Build an agent from the shared client registry."""
+    from main import SnowBlaze
+
+    return SnowBlaze(user_id=user_id, cache=False, store=False, fast_path=False, profiles=False,
+                     analytics=False)
+
+
+def measure(factory, instances: int):
+    """Return per-instance construction and first-request latencies in ms."""
+    construction, first_request = [], []
+    for i in range(instances):
+        start_time = time.perf_counter()
+        agent = factory(f"user{i}")
+        construction.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        agent("hi")
+        first_request.append((time.perf_counter() - start_time) * 1000)
+    return construction, first_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instances", type=int, default=50, help="Number of agents to construct")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(latency=0)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    import main as _main  # noqa: F401 - configure logging before silencing it
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Warm the registry so the pooled numbers reflect steady state
+    pooled_client_agent("warmup")("hi")
+
+    for label, factory in (("fresh client", fresh_client_agent), ("pooled client", pooled_client_agent)):
+        construction, first_request = measure(factory, args.instances)
+        print(f"{label:14s} construction: median {statistics.median(construction):7.3f} ms | "
+              f"first request: median {statistics.median(first_request):7.3f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark the offline fast path against gpt-4o labels: latency, coverage and agreement.
+
+Usage:
+    python bench_fastpath.py --labels results.jsonl     # batch.py classify output from gpt-4o
+    python bench_fastpath.py --db conversations/zene.db --json-dir conversations
+    python bench_fastpath.py --synthetic 5000           # no logs at hand
+
+The labeled queries are split into train and test sets. The model is trained
+on the first and every test query is classified locally; queries the fast
+path answers are compared with the gpt-4o label, the rest count as LLM
+fallbacks. The gpt-4o latency is the median logged latency of the label files.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from fastpath import DEFAULT_THRESHOLD, FastPathClassifier, iter_examples, label_of
+
+CHAT = [
+    "hi", "hello", "hey", "hey there", "good morning", "good evening", "thanks", "thank you so much",
+    "ok", "okay cool", "lol", "bye", "see you later", "i'm bored", "im so bored", "nice", "great, thanks",
+    "how are you", "how's it going", "what's up", "hmm", "cool", "awesome", "good night",
+]
+AGENT_CHAT = ["who are you", "what can you do", "are you a bot", "what is your name", "who made you"]
+TOPICS = [
+    "chola administration", "quit india movement", "fiscal deficit", "fundamental rights", "monsoon",
+    "federalism", "panchayati raj", "mauryan empire", "green revolution", "inflation targeting",
+    "preamble of the constitution", "biodiversity hotspots", "governor's discretionary powers",
+]
+QUESTIONS = ["when did the {} start", "what is {}", "who led the {}", "which article covers {}"]
+CONCEPTS = ["explain {} in detail", "can you tell me about {}", "why is {} important",
+            "help me understand {} for mains"]
+
+
+def _response(next_agent, category, target, topic=""):
+    return {"topics": [], "sub-topics": [], "core_topic": topic or "chat", "user_intent": "",
+            "is_ambiguous": False, "query_category": category, "target": target,
+            "is_in_upsc_scope": bool(topic), "next_agent": next_agent,
+            "vector_database_retrieval_queries": [topic] if topic else []}
+
+
+def synthetic_examples(count, seed=0):
+    """Generate labeled queries resembling chit-chat, factual questions and concept requests."""
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.35:
+            text = rng.choice(CHAT) + rng.choice(["", "!", " :)", "?", " zene"])
+            examples.append((text, _response("Comet", "chat", "other")))
+        elif kind < 0.45:
+            examples.append((rng.choice(AGENT_CHAT) + rng.choice(["", "?"]), _response("Comet", "chat", "agent")))
+        elif kind < 0.7:
+            topic = rng.choice(TOPICS)
+            examples.append((rng.choice(QUESTIONS).format(topic), _response("Thalia", "question", "curriculum", topic)))
+        else:
+            topic = rng.choice(TOPICS)
+            examples.append((rng.choice(CONCEPTS).format(topic), _response("Milo", "concept", "curriculum", topic)))
+    return examples
+
+
+def logged_llm_latency(label_files):
+    """Median latency_seconds of the classifications in batch.py result files, None if absent."""
+    latencies = []
+    for path in label_files:
+        with open(path) as f:
+            for line in f:
+                try:
+                    latency = json.loads(line).get("latency_seconds")
+                except json.JSONDecodeError:
+                    continue
+                if latency:
+                    latencies.append(latency)
+    return float(np.median(latencies)) if latencies else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", nargs="*", default=[], help="batch.py classify result files")
+    parser.add_argument("--db", default=None, help="Conversation store")
+    parser.add_argument("--json-dir", default=None, help="Legacy conversation JSON directory")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many synthetic labeled queries")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeats", type=int, default=20, help="Timing passes over the test set")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.synthetic:
+        examples = synthetic_examples(args.synthetic)
+    else:
+        examples = list(iter_examples(args.db, args.json_dir, args.labels))
+    if len(examples) < 10:
+        parser.error(f"only {len(examples)} labeled queries found, pass --labels or --synthetic")
+    random.Random(1).shuffle(examples)
+    split = int(len(examples) * (1 - args.test_fraction))
+    train, test = examples[:split], examples[split:]
+
+    start_time = time.perf_counter()
+    model = FastPathClassifier.train(train, threshold=args.threshold)
+    train_seconds = time.perf_counter() - start_time
+    path = os.path.join(tempfile.mkdtemp(prefix="zene-fastpath-"), "fastpath.npz")
+    model.save(path)
+    model = FastPathClassifier.load(path, threshold=args.threshold)
+    print(f"examples={len(examples)} train={len(train)} test={len(test)} labels={len(model.labels)} "
+          f"served={sorted(model.templates)}")
+    print(f"train {train_seconds:.2f}s, model file {os.path.getsize(path) / 1024:.0f} KiB")
+
+    answered = agreed = trivial = trivial_answered = 0
+    for text, response in test:
+        label = label_of(response)
+        is_trivial = label in model.templates
+        trivial += is_trivial
+        answer = model.classify(text)
+        if answer is None:
+            continue
+        answered += 1
+        trivial_answered += is_trivial
+        agreed += answer[1]["label"] == label
+
+    latencies = []
+    for _ in range(args.repeats):
+        for text, _ in test:
+            start_time = time.perf_counter()
+            model.classify(text)
+            latencies.append((time.perf_counter() - start_time) * 1e6)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"fast path latency: p50 {p50:.1f} us, p99 {p99:.1f} us")
+    print(f"coverage: {answered / len(test):.1%} of test queries answered locally "
+          f"({trivial_answered}/{trivial} trivial queries)")
+    print(f"agreement with gpt-4o on answered queries: {agreed / answered:.1%}" if answered
+          else "agreement: no queries answered locally")
+    llm_latency = logged_llm_latency(args.labels)
+    if llm_latency is not None:
+        print(f"gpt-4o median latency: {llm_latency * 1000:.0f} ms "
+              f"({llm_latency * 1e6 / p50:,.0f}x the fast path)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure SnowBlaze throughput and latency without a live OpenAI key.
+
+Usage:
+    python bench_offline.py --mode stub --latency 0.3 --jitter 0.1     # in-process stub server
+    python bench_offline.py --mode record                              # live API, writes the cassette
+    python bench_offline.py --mode replay --latency recorded           # replays the cassette, no network
+
+Every user sends the same scripted conversation, users run concurrently on
+a thread pool. Record once against the API, then replay on any machine: the
+replayed responses, token usage and rate-limit headers are the recorded
+ones, and the seeded jitter makes repeated runs comparable. Battles run the
+same way: ZENE_LLM_MODE=replay python ../agentic-wars/runner.py ...
+"""
+import argparse
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clients import LLM_MODES, TRANSPORT_SETTINGS, configure_transport
+from main import SnowBlaze
+
+SCRIPT = [
+    "Explain the Chola administration",
+    "How was their village self-government organised?",
+    "What is the fiscal deficit?",
+    "Which article covers the right to equality?",
+    "thanks, that helps",
+]
+
+
+def run_user(user_index, turns):
+    """Run one scripted conversation, returning per-turn latencies."""
+    agent = SnowBlaze(user_id=f"bench_offline_{user_index}", cache=False, store=False, profiles=False,
+                      analytics=False, fast_path=False)
+    latencies = []
+    for turn in range(turns):
+        start_time = time.perf_counter()
+        response = agent(SCRIPT[turn % len(SCRIPT)])
+        latencies.append(time.perf_counter() - start_time)
+        if "error" in response:
+            raise RuntimeError(f"Turn {turn} of user {user_index} failed: {response['error']}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=LLM_MODES, default=None, help="Defaults to ZENE_LLM_MODE")
+    parser.add_argument("--cassette", default=None, help="Defaults to ZENE_CASSETTE")
+    parser.add_argument("--latency", default=None, help='Seconds per request, or "recorded"')
+    parser.add_argument("--jitter", type=float, default=None, help="Uniform latency jitter in seconds")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent conversations")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per conversation")
+    args = parser.parse_args()
+
+    configure_transport(args.mode, args.cassette, args.latency, args.jitter)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        latencies = [latency for user in pool.map(run_user, range(args.users), [args.turns] * args.users)
+                     for latency in user]
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    print(f"mode={TRANSPORT_SETTINGS['mode']} users={args.users} turns={args.turns} "
+          f"latency={TRANSPORT_SETTINGS['latency'] if TRANSPORT_SETTINGS['latency'] is not None else 'recorded'} "
+          f"jitter={TRANSPORT_SETTINGS['jitter']}")
+    print(f"throughput {len(latencies) / elapsed:8.1f} turns/s")
+    print(f"latency    p50 {statistics.median(latencies) * 1000:7.1f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms   "
+          f"max {latencies[-1] * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
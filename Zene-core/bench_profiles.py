@@ -0,0 +1,82 @@
+"""
+Benchmark profile lookups and updates at a large number of users.
+
+Usage:
+    python bench_profiles.py --users 1000000 --lookups 20000
+
+Fills a fresh profile database with synthetic users, then times cold
+lookups (SQLite primary-key probe, LRU miss), warm lookups (LRU hit),
+per-turn topic updates and snippet building.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from profiles import ProfileStore, profile_snippet
+
+TOPICS = ["Indian Polity", "Modern History", "Geography of India", "Indian Economy", "Environment",
+          "Ancient History", "Ethics", "Science and Technology", "International Relations", "Art and Culture"]
+SUB_TOPICS = ["Fundamental Rights", "Quit India Movement", "Monsoon", "Fiscal Deficit", "Biodiversity",
+              "Chola Administration", "Panchayati Raj", "Green Revolution", "Federalism", "Inflation Targeting"]
+
+
+def synthetic_profile(rng):
+    return {
+        "user_name": f"aspirant{rng.randrange(10 ** 6)}",
+        "topics": {topic: rng.randrange(1, 30) for topic in rng.sample(TOPICS, 5)},
+        "sub_topics": {topic: rng.randrange(1, 10) for topic in rng.sample(SUB_TOPICS, 6)},
+        "score": {"mock_tests": [{"name": f"Test {i}", "score": rng.randrange(40, 100)} for i in range(3)]},
+    }
+
+
+def timed(fn, items):
+    """Per-call latencies in microseconds."""
+    latencies = []
+    for item in items:
+        start_time = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start_time) * 1e6)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    print(f"{name:<16} p50 {statistics.median(latencies):8.1f} us   "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000000, help="Profiles in the database")
+    parser.add_argument("--lookups", type=int, default=20000, help="Timed operations per measurement")
+    parser.add_argument("--batch", type=int, default=50000, help="Profiles inserted per transaction")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "profiles.db")
+        store = ProfileStore(path)
+        start_time = time.perf_counter()
+        for offset in range(0, args.users, args.batch):
+            store.put_many({f"user{i}": synthetic_profile(rng)
+                            for i in range(offset, min(offset + args.batch, args.users))})
+        print(f"loaded {len(store)} profiles in {time.perf_counter() - start_time:.1f}s "
+              f"({os.path.getsize(path) / 2 ** 20:.0f} MiB)")
+
+        # A new store starts with an empty LRU, so every first lookup reads SQLite
+        store = ProfileStore(path, cache_size=args.lookups)
+        users = [f"user{rng.randrange(args.users)}" for _ in range(args.lookups)]
+        report("cold lookup", timed(store.get, users))
+        report("warm lookup", timed(store.get, users))
+        report("record topics", timed(
+            lambda user: store.record_topics(user, rng.sample(TOPICS, 2), rng.sample(SUB_TOPICS, 3)), users[:2000]
+        ))
+        profiles = [store.get(user) for user in users[:2000]]
+        report("snippet", timed(profile_snippet, profiles))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share a key."""
+    return _WHITESPACE.sub(" ", text or "").strip().casefold()
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _ngrams(text: str, n: int = 3) -> Counter:
+    """Character n-gram profile used by the similarity tier."""
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[gram] for gram, count in a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(count * count for count in a.values()))
+    norm_b = math.sqrt(sum(count * count for count in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for deterministic (temperature 0) classifier responses.
+
+    The exact tier keys on a hash of the system prompt, response schema,
+    model and normalized message list. The optional similarity tier matches
+    the latest user message against cached queries that share the same
+    preceding context, using character n-gram cosine similarity. Entries are
+    evicted LRU beyond max_entries and expire after ttl_seconds. With a path
+    the cache is persisted to SQLite and survives restarts.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 path: Optional[str] = None, similarity_threshold: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            ttl_seconds: Lifetime of an entry, None to never expire
+            path: Optional SQLite file for persistence
+            similarity_threshold: Minimum cosine similarity for a near match,
+                None disables the similarity tier
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+
+        # key -> (context_key, query, response, created_at), ordered by recency
+        self._entries: "OrderedDict[str, Tuple[str, str, str, float]]" = OrderedDict()
+        # context_key -> {key: n-gram profile of the normalized query}
+        self._index: Dict[str, Dict[str, Counter]] = {}
+        self._lock = threading.RLock()
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            self._db.commit()
+            self._load()
+
+    def _load(self) -> None:
+        """Warm the in-memory tiers from SQLite, most recently used last."""
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, context_key, query, response, created_at FROM responses "
+            "ORDER BY accessed_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, context_key, query, response, created_at in reversed(rows):
+            self._store(key, context_key, query, response, created_at)
+        logger.info(f"Loaded {len(rows)} cached responses from disk")
+
+    @staticmethod
+    def make_keys(system_prompt: str, schema: Any, model: str,
+                  messages: List[Dict[str, str]]) -> Tuple[str, str, str]:
+        """
+        Build the cache keys for a request.
+
+        Args:
+            system_prompt: System prompt of the request
+            schema: Response schema of the request
+            model: Model name
+            messages: Conversation messages after the system prompt, ending
+                with the current user message
+
+        Returns:
+            Tuple of (exact key, context key, normalized query)
+        """
+        normalized = [{"role": m.get("role"), "content": normalize_text(m.get("content"))} for m in messages]
+        query = normalized[-1]["content"] if normalized else ""
+        context_key = _digest([system_prompt, schema, model, normalized[:-1]])
+        return _digest([context_key, query]), context_key, query
+
+    def get(self, keys: Tuple[str, str, str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up a response.
+
+        Args:
+            keys: Keys returned by make_keys
+
+        Returns:
+            Tuple of (cached response or None, tier that matched: "exact"/"similar")
+        """
+        key, context_key, query = keys
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self.stats["exact_hits"] += 1
+                return entry[2], "exact"
+
+            if self.similarity_threshold is not None:
+                match = self._nearest(context_key, query)
+                if match is not None:
+                    self.stats["similar_hits"] += 1
+                    return match[2], "similar"
+
+            self.stats["misses"] += 1
+            return None, None
+
+    def set(self, keys: Tuple[str, str, str], response: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            keys: Keys returned by make_keys
+            response: Response content to cache
+        """
+        key, context_key, query = keys
+        now = time.time()
+        with self._lock:
+            self._store(key, context_key, query, response, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, context_key, query, response, now, now)
+                )
+                self._db.commit()
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from either tier."""
+        hits = self.stats["exact_hits"] + self.stats["similar_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self) -> None:
+        """Remove every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _store(self, key: str, context_key: str, query: str, response: str, created_at: float) -> None:
+        self._entries[key] = (context_key, query, response, created_at)
+        self._entries.move_to_end(key)
+        if self.similarity_threshold is not None:
+            self._index.setdefault(context_key, {})[key] = _ngrams(query)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        context_key = self._entries.pop(key)[0]
+        profiles = self._index.get(context_key)
+        if profiles is not None:
+            profiles.pop(key, None)
+            if not profiles:
+                del self._index[context_key]
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _live_entry(self, key: str) -> Optional[Tuple[str, str, str, float]]:
+        """Return an unexpired entry and mark it most recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds is not None and time.time() - entry[3] > self.ttl_seconds:
+            self._remove(key)
+            if self._db is not None:
+                self._db.commit()
+            return None
+        self._entries.move_to_end(key)
+        if self._db is not None:
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return entry
+
+    def _nearest(self, context_key: str, query: str) -> Optional[Tuple[str, str, str, float]]:
+        """Find the most similar cached query with the same preceding context."""
+        profiles = self._index.get(context_key)
+        if not profiles:
+            return None
+        target = _ngrams(query)
+        best_key, best_score = None, self.similarity_threshold
+        for key, profile in profiles.items():
+            score = _cosine(target, profile)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self._live_entry(best_key) if best_key is not None else None
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache.
+
+    Configured from ZENE_CACHE_PATH (SQLite file, unset for memory only),
+    ZENE_CACHE_MAX_ENTRIES, ZENE_CACHE_TTL_SECONDS and
+    ZENE_CACHE_SIMILARITY (threshold, unset to disable the similarity tier).
+    """
+    global _default_cache
+    if _default_cache is None:
+        similarity = os.getenv("ZENE_CACHE_SIMILARITY")
+        _default_cache = ResponseCache(
+            max_entries=int(os.getenv("ZENE_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("ZENE_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            path=os.getenv("ZENE_CACHE_PATH"),
+            similarity_threshold=float(similarity) if similarity else None,
+        )
+    return _default_cache
@@ -0,0 +1,193 @@
+"""
+Two-tier model cascade for the Zene classifier.
+
+Queries are classified by the cheap model first with logprobs enabled. The
+probability the model assigned to each routing enum (next_agent,
+query_category, target) is read back from the token logprobs, and only
+classifications whose least confident enum falls below the threshold are
+re-run on the strong model.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from prompt_assembly import cached_tokens
+
+logger = logging.getLogger(__name__)
+
+# Model name that selects the cascade in SnowBlaze
+CASCADE = "cascade"
+
+# Schema fields whose values decide routing
+ENUM_FIELDS = ("next_agent", "query_category", "target")
+
+# USD per million tokens
+MODEL_PRICES = {
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+}
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """Token counts from a usage object or dict."""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    get = usage.get if isinstance(usage, dict) else lambda name, default=0: getattr(usage, name, default)
+    return {
+        "prompt_tokens": get("prompt_tokens", 0) or 0,
+        "completion_tokens": get("completion_tokens", 0) or 0,
+        "total_tokens": get("total_tokens", 0) or 0,
+        "cached_tokens": get("cached_tokens", 0) or cached_tokens(usage),
+    }
+
+
+def request_cost(model: str, usage: Any) -> float:
+    """Estimated USD cost of a completion, 0 for models without a price."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    counts = usage_counts(usage)
+    uncached = counts["prompt_tokens"] - counts["cached_tokens"]
+    return (uncached * prices["input"] + counts["cached_tokens"] * prices["cached_input"]
+            + counts["completion_tokens"] * prices["output"]) / 1_000_000
+
+
+def enum_confidence(content: str, token_logprobs: List[Tuple[str, float]],
+                    fields: Tuple[str, ...] = ENUM_FIELDS) -> Dict[str, float]:
+    """
+    Probability the model gave each enum value, from the logprobs of its tokens.
+
+    Args:
+        content: Generated JSON
+        token_logprobs: (token, logprob) pairs covering the content in order
+        fields: Top-level string fields to score
+
+    Returns:
+        Field name -> probability of the generated value; fields that are
+        missing from the content are left out
+    """
+    spans, position = [], 0
+    for token, logprob in token_logprobs:
+        spans.append((position, position + len(token), logprob))
+        position += len(token)
+
+    confidences = {}
+    for field in fields:
+        match = re.search(rf'"{re.escape(field)}"\s*:\s*"([^"]*)"', content)
+        if match is None:
+            continue
+        start, end = match.span(1)
+        confidences[field] = math.exp(sum(logprob for token_start, token_end, logprob in spans
+                                          if token_start < end and token_end > start))
+    return confidences
+
+
+def token_logprobs_of(logprobs: Any) -> List[Tuple[str, float]]:
+    """Flatten a choice's logprobs (or a list of streamed ones) into (token, logprob) pairs."""
+    if logprobs is None:
+        return []
+    if isinstance(logprobs, list):
+        return [pair for item in logprobs for pair in token_logprobs_of(item)]
+    return [(entry.token, entry.logprob) for entry in (logprobs.content or [])]
+
+
+def merge_usage(*usages: Any) -> Dict[str, Any]:
+    """Add up the usage of several completions into one usage dict."""
+    total = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    for usage in usages:
+        for name, value in usage_counts(usage).items():
+            total[name] += value
+    cached = total.pop("cached_tokens")
+    total["prompt_tokens_details"] = {"cached_tokens": cached}
+    return total
+
+
+class CascadePolicy:
+    """
+    Escalation policy and per-tier statistics of the cascade.
+    """
+    def __init__(self, cheap_model: str = "gpt-4o-mini", strong_model: str = "gpt-4o",
+                 threshold: Optional[float] = None):
+        """
+        Initialize the cascade.
+
+        Args:
+            cheap_model: Model that classifies every query first
+            strong_model: Model used when the cheap classification is unsure
+            threshold: Minimum enum probability to accept the cheap answer,
+                defaults to ZENE_CASCADE_THRESHOLD or 0.9
+        """
+        self.cheap_model = cheap_model
+        self.strong_model = strong_model
+        self.threshold = threshold if threshold is not None else float(os.getenv("ZENE_CASCADE_THRESHOLD", "0.9"))
+        self._lock = threading.Lock()
+        self.stats = {model: {"calls": 0, "answered": 0, "latency_seconds": 0.0, "cost_usd": 0.0}
+                      for model in (cheap_model, strong_model)}
+
+    def _record(self, model: str, latency: float, usage: Any) -> None:
+        with self._lock:
+            tier = self.stats[model]
+            tier["calls"] += 1
+            tier["latency_seconds"] += latency
+            tier["cost_usd"] += request_cost(model, usage)
+
+    def assess(self, content: str, logprobs: Any, usage: Any, latency: float) -> Dict[str, Any]:
+        """
+        Score a cheap-tier classification and decide whether to escalate.
+
+        Args:
+            content: Cheap model output
+            logprobs: Choice logprobs (or the list of streamed ones)
+            usage: Cheap model usage
+            latency: Cheap model latency in seconds
+
+        Returns:
+            Cascade info with per-field confidence and the escalation decision
+        """
+        self._record(self.cheap_model, latency, usage)
+        confidence = enum_confidence(content, token_logprobs_of(logprobs))
+        try:
+            json.loads(content)
+            parsed = True
+        except (TypeError, json.JSONDecodeError):
+            parsed = False
+        # Escalate when unsure, and when the cheap answer cannot be scored at all
+        lowest = min(confidence.values()) if len(confidence) == len(ENUM_FIELDS) else 0.0
+        escalate = not parsed or lowest < self.threshold
+        info = {
+            "tier": self.cheap_model,
+            "confidence": confidence,
+            "min_confidence": lowest,
+            "threshold": self.threshold,
+            "escalated": escalate,
+            "cheap_latency_seconds": latency,
+        }
+        if not escalate:
+            with self._lock:
+                self.stats[self.cheap_model]["answered"] += 1
+        logger.info(f"Cascade confidence {lowest:.3f} ({confidence}), "
+                    f"{'escalating to ' + self.strong_model if escalate else 'keeping ' + self.cheap_model}")
+        return info
+
+    def escalated(self, info: Dict[str, Any], usage: Any, latency: float) -> None:
+        """Record a strong-tier answer for a query assess() escalated."""
+        self._record(self.strong_model, latency, usage)
+        with self._lock:
+            self.stats[self.strong_model]["answered"] += 1
+        info["tier"] = self.strong_model
+        info["strong_latency_seconds"] = latency
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-tier share of answered queries, average latency and total cost."""
+        with self._lock:
+            answered = sum(tier["answered"] for tier in self.stats.values())
+            return {model: {
+                "hit_rate": tier["answered"] / answered if answered else 0.0,
+                "calls": tier["calls"],
+                "avg_latency_seconds": tier["latency_seconds"] / tier["calls"] if tier["calls"] else 0.0,
+                "cost_usd": tier["cost_usd"],
+            } for model, tier in self.stats.items()}
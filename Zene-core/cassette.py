@@ -0,0 +1,322 @@
+"""
+Record and replay OpenAI HTTP traffic for offline runs and benchmarks.
+
+Usage:
+    ZENE_LLM_MODE=record python runner.py ...      # call the API and record every exchange
+    ZENE_LLM_MODE=replay python bench_offline.py   # serve the recorded exchanges, no network
+    python cassette.py stats                       # what a cassette holds
+
+The transports sit under the pooled clients (see clients.py), so SnowBlaze,
+agentic-wars agents and battles run unmodified in either mode. A cassette
+is a SQLite file holding one row per exchange, keyed by a hash of the
+method, path and canonical JSON body, with the response body compressed.
+The user profile message is left out of the key: it changes as every
+turn folds its topics into the profile store, so a script would
+otherwise never replay twice.
+A request recorded several times is replayed in the recorded order, then
+from the start again. Replay waits the recorded latency (or a fixed
+synthetic one) plus seeded uniform jitter, so runs are repeatable.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from profiles import PROFILE_HEADER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_PATH = os.path.join("conversations", "cassette.db")
+
+# Response headers not replayed: the body is stored decoded and re-framed by httpx
+_DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "date"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    model TEXT,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    latency_seconds REAL NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (key, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _is_volatile(message: Any) -> bool:
+    """Messages that differ between otherwise identical runs (the user profile snippet)."""
+    return (isinstance(message, dict) and message.get("role") == "system"
+            and isinstance(message.get("content"), str) and message["content"].startswith(PROFILE_HEADER))
+
+
+def request_key(request: httpx.Request) -> Tuple[str, Optional[str]]:
+    """
+    Return (key, model) of a request.
+
+    JSON bodies are canonicalized so key order does not matter, and the
+    profile snippet message is dropped from them.
+    """
+    body = request.content or b""
+    model = None
+    try:
+        parsed = json.loads(body) if body else None
+        if isinstance(parsed, dict):
+            model = parsed.get("model")
+            if isinstance(parsed.get("messages"), list):
+                parsed["messages"] = [message for message in parsed["messages"] if not _is_volatile(message)]
+        body = json.dumps(parsed, sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode() + body).hexdigest()
+    return digest, model
+
+
+class Cassette:
+    """
+    SQLite store of recorded exchanges.
+    """
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH):
+        """
+        Open (and create if needed) a cassette.
+
+        Args:
+            path: SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        # key -> recorded responses, loaded on first use
+        self._loaded: Dict[str, List[tuple]] = {}
+        self._positions: Dict[str, int] = {}
+
+    def record(self, request: httpx.Request, response: httpx.Response, latency: float) -> None:
+        """
+        Store one exchange after the ones already recorded for the same request.
+
+        Args:
+            request: Request sent
+            response: Response received, already read
+            latency: Seconds between sending the request and reading the whole response
+        """
+        key, model = request_key(request)
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS}
+        with self._lock:
+            seq = self._db.execute("SELECT COUNT(*) FROM exchanges WHERE key = ?", (key,)).fetchone()[0]
+            self._db.execute(
+                "INSERT INTO exchanges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, seq, request.method, request.url.path, model, response.status_code, json.dumps(headers),
+                 zlib.compress(response.content), latency, time.time())
+            )
+            self._db.commit()
+            self._loaded.pop(key, None)
+
+    def next_response(self, request: httpx.Request) -> Optional[Tuple[int, Dict[str, str], bytes, float]]:
+        """
+        Next recorded (status, headers, body, latency) for a request, None when it was never recorded.
+        """
+        key, _ = request_key(request)
+        with self._lock:
+            responses = self._loaded.get(key)
+            if responses is None:
+                responses = self._loaded[key] = self._db.execute(
+                    "SELECT status, headers, body, latency_seconds FROM exchanges WHERE key = ? ORDER BY seq", (key,)
+                ).fetchall()
+            if not responses:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            status, headers, body, latency = responses[position % len(responses)]
+        return status, json.loads(headers), zlib.decompress(body), latency
+
+    def models(self) -> List[str]:
+        """Models that appear in the recorded requests."""
+        with self._lock:
+            return [model for (model,) in self._db.execute(
+                "SELECT DISTINCT model FROM exchanges WHERE model IS NOT NULL ORDER BY model"
+            )]
+
+    def rewind(self) -> None:
+        """Replay every request from its first recorded response again."""
+        with self._lock:
+            self._positions.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Exchanges, stored bytes and average latency per path and model."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, COALESCE(model, '-'), COUNT(*), SUM(LENGTH(body)), AVG(latency_seconds) "
+                "FROM exchanges GROUP BY path, model ORDER BY path, model"
+            ).fetchall()
+        return {f"{path} {model}": {"exchanges": count, "bytes": size, "avg_latency_seconds": latency}
+                for path, model, count, size, latency in rows}
+
+
+class _Replayer:
+    """Builds replayed responses and their delays; shared by the sync and async transports."""
+    def __init__(self, cassette: Cassette, latency: Optional[float] = None, jitter: float = 0.0,
+                 seed: Optional[int] = 0):
+        self.cassette = cassette
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def respond(self, request: httpx.Request) -> Tuple[httpx.Response, float]:
+        recorded = self.cassette.next_response(request)
+        if recorded is None:
+            if request.method == "GET" and request.url.path.rstrip("/").endswith("/models"):
+                return self._models_response(request), self._delay(0.0)
+            key, model = request_key(request)
+            logger.warning(f"No recorded response for {request.method} {request.url.path} ({model}, {key[:12]})")
+            body = json.dumps({"error": {"message": f"No recorded response for this request ({key[:12]})",
+                                         "type": "cassette_miss", "code": "cassette_miss"}}).encode()
+            return httpx.Response(404, headers={"content-type": "application/json"}, content=body,
+                                  request=request), 0.0
+        status, headers, body, latency = recorded
+        return httpx.Response(status, headers=headers, content=body, request=request), self._delay(latency)
+
+    def _delay(self, recorded: float) -> float:
+        base = recorded if self.latency is None else self.latency
+        if not self.jitter:
+            return base
+        with self._random_lock:
+            return max(0.0, base + self._random.uniform(-self.jitter, self.jitter))
+
+    def _models_response(self, request: httpx.Request) -> httpx.Response:
+        """Answer models.list() (e.g. API key validation) from the models in the cassette."""
+        body = json.dumps({"object": "list", "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "cassette"} for model in self.cassette.models()
+        ]}).encode()
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=body, request=request)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """httpx transport that forwards requests and records every exchange in a cassette."""
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        self._transport = transport
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start_time = time.perf_counter()
+        response = self._transport.handle_request(request)
+        # Streams are read whole before they are handed on, so recorded latency covers the full body
+        content = response.read()
+        self.cassette.record(request, response, time.perf_counter() - start_time)
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async version of RecordingTransport."""
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self._transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start_time = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        content = await response.aread()
+        self.cassette.record(request, response, time.perf_counter() - start_time)
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """
+    httpx transport that answers from a cassette without touching the network.
+
+    Requests that were never recorded get a 404 "cassette_miss" error, which
+    the OpenAI SDK raises without retrying.
+    """
+    def __init__(self, cassette: Cassette, latency: Optional[float] = None, jitter: float = 0.0,
+                 seed: Optional[int] = 0):
+        """
+        Initialize the transport.
+
+        Args:
+            cassette: Recorded exchanges
+            latency: Fixed latency per request in seconds, None for the recorded latency
+            jitter: Uniform jitter added to the latency, in seconds either way
+            seed: Seed of the jitter, None for a different sequence every run
+        """
+        self._replayer = _Replayer(cassette, latency, jitter, seed)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response, delay = self._replayer.respond(request)
+        if delay:
+            time.sleep(delay)
+        return response
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Async version of ReplayTransport."""
+    def __init__(self, cassette: Cassette, latency: Optional[float] = None, jitter: float = 0.0,
+                 seed: Optional[int] = 0):
+        self._replayer = _Replayer(cassette, latency, jitter, seed)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response, delay = self._replayer.respond(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """Get the process-wide cassette at a path, defaulting to ZENE_CASSETTE (conversations/cassette.db)."""
+    path = path or os.getenv("ZENE_CASSETTE", DEFAULT_CASSETTE_PATH)
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = _cassettes[path] = Cassette(path)
+    return cassette
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cassette", default=os.getenv("ZENE_CASSETTE", DEFAULT_CASSETTE_PATH), help="SQLite file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Print exchanges, size and latency per path and model")
+
+    args = parser.parse_args()
+    for name, row in Cassette(args.cassette).stats().items():
+        print(f"{name:<40} {row['exchanges']:6d} exchanges {row['bytes'] / 1024:9.1f} KiB "
+              f"{row['avg_latency_seconds']:7.3f}s avg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Chat transcript rendering for the Streamlit app.
+
+Each message's HTML is built once, when the message is added to the chat
+history, and stored on the message. A rerun then renders only a window of
+the most recent messages as one markdown block, so rerun time depends on
+the window size rather than on the length of the session.
+"""
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+# Messages rendered by default and added per "load older" click
+DEFAULT_WINDOW = int(os.getenv("ZENE_CHAT_WINDOW", "20"))
+
+CHAT_STYLE = """
+<style>
+.user-message {
+    background-color: #e6f7ff;
+    padding: 10px;
+    border-radius: 10px;
+    margin: 5px 0;
+    border-left: 5px solid #1e90ff;
+}
+.assistant-message {
+    background-color: #f0f0f0;
+    padding: 10px;
+    border-radius: 10px;
+    margin: 5px 0;
+    border-left: 5px solid #2e8b57;
+}
+</style>
+"""
+
+
+def display_text(content: Any) -> str:
+    """Text shown for a message: the response or explanation field of a JSON reply, else the whole payload."""
+    if isinstance(content, dict):
+        if "response" in content:
+            return content["response"]
+        if "explanation" in content:
+            return content["explanation"]
+        return json.dumps(content, indent=2)
+    return content
+
+
+def render_message(message: Dict[str, Any]) -> str:
+    """Build the HTML block for one chat message."""
+    if message["role"] == "user":
+        return (f'<div class="user-message">\n<strong>You ({message["timestamp"]}):</strong><br>\n'
+                f'{message["content"]}\n</div>')
+    return (f'<div class="assistant-message">\n<strong>Zene ({message["timestamp"]}):</strong><br>\n'
+            f'{display_text(message["content"])}\n</div>')
+
+
+def chat_message(role: str, content: Any, timestamp: str, **extra: Any) -> Dict[str, Any]:
+    """
+    Create a chat history entry with its HTML pre-rendered.
+
+    Args:
+        role: "user" or "assistant"
+        content: Message text or JSON response
+        timestamp: Display timestamp
+        **extra: Additional fields kept on the entry (usage, processing_time, ...)
+
+    Returns:
+        Dict[str, Any]: The chat history entry
+    """
+    message = {"role": role, "content": content, "timestamp": timestamp, **extra}
+    message["html"] = render_message(message)
+    return message
+
+
+def visible_window(chat_history: List[Dict[str, Any]], window: int) -> Tuple[int, str]:
+    """
+    Select the most recent messages and join their cached HTML.
+
+    Args:
+        chat_history: Chat history entries, oldest first
+        window: Number of recent messages to show
+
+    Returns:
+        Tuple[int, str]: Number of older messages hidden, and the HTML of the shown ones
+    """
+    hidden = max(len(chat_history) - window, 0)
+    blocks = []
+    for message in chat_history[hidden:]:
+        if "html" not in message:
+            message["html"] = render_message(message)
+        blocks.append(message["html"])
+    return hidden, "\n\n".join(blocks)
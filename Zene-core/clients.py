@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from cassette import (AsyncRecordingTransport, AsyncReplayTransport, RecordingTransport, ReplayTransport,
+                      get_cassette)
+from ratelimit import (INTERACTIVE, AsyncRateLimitedTransport, RateLimitedTransport,
+                       get_scheduler)
+
+logger = logging.getLogger(__name__)
+
+# Load .env once per process instead of once per agent
+load_dotenv()
+
+# Connection pool settings shared by every client in the registry
+POOL_SETTINGS = {
+    "max_connections": int(os.getenv("ZENE_MAX_CONNECTIONS", "100")),
+    "max_keepalive_connections": int(os.getenv("ZENE_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    "keepalive_expiry": float(os.getenv("ZENE_KEEPALIVE_EXPIRY", "30")),
+}
+
+# Seconds a successful API key validation is trusted before asking the API again
+KEY_VALIDATION_TTL = float(os.getenv("ZENE_KEY_VALIDATION_TTL", "3600"))
+# Failed validations are retried sooner so a fixed key or network blip recovers quickly
+KEY_FAILURE_TTL = 60.0
+
+# Route chat, completion and embedding calls through the shared rate-limit scheduler
+RATE_LIMITING = os.getenv("ZENE_RATE_LIMIT", "1") != "0"
+
+# Where model requests go: "live" (the API), "record" (the API, recording every exchange),
+# "replay" (recorded exchanges only, see cassette.py) or "stub" (an in-process stub server)
+LLM_MODES = ("live", "record", "replay", "stub")
+TRANSPORT_SETTINGS = {
+    "mode": os.getenv("ZENE_LLM_MODE", "live"),
+    "cassette": os.getenv("ZENE_CASSETTE") or None,
+    # Seconds per replayed or stubbed request, None for the recorded latency
+    "latency": None if os.getenv("ZENE_REPLAY_LATENCY", "recorded") == "recorded"
+    else float(os.getenv("ZENE_REPLAY_LATENCY")),
+    "jitter": float(os.getenv("ZENE_REPLAY_JITTER", "0")),
+}
+# API key used offline when none is configured
+OFFLINE_API_KEY = "offline"
+
+_clients: Dict[Tuple[str, str, bool, str, str], Any] = {}
+_validations: Dict[Tuple[str, str], Tuple[float, bool, str]] = {}
+_lock = threading.Lock()
+_stub_lock = threading.Lock()
+_stub_base_url: Optional[str] = None
+
+
+def configure_pool(max_connections: Optional[int] = None,
+                   max_keepalive_connections: Optional[int] = None,
+                   keepalive_expiry: Optional[float] = None) -> None:
+    """
+    Tune the connection pool used by clients created after this call.
+
+    Args:
+        max_connections: Maximum number of concurrent connections per client
+        max_keepalive_connections: Maximum number of idle connections kept open
+        keepalive_expiry: Seconds an idle connection is kept before closing
+    """
+    if max_connections is not None:
+        POOL_SETTINGS["max_connections"] = max_connections
+    if max_keepalive_connections is not None:
+        POOL_SETTINGS["max_keepalive_connections"] = max_keepalive_connections
+    if keepalive_expiry is not None:
+        POOL_SETTINGS["keepalive_expiry"] = keepalive_expiry
+
+
+def configure_transport(mode: Optional[str] = None, cassette: Optional[str] = None,
+                        latency: Union[float, str, None] = None, jitter: Optional[float] = None) -> None:
+    """
+    Choose where requests of clients created after this call go.
+
+    Args:
+        mode: One of LLM_MODES
+        cassette: Cassette file for record and replay modes
+        latency: Seconds per replayed or stubbed request, or "recorded"
+        jitter: Uniform jitter on that latency, in seconds either way
+    """
+    if mode is not None:
+        if mode not in LLM_MODES:
+            raise ValueError(f"Unknown LLM mode: {mode}")
+        TRANSPORT_SETTINGS["mode"] = mode
+    if cassette is not None:
+        TRANSPORT_SETTINGS["cassette"] = cassette
+    if latency is not None:
+        TRANSPORT_SETTINGS["latency"] = None if latency == "recorded" else float(latency)
+    if jitter is not None:
+        TRANSPORT_SETTINGS["jitter"] = jitter
+
+
+def _offline_base_url() -> str:
+    """Base URL of the in-process stub server, started on first use."""
+    global _stub_base_url
+    with _stub_lock:
+        if _stub_base_url is None:
+            from stub_server import start_stub_server
+            latency = TRANSPORT_SETTINGS["latency"]
+            _, _stub_base_url = start_stub_server(latency=0.05 if latency is None else latency,
+                                                  jitter=TRANSPORT_SETTINGS["jitter"])
+            logger.info(f"Started stub OpenAI server at {_stub_base_url}")
+    return _stub_base_url
+
+
+def _resolve(api_key: Optional[str], base_url: Optional[str]) -> Tuple[str, str]:
+    """Resolve credentials like the OpenAI SDK does; offline modes need no real key."""
+    mode = TRANSPORT_SETTINGS["mode"]
+    api_key = api_key or os.getenv("OPENAI_API_KEY") or ""
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or ""
+    if mode in ("replay", "stub"):
+        api_key = api_key or OFFLINE_API_KEY
+    if mode == "stub":
+        base_url = _offline_base_url()
+    return api_key, base_url
+
+
+def _registry_key(api_key: Optional[str], base_url: Optional[str], is_async: bool,
+                  priority: str = INTERACTIVE) -> Tuple[str, str, bool, str, str]:
+    """Resolve credentials and build the registry key."""
+    api_key, base_url = _resolve(api_key, base_url)
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    return key_hash, base_url, is_async, priority, TRANSPORT_SETTINGS["mode"]
+
+
+def _base_transport(is_async: bool, limits: httpx.Limits) -> Any:
+    """The transport under the rate limiter: the network, a recorder around it, or a replayer."""
+    mode = TRANSPORT_SETTINGS["mode"]
+    if mode == "replay":
+        replay = AsyncReplayTransport if is_async else ReplayTransport
+        return replay(get_cassette(TRANSPORT_SETTINGS["cassette"]), TRANSPORT_SETTINGS["latency"],
+                      TRANSPORT_SETTINGS["jitter"])
+    transport = httpx.AsyncHTTPTransport(limits=limits) if is_async else httpx.HTTPTransport(limits=limits)
+    if mode == "record":
+        record = AsyncRecordingTransport if is_async else RecordingTransport
+        return record(transport, get_cassette(TRANSPORT_SETTINGS["cassette"]))
+    return transport
+
+
+def _create_client(api_key: Optional[str], base_url: Optional[str], is_async: bool,
+                   key_hash: str, priority: str) -> Any:
+    """Build a new OpenAI client with the configured connection pool and rate limiting."""
+    api_key, base_url = _resolve(api_key, base_url)
+    limits = httpx.Limits(**POOL_SETTINGS)
+    base_transport = _base_transport(is_async, limits)
+    # Clients of one API key share its rate-limit budgets, whatever their priority
+    scheduler = get_scheduler(key_hash) if RATE_LIMITING else None
+    # The transports also report requests to telemetry, so they are installed even without rate limiting
+    if is_async:
+        transport = AsyncRateLimitedTransport(base_transport, scheduler, priority)
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=openai.DefaultAsyncHttpxClient(limits=limits, transport=transport),
+        )
+    transport = RateLimitedTransport(base_transport, scheduler, priority)
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=base_url or None,
+        http_client=openai.DefaultHttpxClient(limits=limits, transport=transport),
+    )
+
+
+def _get(api_key: Optional[str], base_url: Optional[str], is_async: bool, priority: str) -> Any:
+    key = _registry_key(api_key, base_url, is_async, priority)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _create_client(api_key, base_url, is_async, key[0], priority)
+                _clients[key] = client
+                logger.info(f"Created pooled {'async ' if is_async else ''}{priority} OpenAI client "
+                            f"(base_url={key[1] or 'default'}, mode={key[4]}, pool={POOL_SETTINGS})")
+    return client
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+               priority: str = INTERACTIVE) -> openai.OpenAI:
+    """
+    Get the process-wide OpenAI client for an API key and base URL.
+
+    Args:
+        api_key: API key, defaults to OPENAI_API_KEY
+        base_url: API base URL, defaults to OPENAI_BASE_URL or the OpenAI endpoint
+        priority: "interactive" for user-facing calls, "batch" for bulk jobs
+            that should yield to them under rate limits
+
+    Returns:
+        A shared client whose connection pool is reused across callers
+    """
+    return _get(api_key, base_url, is_async=False, priority=priority)
+
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                     priority: str = INTERACTIVE) -> openai.AsyncOpenAI:
+    """
+    Get the process-wide AsyncOpenAI client for an API key and base URL.
+
+    The async connection pool is bound to the event loop that first uses it,
+    so drive all async agents from one long-lived loop.
+
+    Args:
+        api_key: API key, defaults to OPENAI_API_KEY
+        base_url: API base URL, defaults to OPENAI_BASE_URL or the OpenAI endpoint
+        priority: "interactive" for user-facing calls, "batch" for bulk jobs
+
+    Returns:
+        A shared async client whose connection pool is reused across callers
+    """
+    return _get(api_key, base_url, is_async=True, priority=priority)
+
+
+def validate_api_key(api_key: Optional[str] = None, base_url: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Check an API key with a models.list() call, caching the result by key hash.
+
+    Repeated checks of the same key within the TTL cost no network calls, so
+    UIs can validate on every rerun.
+
+    Args:
+        api_key: API key, defaults to OPENAI_API_KEY
+        base_url: API base URL, defaults to OPENAI_BASE_URL or the OpenAI endpoint
+
+    Returns:
+        (is_valid, message)
+    """
+    key_hash, resolved_base_url, _, _, _ = _registry_key(api_key, base_url, is_async=False)
+    cached = _validations.get((key_hash, resolved_base_url))
+    if cached and cached[0] > time.time():
+        return cached[1], cached[2]
+
+    try:
+        get_client(api_key, base_url).models.list()
+        result = (True, "API key is valid")
+    except Exception as e:
+        logger.error(f"API key validation failed: {e}")
+        result = (False, f"Invalid API key: {str(e)}")
+    ttl = KEY_VALIDATION_TTL if result[0] else KEY_FAILURE_TTL
+    _validations[(key_hash, resolved_base_url)] = (time.time() + ttl, *result)
+    return result
+
+
+def close_clients() -> None:
+    """Close every sync client in the registry and forget all clients."""
+    with _lock:
+        for (_, _, is_async, _, _), client in _clients.items():
+            if not is_async:
+                client.close()
+        _clients.clear()
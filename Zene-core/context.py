@@ -0,0 +1,137 @@
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - exercised only without tiktoken
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Token budget for conversation history (excluding the system prompt) per model
+MODEL_HISTORY_BUDGETS = {
+    "gpt-4o": 4000,
+    "gpt-4o-mini": 4000,
+    "o3-mini": 4000,
+}
+DEFAULT_HISTORY_BUDGET = 4000
+
+# Fixed per-message overhead of the chat format (role markers and separators)
+TOKENS_PER_MESSAGE = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Resolve the tiktoken encoding for a model, or None if unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Results are cached per (text, model), so a message is only tokenized the
+    first time it is seen. Without tiktoken a ~4 characters per token
+    estimate is used.
+
+    Args:
+        text: Text to count
+        model: Model whose tokenizer to use
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(message: Dict[str, str], model: str = "gpt-4o") -> int:
+    """Count the tokens of one chat message including format overhead."""
+    return TOKENS_PER_MESSAGE + count_text_tokens(message.get("content") or "", model)
+
+
+class ContextWindow:
+    """
+    Keeps conversation history under a per-model token budget.
+    """
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: int = DEFAULT_HISTORY_BUDGET,
+                 high_watermark: float = 1.0, low_watermark: float = 1.0):
+        """
+        Initialize the context window.
+
+        Args:
+            budgets: Optional per-model history budgets overriding the defaults
+            default_budget: Budget for models without an explicit entry
+            high_watermark: Fraction of the budget at which eviction starts
+            low_watermark: Fraction of the budget eviction trims down to
+        """
+        self.budgets = dict(MODEL_HISTORY_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.default_budget = default_budget
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+
+    def budget_for(self, model: str) -> int:
+        """Return the history token budget for a model."""
+        return self.budgets.get(model, self.default_budget)
+
+    def count(self, messages: List[Dict[str, str]], model: str = "gpt-4o") -> int:
+        """Count the tokens of a list of chat messages."""
+        return sum(count_message_tokens(message, model) for message in messages)
+
+    def fit(self, messages: List[Dict[str, str]], model: str = "gpt-4o",
+            reserve: int = 0) -> Tuple[List[Dict[str, str]], List[Dict[str, str]], Dict[str, int]]:
+        """
+        Drop the oldest turns until the history fits the model's budget.
+
+        Once the history grows past the high watermark it is trimmed down to
+        the low watermark, so evictions happen in batches rather than on
+        every turn. A leading system message (the conversation summary) is
+        always kept. User/assistant turns are evicted oldest first, never
+        splitting a user message from the assistant reply that follows it.
+
+        Args:
+            messages: Conversation history, oldest first
+            model: Model the history will be sent to
+            reserve: Tokens to keep free for the upcoming prompt
+
+        Returns:
+            Tuple of (kept messages, evicted messages, token statistics)
+        """
+        budget = self.budget_for(model) - reserve
+        pinned = messages[:1] if messages and messages[0].get("role") == "system" else []
+        turns = messages[len(pinned):]
+
+        counts = [count_message_tokens(message, model) for message in turns]
+        total = sum(counts) + self.count(pinned, model)
+
+        start = 0
+        target = budget * self.low_watermark if total > budget * self.high_watermark else total
+        while total > target and start < len(turns):
+            # Evict a whole user/assistant exchange at a time
+            step = 2 if start + 1 < len(turns) and turns[start].get("role") == "user" \
+                and turns[start + 1].get("role") == "assistant" else 1
+            total -= sum(counts[start:start + step])
+            start += step
+
+        evicted = turns[:start]
+        stats = {
+            "history_tokens": total,
+            "evicted_tokens": sum(counts[:start]),
+            "evicted_messages": len(evicted),
+            "budget": budget,
+        }
+        if evicted:
+            logger.info(f"Context window evicted {len(evicted)} messages "
+                        f"({stats['evicted_tokens']} tokens) for {model}")
+        return pinned + turns[start:], evicted, stats
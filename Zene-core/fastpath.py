@@ -0,0 +1,361 @@
+"""
+Offline fast path that classifies trivial queries without an LLM call.
+
+Usage:
+    python fastpath.py train fastpath.npz --db conversations/zene.db --json-dir conversations
+    python fastpath.py train fastpath.npz --labels results.jsonl    # batch.py classify output
+    python fastpath.py predict fastpath.npz "hi" "thanks!" "explain the chola administration"
+
+A multinomial logistic regression over hashed word unigrams, word bigrams
+and character trigrams predicts the routing triple (next_agent,
+query_category, target) of a message. Chit-chat labels are served from a
+response template learned from the logged classifications; everything else,
+and anything below the confidence threshold, falls back to the LLM.
+
+The model file is a compressed .npz holding only the non-zero weight rows in
+float16 plus a JSON header with the labels and response templates.
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Routing fields that make up a label
+LABEL_FIELDS = ("next_agent", "query_category", "target")
+# Query categories answered from templates
+SERVED_CATEGORIES = ("chat",)
+DEFAULT_BUCKETS = 1 << 18
+DEFAULT_THRESHOLD = 0.95
+# Longer messages always go to the LLM
+DEFAULT_MAX_WORDS = 12
+
+
+def label_of(response: Dict[str, Any]) -> Optional[str]:
+    """Routing label "next_agent/query_category/target" of a classification, None if incomplete."""
+    values = [response.get(field) for field in LABEL_FIELDS]
+    if not all(isinstance(value, str) for value in values):
+        return None
+    return "/".join(values)
+
+
+def hashed_features(text: str, buckets: int = DEFAULT_BUCKETS) -> np.ndarray:
+    """
+    Hash a message into sorted, de-duplicated feature buckets.
+
+    Features are word unigrams, word bigrams, character trigrams of the
+    normalized text and a message length marker.
+    """
+    text = normalize_text(text)
+    words = text.split()
+    padded = f" {text} "
+    grams = [f"w:{word}" for word in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    grams.append(f"len:{min(len(words), 10)}")
+    mask = buckets - 1
+    return np.array(sorted({zlib.crc32(gram.encode()) & mask for gram in grams}), dtype=np.int64)
+
+
+def _response_template(responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Most common value of every field across the logged responses of one label."""
+    template = {}
+    for field in responses[0]:
+        counts = Counter(json.dumps(response.get(field), sort_keys=True) for response in responses)
+        template[field] = json.loads(counts.most_common(1)[0][0])
+    return template
+
+
+class FastPathClassifier:
+    """
+    Hashed n-gram linear classifier for the routing fields of the Zene schema.
+    """
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: List[str],
+                 templates: Dict[str, Dict[str, Any]], threshold: Optional[float] = None,
+                 max_words: int = DEFAULT_MAX_WORDS, meta: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the classifier.
+
+        Args:
+            weights: (buckets, labels) weight matrix
+            bias: Per-label bias
+            labels: Routing labels, in weight column order
+            templates: Response template per served label
+            threshold: Minimum probability to answer locally, defaults to
+                ZENE_FASTPATH_THRESHOLD or 0.95
+            max_words: Messages with more words always fall back to the LLM
+            meta: Training metadata kept in the model file
+        """
+        self.weights = weights
+        self.bias = bias
+        self.labels = labels
+        self.templates = templates
+        self._contents = {label: json.dumps(template) for label, template in templates.items()}
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("ZENE_FASTPATH_THRESHOLD", str(DEFAULT_THRESHOLD)))
+        self.max_words = max_words
+        self.meta = meta or {}
+        self.stats = {"answered": 0, "fallbacks": 0}
+
+    @property
+    def buckets(self) -> int:
+        return self.weights.shape[0]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Predict the routing label of a message.
+
+        Returns:
+            Tuple of (label, probability)
+        """
+        features = hashed_features(text, self.buckets)
+        logits = self.weights[features].sum(axis=0) / math.sqrt(len(features)) + self.bias
+        logits = np.exp(logits - logits.max())
+        best = int(logits.argmax())
+        return self.labels[best], float(logits[best] / logits.sum())
+
+    def classify(self, text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Answer a trivial query locally.
+
+        Args:
+            text: User message
+
+        Returns:
+            Tuple of (response JSON, {"label", "confidence"}), or None when
+            the message should go to the LLM
+        """
+        if len(text.split()) > self.max_words:
+            self.stats["fallbacks"] += 1
+            return None
+        label, confidence = self.predict(text)
+        content = self._contents.get(label)
+        if content is None or confidence < self.threshold:
+            self.stats["fallbacks"] += 1
+            return None
+        self.stats["answered"] += 1
+        return content, {"label": label, "confidence": confidence}
+
+    @classmethod
+    def train(cls, examples: Sequence[Tuple[str, Dict[str, Any]]], buckets: int = DEFAULT_BUCKETS,
+              epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-4,
+              served_categories: Sequence[str] = SERVED_CATEGORIES, **kwargs) -> "FastPathClassifier":
+        """
+        Fit the classifier on logged classifications.
+
+        Args:
+            examples: (user message, parsed classifier response) pairs
+            buckets: Feature hash buckets, a power of two
+            epochs: Full-batch Adagrad iterations
+            learning_rate: Adagrad learning rate
+            l2: L2 regularization strength
+            served_categories: Query categories answered from templates
+            **kwargs: Passed to the constructor (threshold, max_words)
+
+        Returns:
+            Trained classifier
+        """
+        by_label: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for text, response in examples:
+            label = label_of(response)
+            if label is not None and text.strip():
+                by_label.setdefault(label, []).append((text, response))
+        if not by_label:
+            raise ValueError("No labeled examples to train on")
+        labels = sorted(by_label)
+        texts = [text for label in labels for text, _ in by_label[label]]
+        targets = np.array([i for i, label in enumerate(labels) for _ in by_label[label]])
+
+        rows = [hashed_features(text, buckets) for text in texts]
+        lengths = np.array([len(row) for row in rows])
+        # Train on the buckets that occur, then scatter them into the full table
+        touched, flat = np.unique(np.concatenate(rows), return_inverse=True)
+        owners = np.repeat(np.arange(len(rows)), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        scale = (1.0 / np.sqrt(lengths))[:, None]
+
+        compact = np.zeros((len(touched), len(labels)), dtype=np.float32)
+        bias = np.zeros(len(labels), dtype=np.float32)
+        compact_squares = np.zeros_like(compact)
+        bias_squares = np.zeros_like(bias)
+        for _ in range(epochs):
+            logits = np.add.reduceat(compact[flat], starts) * scale + bias
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            probs[np.arange(len(rows)), targets] -= 1.0
+            probs /= len(rows)
+            row_grad = (probs * scale)[owners]
+            compact_grad = l2 * compact + np.stack(
+                [np.bincount(flat, weights=row_grad[:, k], minlength=len(touched)) for k in range(len(labels))],
+                axis=1)
+            bias_grad = probs.sum(axis=0)
+            compact_squares += compact_grad ** 2
+            compact -= learning_rate * compact_grad / (np.sqrt(compact_squares) + 1e-8)
+            bias_squares += bias_grad ** 2
+            bias -= learning_rate * bias_grad / (np.sqrt(bias_squares) + 1e-8)
+        weights = np.zeros((buckets, len(labels)), dtype=np.float32)
+        weights[touched] = compact
+
+        templates = {label: _response_template([response for _, response in by_label[label]])
+                     for label in labels if label.split("/")[1] in served_categories}
+        meta = {"examples": len(texts), "trained_at": time.time(),
+                "label_counts": {label: len(by_label[label]) for label in labels}}
+        logger.info(f"Trained fast path on {len(texts)} examples, {len(labels)} labels, "
+                    f"serving {sorted(templates)}")
+        return cls(weights, bias, labels, templates, meta=meta, **kwargs)
+
+    def save(self, path: str) -> None:
+        """Write the model as a compressed .npz with sparse float16 weights."""
+        rows = np.flatnonzero(np.abs(self.weights).max(axis=1) > 1e-4).astype(np.uint32)
+        header = {"labels": self.labels, "templates": self.templates, "buckets": self.buckets,
+                  "threshold": self.threshold, "max_words": self.max_words, "meta": self.meta}
+        with open(path, "wb") as f:
+            np.savez_compressed(f, rows=rows, weights=self.weights[rows].astype(np.float16),
+                                bias=self.bias, header=np.array(json.dumps(header)))
+        logger.info(f"Saved fast path model to {path} ({os.path.getsize(path) / 1024:.0f} KiB, "
+                    f"{len(rows)} non-zero rows)")
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "FastPathClassifier":
+        """
+        Load a model written by save().
+
+        Args:
+            path: Model file
+            threshold: Optional override of the saved confidence threshold
+        """
+        with np.load(path) as data:
+            header = json.loads(str(data["header"]))
+            weights = np.zeros((header["buckets"], len(header["labels"])), dtype=np.float32)
+            weights[data["rows"]] = data["weights"]
+            bias = data["bias"].astype(np.float32)
+        if threshold is None and "ZENE_FASTPATH_THRESHOLD" not in os.environ:
+            threshold = header["threshold"]
+        return cls(weights, bias, header["labels"], header["templates"], threshold=threshold,
+                   max_words=header["max_words"], meta=header["meta"])
+
+
+def _parse_response(response: Any) -> Optional[Dict[str, Any]]:
+    """Parse a logged response (JSON string or dict), None for errors and non-JSON output."""
+    if isinstance(response, dict):
+        return response
+    try:
+        parsed = json.loads(response)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def iter_examples(db_path: Optional[str] = None, json_dir: Optional[str] = None,
+                  label_files: Iterable[str] = ()) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Collect (user message, classification) pairs from the logs.
+
+    Args:
+        db_path: Conversation store with logged turns
+        json_dir: Directory of legacy conversation_*.json exports
+        label_files: batch.py classify result files (JSONL)
+
+    Yields:
+        Unique (message, parsed response) pairs
+    """
+    def candidates():
+        if db_path and os.path.exists(db_path):
+            from store import ConversationStore
+            yield from ConversationStore(db_path).iter_exchanges()
+        if json_dir:
+            for path in sorted(glob.glob(os.path.join(json_dir, "conversation_*.json"))):
+                with open(path) as f:
+                    for record in json.load(f).get("usage_stats", []):
+                        yield record.get("query"), record.get("response")
+        for path in label_files:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    yield record.get("query"), record.get("response")
+
+    seen = set()
+    for query, response in candidates():
+        parsed = _parse_response(response)
+        if not query or parsed is None:
+            continue
+        key = (normalize_text(query), label_of(parsed))
+        if key in seen:
+            continue
+        seen.add(key)
+        yield query, parsed
+
+
+_default_fast_path: Optional[FastPathClassifier] = None
+_default_loaded = False
+_default_lock = threading.Lock()
+
+
+def get_default_fast_path() -> Optional[FastPathClassifier]:
+    """Get the process-wide fast path loaded from ZENE_FASTPATH_MODEL, None when unset or missing."""
+    global _default_fast_path, _default_loaded
+    with _default_lock:
+        if not _default_loaded:
+            _default_loaded = True
+            path = os.getenv("ZENE_FASTPATH_MODEL")
+            if path and os.path.exists(path):
+                _default_fast_path = FastPathClassifier.load(path)
+            elif path:
+                logger.warning(f"Fast path model {path} not found, classifying everything with the LLM")
+    return _default_fast_path
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train = subparsers.add_parser("train", help="Train a model from the logged classifications")
+    train.add_argument("model", help="Output .npz file")
+    train.add_argument("--db", default=os.getenv("ZENE_STORE_PATH", os.path.join("conversations", "zene.db")),
+                       help="Conversation store")
+    train.add_argument("--json-dir", default="conversations", help="Legacy conversation JSON directory")
+    train.add_argument("--labels", nargs="*", default=[], help="batch.py classify result files")
+    train.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help="Feature hash buckets")
+    train.add_argument("--epochs", type=int, default=200)
+    train.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Confidence to answer locally")
+    train.add_argument("--max-words", type=int, default=DEFAULT_MAX_WORDS)
+
+    predict = subparsers.add_parser("predict", help="Classify messages with a trained model")
+    predict.add_argument("model")
+    predict.add_argument("messages", nargs="+")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        examples = list(iter_examples(args.db, args.json_dir, args.labels))
+        model = FastPathClassifier.train(examples, buckets=args.buckets, epochs=args.epochs,
+                                         threshold=args.threshold, max_words=args.max_words)
+        model.save(args.model)
+    else:
+        model = FastPathClassifier.load(args.model)
+        for message in args.messages:
+            label, confidence = model.predict(message)
+            served = model.classify(message) is not None
+            print(f"{label:28s} {confidence:.3f} {'local' if served else 'llm':5s} {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Bounded output history with streaming aggregates.
+
+SnowBlaze records one entry per classification, summary update and reset.
+Only the most recent records are kept in memory, in a ring buffer of
+__slots__ records holding the numeric usage fields; queries, responses and
+summaries are written through to the conversation store and dropped from
+memory. Totals and a log-bucketed latency histogram (for p50/p95/p99) are
+updated as records arrive, so a session's memory stays flat however many
+turns it runs. Cache hits and fast-path answers are counted apart from
+model calls and stay out of the latency figures.
+"""
+import logging
+import math
+import os
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Records kept in memory per session
+DEFAULT_CAPACITY = int(os.getenv("ZENE_HISTORY_CAPACITY", "200"))
+
+# Histogram bucket upper bounds: 8 per decade from 0.1 ms to 1000 s
+LATENCY_BOUNDS = [1e-4 * 10 ** (i / 8) for i in range(8 * 7 + 1)]
+
+_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens")
+_PAYLOAD_FIELDS = ("query", "response", "summary")
+
+
+class LatencyHistogram:
+    """Fixed log-spaced latency buckets; percentiles are accurate to one bucket (~33%)."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, 0 when empty."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else self.max, self.max)
+        return self.max
+
+
+class HistoryRecord:
+    """
+    One output history entry with the usage numbers unpacked into slots.
+
+    Supports record["usage"] and record.get(...) lookups in the shape of the
+    original record dict.
+    """
+    __slots__ = ("kind", "timestamp", "latency_seconds", *_USAGE_FIELDS, "usage_extra", "payload", "extra")
+
+    def __init__(self, record: Dict[str, Any], keep_payload: bool = True):
+        record = dict(record)
+        usage = dict(record.pop("usage", None) or {})
+        self.kind = record.pop("action", "response")
+        self.timestamp = record.pop("timestamp", None)
+        self.latency_seconds = record.pop("latency_seconds", usage.get("latency_seconds"))
+        for field in _USAGE_FIELDS:
+            setattr(self, field, usage.pop(field, 0) or 0)
+        usage.pop("latency_seconds", None)
+        self.usage_extra = usage or None
+        payload = {field: record.pop(field) for field in _PAYLOAD_FIELDS if field in record}
+        self.payload = payload if keep_payload and payload else None
+        self.extra = record or None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Rebuild the record dict (without the payload once it was off-loaded)."""
+        record = {}
+        if self.kind != "response":
+            record["action"] = self.kind
+        if self.payload:
+            record.update(self.payload)
+        usage = {field: getattr(self, field) for field in _USAGE_FIELDS}
+        if self.latency_seconds is not None:
+            usage["latency_seconds"] = self.latency_seconds
+            record["latency_seconds"] = self.latency_seconds
+        if self.usage_extra:
+            usage.update(self.usage_extra)
+        record["usage"] = usage
+        if self.extra:
+            record.update(self.extra)
+        if self.timestamp is not None:
+            record["timestamp"] = self.timestamp
+        return record
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.as_dict().get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.as_dict()[key]
+
+
+class OutputHistory:
+    """
+    Ring buffer of recent HistoryRecords plus totals over every record.
+    """
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 sink: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        """
+        Initialize the history.
+
+        Args:
+            capacity: Records kept in memory
+            sink: Optional callable persisting full records (e.g. the
+                conversation store); payloads are dropped from memory once
+                it succeeds
+        """
+        self.sink = sink
+        self._records = deque(maxlen=capacity)
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop the in-memory records and reset the aggregates."""
+        self._records.clear()
+        self.total_records = 0
+        self.kinds: Dict[str, int] = {}
+        self.totals = {
+            "responses": 0,
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cached_tokens": 0,
+            "trimmed_tokens": 0,
+            "cache_hits": 0,
+            "fast_path": 0,
+            "summary_tokens": 0,
+        }
+        self.latency = LatencyHistogram()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Add a record: persist it, fold it into the aggregates and keep a compact copy.
+
+        Args:
+            record: Output history record as built by SnowBlaze
+        """
+        persisted = False
+        if self.sink is not None:
+            try:
+                self.sink([record])
+                persisted = True
+            except Exception as e:
+                logger.error(f"Failed to persist output record: {e}")
+
+        entry = HistoryRecord(record, keep_payload=not persisted)
+        self.total_records += 1
+        self.kinds[entry.kind] = self.kinds.get(entry.kind, 0) + 1
+        if entry.kind == "response":
+            totals = self.totals
+            totals["responses"] += 1
+            for field in _USAGE_FIELDS:
+                totals[field] += getattr(entry, field)
+            totals["trimmed_tokens"] += (record.get("context") or {}).get("evicted_tokens", 0)
+            if record.get("cache_hit"):
+                totals["cache_hits"] += 1
+            elif "fast_path" in record:
+                totals["fast_path"] += 1
+            else:
+                # Only responses that came from the model count as calls and feed the latency figures
+                totals["calls"] += 1
+                if entry.latency_seconds is not None:
+                    self.latency.add(entry.latency_seconds)
+        else:
+            self.totals["summary_tokens"] += entry.total_tokens
+        self._records.append(entry)
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals over every record.
+
+        "responses" counts every answered query: model "calls", "cache_hits"
+        and "fast_path_answers". Latency average and p50/p95/p99 (in seconds)
+        cover model calls only.
+        """
+        totals = self.totals
+        return {
+            "responses": totals["responses"],
+            "calls": totals["calls"],
+            "total_prompt_tokens": totals["prompt_tokens"],
+            "total_completion_tokens": totals["completion_tokens"],
+            "total_tokens": totals["total_tokens"],
+            "total_cached_tokens": totals["cached_tokens"],
+            "total_trimmed_tokens": totals["trimmed_tokens"],
+            "total_summary_tokens": totals["summary_tokens"],
+            "cache_hits": totals["cache_hits"],
+            "fast_path_answers": totals["fast_path"],
+            "total_latency_seconds": self.latency.total,
+            "avg_latency_seconds": self.latency.total / self.latency.count if self.latency.count else 0.0,
+            "p50_latency_seconds": self.latency.percentile(50),
+            "p95_latency_seconds": self.latency.percentile(95),
+            "p99_latency_seconds": self.latency.percentile(99),
+            "max_latency_seconds": self.latency.max,
+        }
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return iter(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._records)[index]
+        return self._records[index]
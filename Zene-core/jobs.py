@@ -0,0 +1,166 @@
+"""
+Background jobs that outlive a Streamlit script run.
+
+Streamlit re-executes the app script on every interaction, and a rerun in
+the middle of a blocking model call throws the call away. Jobs submitted
+here run on a process-wide thread pool instead; the script only keeps the
+job id in session state and polls the job (typically from a fragment with
+run_every) for the events produced so far. A rerun, or several sessions
+at once, simply pick up their jobs where they are.
+
+A job function may return a value or an iterator: every item an iterator
+yields is appended to job.events as it arrives, so streamed
+classification fields and battle turns can be shown before the job ends.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """State of one background job, safe to read from any thread."""
+    def __init__(self, kind: str = ""):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = RUNNING
+        self.events: List[Any] = []
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status != RUNNING
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the job ran, or has been running so far."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    def events_since(self, cursor: int = 0) -> List[Any]:
+        """Events appended after the first `cursor` ones."""
+        return self.events[cursor:]
+
+    def cancel(self) -> None:
+        """Ask the job to stop before its next event (a call already in flight completes)."""
+        self._cancelled.set()
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+        try:
+            if self._cancelled.is_set():
+                # Cancelled while still queued
+                self.status = CANCELLED
+                return
+            result = fn(*args, **kwargs)
+            if isinstance(result, Iterator):
+                for event in result:
+                    self.events.append(event)
+                    if self._cancelled.is_set():
+                        if hasattr(result, "close"):
+                            result.close()
+                        break
+                result = self.events
+            self.result = result
+            self.status = CANCELLED if self._cancelled.is_set() else DONE
+        except Exception as e:
+            logger.error(f"Background {self.kind or 'job'} {self.id} failed: {str(e)}", exc_info=True)
+            self.error = e
+            self.status = FAILED
+        finally:
+            self.finished = time.perf_counter()
+
+
+class JobExecutor:
+    """
+    Thread pool running Jobs, with a registry to look them up by id.
+
+    Finished jobs are kept for `ttl_seconds` so a session that reruns or
+    reconnects late can still collect the result.
+    """
+    def __init__(self, max_workers: int = 8, ttl_seconds: float = 3600.0):
+        """
+        Initialize the executor.
+
+        Args:
+            max_workers: Jobs running at the same time; further jobs queue
+            ttl_seconds: How long finished jobs stay retrievable
+        """
+        self.ttl_seconds = ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zene-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, kind: str = "", **kwargs: Any) -> Job:
+        """
+        Run fn(*args, **kwargs) in the background.
+
+        Args:
+            fn: Callable returning a result or an iterator of events
+            *args: Positional arguments for fn
+            kind: Label used in logs (e.g. "zene_turn", "battle")
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            Job: The submitted job; keep job.id to find it after a rerun
+        """
+        job = Job(kind)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(job._run, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        """Look up a job by id, None when unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def forget(self, job_id: Optional[str]) -> None:
+        """Drop a job from the registry once its result has been collected."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def running(self) -> int:
+        """Number of jobs that have not finished yet."""
+        with self._lock:
+            return sum(not job.done for job in self._jobs.values())
+
+    def _prune(self) -> None:
+        now = time.perf_counter()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_default_executor: Optional[JobExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_default_executor() -> JobExecutor:
+    """
+    Get the process-wide job executor shared by every Streamlit session.
+
+    Configured from ZENE_JOB_WORKERS and ZENE_JOB_TTL_SECONDS.
+    """
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = JobExecutor(
+                max_workers=int(os.getenv("ZENE_JOB_WORKERS", "8")),
+                ttl_seconds=float(os.getenv("ZENE_JOB_TTL_SECONDS", "3600")),
+            )
+        return _default_executor
@@ -0,0 +1,76 @@
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser that surfaces top-level fields of a streamed JSON object.
+
+    Chunks of a JSON object are fed as they arrive; every top-level
+    `"key": value` pair is returned as soon as its value is complete, so
+    consumers can act on `next_agent` or `topics` before the rest of the
+    object has been generated. Each character is scanned exactly once.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume a chunk of the JSON text.
+
+        Args:
+            chunk: Next piece of the streamed JSON object
+
+        Returns:
+            List of (field name, value) pairs completed by this chunk
+        """
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._member_start is None:
+                    self._member_start = pos
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_member(buffer, pos, completed)
+            elif char == "," and self._depth == 1:
+                self._complete_member(buffer, pos, completed)
+
+        self._pos = len(buffer)
+        return completed
+
+    def _complete_member(self, buffer: str, end: int, completed: List[Tuple[str, Any]]) -> None:
+        """Parse the member between its opening quote and the delimiter at end."""
+        if self._member_start is None:
+            return
+        member = buffer[self._member_start:end]
+        self._member_start = None
+        try:
+            pair = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return
+        for key, value in pair.items():
+            self.fields[key] = value
+            completed.append((key, value))
@@ -1,11 +1,27 @@
+import asyncio
 import json
 import logging
 import os
+import threading
 import time
-from typing import Dict, Any, List
-from prompts import Zene , summary , user_knowledge
+import weakref
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional
+from prompts import Zene
 import openai
-from dotenv import load_dotenv
+from clients import get_client, get_async_client
+from context import ContextWindow
+from summarizer import RollingSummarizer
+from cache import ResponseCache, get_default_cache
+from json_stream import IncrementalJSONParser
+from prompt_assembly import assemble_messages, static_message
+from cascade import CASCADE, CascadePolicy, merge_usage, usage_counts
+from fastpath import FastPathClassifier, get_default_fast_path
+from store import ConversationStore, get_default_store
+from history import OutputHistory
+from profiles import ProfileStore, get_default_profiles, profile_snippet
+from analytics import AnalyticsStore, get_default_analytics
+import telemetry
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +30,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Token budget of the user profile snippet sent with each classification
+PROFILE_TOKENS = int(os.getenv("ZENE_PROFILE_TOKENS", "120"))
+
 class SnowBlaze:
     """
     A simplified conversational agent that uses Zene for interactions.
@@ -22,62 +41,32 @@ class SnowBlaze:
         """
         Reset the conversation history, generating a summary of previous interactions.
         
+        Only turns that are not yet part of the rolling summary are sent to
+        the summarizer.
+        
         Returns:
             str: Summary of the previous conversation or error message
         """
         logger.info("Resetting conversation history")
         try:
+            turns = [conv for conv in self.conversations if conv.get("role") != "system"]
+            
             # Skip processing if conversation is empty
-            if not self.conversations:
+            if not turns and not self.summarizer.summary:
                 logger.info("No conversation history to reset")
                 return "No conversation history to summarize"
-                
-            # Prepare message for summary generation
-            messages = [
-                {"role": "system", "content": self.summary},
-                {"role": "user", "content": "Summarize the following conversation: " + 
-                 json.dumps([conv for conv in self.conversations if conv.get("content")])}
-            ]
-            
-            # Track performance metrics
-            start_time = time.time()
-            
-            # Generate summary
-            model_name = "gpt-4o"
-            response = self.client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                temperature=0.0,
-                max_tokens=1000  # Limit summary length
-            )
-            
-            # Calculate performance metrics
-            end_time = time.time()
-            latency = end_time - start_time
-            content = response.choices[0].message.content
-            
-            # Log usage statistics
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens,
-                "latency_seconds": latency
-            }
-            logger.info(f"Summary generation - Token usage: {usage}")
-            logger.info(f"Summary generation - Latency: {latency:.2f} seconds")
+            
+            content = self.summarizer.fold(turns)
+            self._flush_summary_records()
             
             # Reset conversation but keep summary as context
-            self.conversations = []
-            self.conversations.append({
-                "role": "system",
-                "content": f"Previous conversation summary: {content}"
-            })
+            self.conversations = [self._summary_message()]
             
             # Record summary in history
             self.output_history.append({
                 "action": "conversation_reset",
                 "summary": content,
-                "usage": usage,
+                "summarized_messages": len(turns),
                 "timestamp": time.time()
             })
             
@@ -88,6 +77,18 @@ class SnowBlaze:
             logger.error(f"Failed to reset conversation: {str(e)}", exc_info=True)
             return f"Error resetting conversation: {str(e)}"
 
+    def _summary_message(self) -> Dict[str, str]:
+        """Build the pinned system message carrying the rolling summary."""
+        return {
+            "role": "system",
+            "content": f"Previous conversation summary: {self.summarizer.summary}"
+        }
+
+    def _flush_summary_records(self) -> None:
+        """Move usage records of finished summary updates into the output history."""
+        while self._summary_records:
+            self.output_history.append(self._summary_records.popleft())
+
     def reset_and_summarize_conversation(self) -> str:
         """
         Public method to reset the conversation and return a summary.
@@ -97,102 +98,459 @@ class SnowBlaze:
         """
         return self.__reset_conversation()
 
-    def __init__(self, user_id: str):
+    def clear_conversation(self) -> None:
+        """
+        Drop the conversation history and the rolling summary.
+        """
+        self.conversations = []
+        self.summarizer.clear()
+
+    def __init__(self, user_id: str, client: Optional[openai.OpenAI] = None,
+                 context_window: Optional[ContextWindow] = None, cache: Optional[ResponseCache] = None,
+                 store: Optional[ConversationStore] = None, model_name: str = "gpt-4o",
+                 cascade: Optional[CascadePolicy] = None, fast_path: Optional[FastPathClassifier] = None,
+                 profiles: Optional[ProfileStore] = None, analytics: Optional[AnalyticsStore] = None):
         """
         Initialize the SnowBlaze with user ID and OpenAI client.
         
         Args:
             user_id: User ID for conversation tracking
+            client: Optional OpenAI client, defaults to the pooled shared client
+            context_window: Optional token budget for the conversation history
+            cache: Optional response cache, defaults to the process-wide cache;
+                pass False to disable caching
+            store: Optional conversation store, defaults to the process-wide
+                store; pass False to disable persistence
+            model_name: Model used by __call__, or "cascade" to try gpt-4o-mini
+                first and escalate to gpt-4o on low confidence
+            cascade: Optional cascade policy used when model_name is "cascade"
+            fast_path: Optional local classifier for trivial queries, defaults
+                to the model at ZENE_FASTPATH_MODEL; pass False to disable
+            profiles: Optional user profile store, defaults to the
+                process-wide store; pass False to send no profile
+            analytics: Optional topic analytics store, defaults to the
+                process-wide store; pass False to disable
         """
-        load_dotenv()
         self.user_id = user_id
-        self.client = openai.OpenAI()
+        self.model_name = model_name
+        self.cascade = cascade or CascadePolicy()
+        self.client = client or get_client()
+        self.context_window = context_window or ContextWindow(high_watermark=0.8, low_watermark=0.5)
         self.conversations = []
-        self.output_history = []
-        self.summary = summary
+        self.output_history = OutputHistory()
+        self._context_stats = {}
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        self._cache_tier = None
+        self.fast_path = get_default_fast_path() if fast_path is None else (fast_path or None)
+        self.store = get_default_store() if store is None else (store or None)
+        if self.store is not None:
+            # Full records go to the store as they are added; only recent ones stay in memory
+            self.output_history.sink = self._persist_records
+        # The profile is loaded once per session and updated in place after each turn
+        # Compared with False, not by truth value: an empty ProfileStore has len() 0
+        self.profiles = get_default_profiles() if profiles is None else (None if profiles is False else profiles)
+        self.profile = self.profiles.get(user_id) if self.profiles is not None else None
+        self._profile_messages = None
+        self.analytics = get_default_analytics() if analytics is None else (analytics or None)
+        self._summary_records = deque()
+        self.summarizer = RollingSummarizer(
+            client=self.client if isinstance(self.client, openai.OpenAI) else None,
+            on_update=self._summary_records.append
+        )
         self.zene = Zene
+
+    def _persist_records(self, records: List[Dict[str, Any]]) -> None:
+        self.store.append_events(self.user_id, records)
+
+    def _profile_context(self) -> List[Dict[str, str]]:
+        """Profile snippet message for the next request, rebuilt only after the profile changed."""
+        if self._profile_messages is None:
+            snippet = profile_snippet(self.profile, PROFILE_TOKENS) if self.profile is not None else ""
+            self._profile_messages = [{"role": "system", "content": snippet}] if snippet else []
+        return self._profile_messages
+
+    def resume(self, last_n: int = 20) -> int:
+        """
+        Load the user's most recent turns from the store into the conversation.
+
+        Args:
+            last_n: Number of messages to load
+
+        Returns:
+            Number of messages loaded
+        """
+        if self.store is None:
+            return 0
+        self.conversations = self.store.load_last_turns(self.user_id, last_n)
+        # Start on a user turn so evictions keep removing user/assistant pairs
+        while self.conversations and self.conversations[0]["role"] != "user":
+            self.conversations.pop(0)
+        logger.info(f"Resumed {len(self.conversations)} messages for {self.user_id}")
+        return len(self.conversations)
         
-    def get_response(self, prompt: str, model_name: str = "gpt-4o") -> str:
+    def get_response(self, prompt: str, model_name: str = "gpt-4o", stream: bool = False):
         """
         Get a response from OpenAI based on the given prompt.
         
         Args:
             prompt: User input prompt
             model_name: Name of the OpenAI model to use
+            stream: Yield partial tokens as they arrive instead of returning
+                the full content
             
         Returns:
-            Response content as a string
+            Response content as a string, or an iterator of content deltas
+            when streaming
         """
-        try:
-            sys_prompt = self.zene["system_prompt"]
-            response_format = self.zene["response_schema"]
-            
-            messages = [
-                {"role": "system", "content": sys_prompt}
-            ]
-            
-            # Add conversation history if available
-            messages.extend(self.conversations)
-            
-            # Add current prompt
-            messages.append({"role": "user", "content": prompt})
-            
-            start_time = time.time()
-            
-            response = self.client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                temperature=0.0,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": response_format
-                },
-            )
+        if stream:
+            return (event["text"] for event in self._stream_events(prompt, model_name)
+                    if event["type"] == "token")
+        with telemetry.span(telemetry.CLASSIFICATION, **{telemetry.MODEL: model_name}):
+            try:
+                messages = self._build_messages(prompt, model_name)
+                
+                start_time = time.perf_counter()
+                
+                cache_keys, content = self._lookup_cache(messages, model_name)
+                if content is not None:
+                    return self._record_cache_hit(prompt, content, time.perf_counter() - start_time)
+                
+                content = self._fast_path_answer(prompt, start_time)
+                if content is not None:
+                    return content
+                
+                response = self.client.chat.completions.create(
+                    messages=messages,
+                    **self._completion_kwargs(model_name)
+                )
+                content, usage = response.choices[0].message.content, response.usage
+                
+                cascade_info = None
+                if model_name == CASCADE:
+                    cascade_info = self.cascade.assess(content, response.choices[0].logprobs, usage,
+                                                       time.perf_counter() - start_time)
+                    if cascade_info["escalated"]:
+                        strong_start = time.perf_counter()
+                        response = self.client.chat.completions.create(
+                            messages=messages,
+                            **self._completion_kwargs(self.cascade.strong_model)
+                        )
+                        self.cascade.escalated(cascade_info, response.usage, time.perf_counter() - strong_start)
+                        content, usage = response.choices[0].message.content, merge_usage(usage, response.usage)
+                
+                latency = time.perf_counter() - start_time
+                content = self._record_response(prompt, content, usage, latency, cascade_info=cascade_info)
+                self._store_in_cache(cache_keys, content)
+                return content
+                
+            except Exception as e:
+                logger.error(f"Error for prompt: {prompt}\n{e}")
+                return f"Error: {str(e)}"
+
+    def _stream_events(self, prompt: str, model_name: str = "gpt-4o") -> Iterator[Dict[str, Any]]:
+        """
+        Stream a classification, surfacing schema fields as soon as they complete.
+        
+        Args:
+            prompt: User input prompt
+            model_name: Name of the OpenAI model to use
             
-            end_time = time.time()
-            latency = end_time - start_time
+        Yields:
+            {"type": "token", "text": ...} for each content delta,
+            {"type": "field", "name": ..., "value": ...} for each completed
+            top-level field and finally {"type": "done", "content": ...}
+        """
+        parser = IncrementalJSONParser()
+        with telemetry.span(telemetry.CLASSIFICATION, **{telemetry.MODEL: model_name, "zene.stream": True}):
+            try:
+                messages = self._build_messages(prompt, model_name)
+                
+                start_time = time.perf_counter()
+                
+                cache_keys, content = self._lookup_cache(messages, model_name)
+                if content is not None:
+                    content = self._record_cache_hit(prompt, content, time.perf_counter() - start_time)
+                else:
+                    content = self._fast_path_answer(prompt, start_time)
+                if content is not None:
+                    yield {"type": "token", "text": content}
+                    for name, value in parser.feed(content):
+                        yield {"type": "field", "name": name, "value": value}
+                    yield {"type": "done", "content": content}
+                    return
+                
+                stream = self.client.chat.completions.create(
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **self._completion_kwargs(model_name)
+                )
+                
+                first_token = first_field = None
+                usage = None
+                logprobs = []
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].logprobs is not None:
+                        logprobs.append(chunk.choices[0].logprobs)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    
+                    text = chunk.choices[0].delta.content
+                    if first_token is None:
+                        first_token = time.perf_counter() - start_time
+                    yield {"type": "token", "text": text}
+                    
+                    for name, value in parser.feed(text):
+                        if first_field is None:
+                            first_field = time.perf_counter() - start_time
+                            logger.info(f"Time to first field ({name}): {first_field:.2f} seconds")
+                        yield {"type": "field", "name": name, "value": value}
+                
+                content = parser.buffer
+                cascade_info = None
+                if model_name == CASCADE:
+                    cascade_info = self.cascade.assess(content, logprobs, usage, time.perf_counter() - start_time)
+                    if cascade_info["escalated"]:
+                        # Replace the streamed fields with the strong model's classification
+                        strong_start = time.perf_counter()
+                        response = self.client.chat.completions.create(
+                            messages=messages,
+                            **self._completion_kwargs(self.cascade.strong_model)
+                        )
+                        self.cascade.escalated(cascade_info, response.usage, time.perf_counter() - strong_start)
+                        content, usage = response.choices[0].message.content, merge_usage(usage, response.usage)
+                        for name, value in IncrementalJSONParser().feed(content):
+                            yield {"type": "field", "name": name, "value": value}
+                
+                latency = time.perf_counter() - start_time
+                content = self._record_response(prompt, content, usage, latency, cascade_info=cascade_info,
+                                                time_to_first_token_seconds=first_token,
+                                                time_to_first_field_seconds=first_field)
+                self._store_in_cache(cache_keys, content)
+                yield {"type": "done", "content": content}
+                
+            except Exception as e:
+                logger.error(f"Error for prompt: {prompt}\n{e}")
+                yield {"type": "done", "content": f"Error: {str(e)}"}
+
+    def _completion_kwargs(self, model_name: str) -> Dict[str, Any]:
+        """
+        Request parameters for a classification with the given model.
+        
+        The cascade runs its cheap tier with logprobs so the confidence of the
+        routing fields can be scored.
+        """
+        kwargs = {
+            "model": self.cascade.cheap_model if model_name == CASCADE else model_name,
+            "temperature": 0.0,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": self.zene["response_schema"]
+            },
+        }
+        if model_name == CASCADE:
+            kwargs["logprobs"] = True
+        return kwargs
+
+    def _build_messages(self, prompt: str, model_name: str = "gpt-4o") -> List[Dict[str, str]]:
+        """
+        Build the message list for a classification request.
+        
+        The conversation history is first trimmed to the model's token budget,
+        leaving room for the current prompt.
+        
+        Args:
+            prompt: User input prompt
+            model_name: Name of the OpenAI model the messages are for
             
-            content = response.choices[0].message.content
+        Returns:
+            System prompt, conversation history and the current prompt
+        """
+        prompt_message = {"role": "user", "content": prompt}
+        profile_messages = self._profile_context()
+        
+        # Refresh the pinned summary with any finished background update
+        if self.summarizer.summary:
+            if self.conversations and self.conversations[0].get("role") == "system":
+                self.conversations[0] = self._summary_message()
+            else:
+                self.conversations.insert(0, self._summary_message())
+        
+        self.conversations, evicted, self._context_stats = self.context_window.fit(
+            self.conversations,
+            model=model_name,
+            reserve=self.context_window.count([*profile_messages, prompt_message], model_name)
+        )
+        
+        # Fold evicted turns into the rolling summary without blocking this turn
+        if evicted:
+            self.summarizer.submit(evicted)
+        
+        # Static system prompt first, then append-only history, then the profile and the new
+        # prompt, so consecutive requests share a byte-identical prefix for provider prompt caching
+        return assemble_messages(
+            [static_message("system", self.zene["system_prompt"])],
+            self.conversations,
+            prompt_message,
+            context=profile_messages
+        )
 
-            # Calculate usage statistics
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens,
-                "latency_seconds": latency
-            }
+    def _record_response(self, prompt: str, content: str, completion_usage: Any, latency: float,
+                         cascade_info: Optional[Dict[str, Any]] = None, **timings: Optional[float]) -> str:
+        """
+        Log usage statistics for a completion and record it in the output history.
+        
+        Args:
+            prompt: User input prompt
+            content: Response content
+            completion_usage: Usage object returned by the OpenAI client (or a usage dict)
+            latency: Request latency in seconds
+            cascade_info: Cascade tier and confidence, when the cascade answered
+            **timings: Extra latency measurements (e.g. time to first field)
             
-            logger.info(f"Token usage: {usage}")
-            logger.info(f"Latency: {latency:.2f} seconds")
+        Returns:
+            Response content as a string
+        """
+        # Calculate usage statistics
+        usage = usage_counts(completion_usage)
+        usage["latency_seconds"] = latency
+        usage.update({name: value for name, value in timings.items() if value is not None})
+        telemetry.current_span().set_attributes(**{
+            telemetry.INPUT_TOKENS: usage["prompt_tokens"],
+            telemetry.OUTPUT_TOKENS: usage["completion_tokens"],
+            telemetry.CACHED_TOKENS: usage["cached_tokens"],
+        })
+        if cascade_info is not None:
+            telemetry.current_span().set("zene.cascade_tier", cascade_info["tier"])
+        
+        logger.info(f"Token usage: {usage}")
+        logger.info(f"Latency: {latency:.2f} seconds")
+        
+        # Record the output for history
+        self._flush_summary_records()
+        record = {
+            "query": prompt,
+            "response": content,
+            "usage": usage,
+            "context": self._context_stats,
+            "latency_seconds": latency
+        }
+        if cascade_info is not None:
+            record["cascade"] = cascade_info
+        self.output_history.append(record)
+        
+        return content
+
+    def _lookup_cache(self, messages: List[Dict[str, str]], model_name: str):
+        """
+        Look up a cached classification for a request.
+        
+        Args:
+            messages: Full message list of the request
+            model_name: Name of the OpenAI model to use
             
-            # Record the output for history
-            self.output_history.append({
-                "query": prompt,
-                "response": content,
-                "usage": usage,
-                "latency_seconds": latency
-            })
+        Returns:
+            Tuple of (cache keys, cached response content or None)
+        """
+        if self.cache is None:
+            return None, None
+        cache_keys = self.cache.make_keys(
+            self.zene["system_prompt"], self.zene["response_schema"], model_name, messages[1:]
+        )
+        content, self._cache_tier = self.cache.get(cache_keys)
+        return cache_keys, content
+
+    def _store_in_cache(self, cache_keys, content: Optional[str]) -> None:
+        """
+        Cache a model response, unless it is not a JSON classification.
+        
+        Truncated or non-JSON text and refusals (None content) would
+        otherwise be replayed for every identical query until they expire.
+        """
+        if self.cache is None:
+            return
+        try:
+            parsed = json.loads(content) if isinstance(content, str) else None
+        except json.JSONDecodeError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            logger.warning("Not caching a response that is not a JSON object")
+            return
+        self.cache.set(cache_keys, content)
+
+    def _record_cache_hit(self, prompt: str, content: str, latency: float) -> str:
+        """
+        Record a response served from the cache in the output history.
+        
+        Args:
+            prompt: User input prompt
+            content: Cached response content
+            latency: Lookup latency in seconds
             
-            return content
+        Returns:
+            Response content as a string
+        """
+        logger.info(f"Cache hit ({self._cache_tier}) in {latency * 1000:.2f} ms")
+        telemetry.current_span().set(telemetry.CACHE_HIT, self._cache_tier)
+        return self._record_local_answer(prompt, content, latency, cache_hit=self._cache_tier)
+
+    def _fast_path_answer(self, prompt: str, start_time: float) -> Optional[str]:
+        """
+        Classify a trivial query with the local fast path.
+        
+        Args:
+            prompt: User input prompt
+            start_time: Start of the request, for the recorded latency
             
-        except Exception as e:
-            logger.error(f"Error for prompt: {prompt}\n{e}")
-            return f"Error: {str(e)}"
-    
-    def __call__(self, message: str) -> Dict[str, Any]:
+        Returns:
+            Response content as a string, or None to fall back to the LLM
         """
-        Process a conversational message through Zene.
+        if self.fast_path is None:
+            return None
+        answer = self.fast_path.classify(prompt)
+        if answer is None:
+            return None
+        content, fast_path_info = answer
+        latency = time.perf_counter() - start_time
+        telemetry.current_span().set(telemetry.CACHE_HIT, "fast_path")
+        logger.info(f"Fast path answered {fast_path_info['label']} "
+                    f"({fast_path_info['confidence']:.3f}) in {latency * 1000:.2f} ms")
+        return self._record_local_answer(prompt, content, latency, fast_path=fast_path_info)
+
+    def _record_local_answer(self, prompt: str, content: str, latency: float, **source: Any) -> str:
+        """Record a response produced without an API call (cache or fast path) in the output history."""
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cached_tokens": 0,
+            "latency_seconds": latency
+        }
+        
+        self._flush_summary_records()
+        self.output_history.append({
+            "query": prompt,
+            "response": content,
+            "usage": usage,
+            "context": self._context_stats,
+            **source,
+            "latency_seconds": latency
+        })
+        return content
+
+    def _update_conversation(self, message: str, response: str) -> Dict[str, Any]:
+        """
+        Parse a classifier response and append the turn to the conversation history.
         
         Args:
             message: User message
+            response: Raw response content from get_response
             
         Returns:
             Parsed JSON response
         """
-        logger.info(f"Processing message: {message}")
-        
-        response = self.get_response(prompt=message)
-        
         try:
             response_json = json.loads(response)
             
@@ -205,24 +563,70 @@ class SnowBlaze:
                 "role": "assistant",
                 "content": response,
             })
+            turn_id = None
+            if self.store is not None:
+                turn_id = self.store.append_turns(self.user_id, self.conversations[-2:])[-1]
+            if self.profiles is not None and isinstance(response_json, dict):
+                self.profile = self.profiles.record_topics(
+                    self.user_id, response_json.get("topics") or [], response_json.get("sub-topics") or []
+                )
+                self._profile_messages = None
+            if self.analytics is not None:
+                self.analytics.record(self.user_id, response_json, turn_id=turn_id)
             
-            # Keep conversation history manageable
-            if len(self.conversations) > 10:
-                self.conversations = self.conversations[-10:]
-                
+            # History is trimmed to the token budget before the next request
             return response_json
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse response: {e}")
             return {"error": f"Failed to parse response: {str(e)}"}
+    
+    def __call__(self, message: str, stream: bool = False):
+        """
+        Process a conversational message through Zene.
+        
+        Args:
+            message: User message
+            stream: Yield schema fields as soon as each one is complete
+            
+        Returns:
+            Parsed JSON response, or when streaming an iterator of
+            {"type": "field", ...} events ending with
+            {"type": "done", "response": <parsed JSON response>}
+        """
+        logger.info(f"Processing message: {message}")
+        
+        if stream:
+            return self._stream_call(message)
+        
+        response = self.get_response(prompt=message, model_name=self.model_name)
+        return self._update_conversation(message, response)
+
+    def _stream_call(self, message: str) -> Iterator[Dict[str, Any]]:
+        """Streaming implementation of __call__."""
+        for event in self._stream_events(message, self.model_name):
+            if event["type"] == "field":
+                yield event
+            elif event["type"] == "done":
+                yield {"type": "done", "response": self._update_conversation(message, event["content"])}
             
     def save_conversation(self, filename: str = None) -> None:
         """
-        Save the current conversation to a file.
+        Persist the conversation.
+        
+        Turns and output history records are already appended to the store as
+        they happen, so with a store there is nothing left to write. With a
+        filename (or without a store) the conversation is exported to a JSON
+        file instead, with the user's stored records or, without a store, the
+        records still in memory.
         
         Args:
-            filename: Optional filename to save to
+            filename: Optional JSON filename to export to
         """
+        if self.store is not None and not filename:
+            logger.info(f"Conversation saved to {self.store.path}")
+            return
+
         if not filename:
             filename = f"conversation_{self.user_id}_{int(time.time())}.json"
         
@@ -235,12 +639,148 @@ class SnowBlaze:
                     "user_id": self.user_id,
                     "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
                     "conversation": self.conversations,
-                    "usage_stats": self.output_history
+                    "usage_stats": (self.store.load_events(self.user_id) if self.store is not None
+                                    else [record.as_dict() for record in self.output_history])
                 }, f, indent=2)
             logger.info(f"Conversation saved to {filepath}")
         except Exception as e:
             logger.error(f"Failed to save conversation: {e}")
 
+class AsyncSnowBlaze(SnowBlaze):
+    """
+    Asyncio variant of SnowBlaze so one event loop can serve many users.
+    
+    All instances share one pooled AsyncOpenAI client, and all instances on
+    the same event loop share a semaphore that bounds the number of in-flight
+    requests. Conversation and output history behave exactly as in SnowBlaze.
+    """
+    max_concurrency = 64
+    # One semaphore per event loop: a semaphore is bound to the loop that first waits on it
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+        weakref.WeakKeyDictionary()
+    )
+    _semaphores_lock = threading.Lock()
+
+    def __init__(self, user_id: str, client: Optional[openai.AsyncOpenAI] = None,
+                 context_window: Optional[ContextWindow] = None, cache: Optional[ResponseCache] = None,
+                 store: Optional[ConversationStore] = None, model_name: str = "gpt-4o",
+                 cascade: Optional[CascadePolicy] = None, fast_path: Optional[FastPathClassifier] = None,
+                 profiles: Optional[ProfileStore] = None, analytics: Optional[AnalyticsStore] = None):
+        """
+        Initialize the AsyncSnowBlaze with user ID and the shared async client.
+        
+        Args:
+            user_id: User ID for conversation tracking
+            client: Optional async client, defaults to the pooled shared client
+            context_window: Optional token budget for the conversation history
+            cache: Optional response cache, defaults to the process-wide cache;
+                pass False to disable caching
+            store: Optional conversation store, defaults to the process-wide
+                store; pass False to disable persistence
+            model_name: Model used by __call__, or "cascade"
+            cascade: Optional cascade policy used when model_name is "cascade"
+            fast_path: Optional local classifier for trivial queries; pass
+                False to disable
+            profiles: Optional user profile store; pass False to send no profile
+            analytics: Optional topic analytics store; pass False to disable
+        """
+        super().__init__(user_id, client=client or get_async_client(),
+                         context_window=context_window, cache=cache, store=store,
+                         model_name=model_name, cascade=cascade, fast_path=fast_path, profiles=profiles,
+                         analytics=analytics)
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """Get the running loop's concurrency semaphore, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        with cls._semaphores_lock:
+            semaphore = cls._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = cls._semaphores[loop] = asyncio.Semaphore(cls.max_concurrency)
+        return semaphore
+
+    async def reset_and_summarize_conversation(self) -> str:
+        """
+        Reset the conversation and return a summary.
+        
+        The summary request runs on a worker thread so the event loop keeps
+        serving other sessions.
+        
+        Returns:
+            str: Summary of the previous conversation or error message
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, super().reset_and_summarize_conversation)
+
+    async def get_response(self, prompt: str, model_name: str = "gpt-4o") -> str:
+        """
+        Get a response from OpenAI based on the given prompt.
+        
+        Args:
+            prompt: User input prompt
+            model_name: Name of the OpenAI model to use
+            
+        Returns:
+            Response content as a string
+        """
+        with telemetry.span(telemetry.CLASSIFICATION, **{telemetry.MODEL: model_name}):
+            try:
+                messages = self._build_messages(prompt, model_name)
+                
+                cache_start = time.perf_counter()
+                cache_keys, content = self._lookup_cache(messages, model_name)
+                if content is not None:
+                    return self._record_cache_hit(prompt, content, time.perf_counter() - cache_start)
+                
+                content = self._fast_path_answer(prompt, cache_start)
+                if content is not None:
+                    return content
+                
+                async with self._get_semaphore():
+                    start_time = time.perf_counter()
+                    response = await self.client.chat.completions.create(
+                        messages=messages,
+                        **self._completion_kwargs(model_name)
+                    )
+                    content, usage = response.choices[0].message.content, response.usage
+                    
+                    cascade_info = None
+                    if model_name == CASCADE:
+                        cascade_info = self.cascade.assess(content, response.choices[0].logprobs, usage,
+                                                           time.perf_counter() - start_time)
+                        if cascade_info["escalated"]:
+                            strong_start = time.perf_counter()
+                            response = await self.client.chat.completions.create(
+                                messages=messages,
+                                **self._completion_kwargs(self.cascade.strong_model)
+                            )
+                            self.cascade.escalated(cascade_info, response.usage, time.perf_counter() - strong_start)
+                            content, usage = response.choices[0].message.content, merge_usage(usage, response.usage)
+                    latency = time.perf_counter() - start_time
+                
+                content = self._record_response(prompt, content, usage, latency, cascade_info=cascade_info)
+                self._store_in_cache(cache_keys, content)
+                return content
+                
+            except Exception as e:
+                logger.error(f"Error for prompt: {prompt}\n{e}")
+                return f"Error: {str(e)}"
+
+    async def __call__(self, message: str) -> Dict[str, Any]:
+        """
+        Process a conversational message through Zene.
+        
+        Args:
+            message: User message
+            
+        Returns:
+            Parsed JSON response
+        """
+        logger.info(f"Processing message: {message}")
+        
+        response = await self.get_response(prompt=message, model_name=self.model_name)
+        return self._update_conversation(message, response)
+
 # Example usage
 if __name__ == "__main__":
     zene_agent = SnowBlaze(user_id="user123")
@@ -0,0 +1,277 @@
+"""
+Per-user profiles: explored topics and test scores, fed back into the Zene prompt.
+
+Usage:
+    python profiles.py show user_20250320080831
+    python profiles.py import profiles.json     # {"user_id": {"user_name": ..., ...}, ...}
+
+Profiles live in SQLite, one JSON row per user keyed by user_id (a
+WITHOUT ROWID primary key, so a lookup is a single B-tree probe at any
+number of users), behind an in-process LRU. SnowBlaze loads the profile
+once per session, injects a short token-budgeted snippet into each
+classification request and folds the classifier's topics and sub-topics
+back into the profile after every turn.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from context import count_text_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = os.path.join("conversations", "profiles.db")
+
+# Distinct topics / sub-topics kept per user; the least used are dropped first
+MAX_TOPICS = 100
+
+# Start of every profile snippet; record/replay leaves these messages out of request keys (see cassette.py)
+PROFILE_HEADER = "User profile (use to personalize, never to override the current query): "
+
+# Written into a new, empty default store (the demo user of main.py, formerly prompts.user_knowledge)
+SEED_PROFILES = {
+    "user123": {
+        "user_name": "Ajay",
+        "explored_concepts": ["Indian History", "Geography of India", "Indian Polity"],
+        "score": {"mock_tests": [{"name": "", "score": 85}, {"name": "Test 2", "score": 90}]},
+    },
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    payload TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def new_profile() -> Dict[str, Any]:
+    """Empty profile of a user seen for the first time."""
+    return {"user_name": "", "explored_concepts": [], "topics": {}, "sub_topics": {}, "score": {}}
+
+
+def _count(counts: Dict[str, int], names: Iterable[str]) -> bool:
+    """Add one use of each name, moving it to the most recent position; True if anything was added."""
+    changed = False
+    for name in names or ():
+        if not isinstance(name, str) or not name.strip():
+            continue
+        name = name.strip()[:80]
+        counts[name] = counts.pop(name, 0) + 1
+        changed = True
+    while len(counts) > MAX_TOPICS:
+        del counts[min(counts, key=counts.get)]
+    return changed
+
+
+def profile_snippet(profile: Dict[str, Any], max_tokens: int = 120) -> str:
+    """
+    Summarize a profile in about max_tokens tokens.
+
+    Topics are listed most explored first, sub-topics most recent first;
+    items that do not fit in the budget are left out.
+
+    Args:
+        profile: User profile
+        max_tokens: Token budget for the snippet
+
+    Returns:
+        str: The snippet, empty when the profile holds nothing worth sending
+    """
+    topics = sorted(profile.get("topics", {}).items(), key=lambda item: -item[1])
+    sections = [
+        ("Name", [profile["user_name"]] if profile.get("user_name") else []),
+        ("Most explored topics", [name for name, _ in topics] or profile.get("explored_concepts", [])),
+        ("Recent sub-topics", list(reversed(list(profile.get("sub_topics", {}))))),
+        ("Mock test scores", [str(test.get("score")) for test in profile.get("score", {}).get("mock_tests", [])]),
+    ]
+
+    budget = max_tokens - count_text_tokens(PROFILE_HEADER)
+    parts = []
+    for label, items in sections:
+        if not items:
+            continue
+        budget -= count_text_tokens(label) + 2
+        kept = []
+        for item in items:
+            cost = count_text_tokens(item) + 1
+            if cost > budget:
+                break
+            kept.append(item)
+            budget -= cost
+        if kept:
+            parts.append(f"{label}: {', '.join(kept)}")
+        if budget <= 0:
+            break
+    return PROFILE_HEADER + "; ".join(parts) if parts else ""
+
+
+class ProfileStore:
+    """
+    SQLite-backed profile store with an LRU of recently used profiles.
+
+    get() returns the cached dict itself, so a session holding a profile sees
+    its own updates; writes go through to SQLite immediately.
+    """
+    def __init__(self, path: str = DEFAULT_PROFILE_PATH, cache_size: int = 10000,
+                 seed: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+            cache_size: Profiles kept in memory
+            seed: Profiles written when the store holds none yet
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        if seed and not len(self):
+            logger.info(f"Seeding {self.put_many(seed)} profiles into {path}")
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        """
+        Get a user's profile, creating an empty one for new users.
+
+        Args:
+            user_id: User to look up
+
+        Returns:
+            Dict[str, Any]: The profile
+        """
+        with self._lock:
+            profile = self._cache.get(user_id)
+            if profile is not None:
+                self._cache.move_to_end(user_id)
+                return profile
+            row = self._db.execute("SELECT payload FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            profile = {**new_profile(), **json.loads(row[0])} if row else new_profile()
+            self._remember(user_id, profile)
+            return profile
+
+    def put(self, user_id: str, profile: Dict[str, Any]) -> None:
+        """Replace a user's profile."""
+        with self._lock:
+            self._remember(user_id, profile)
+            self._write(user_id, profile)
+            self._db.commit()
+
+    def put_many(self, profiles: Dict[str, Dict[str, Any]]) -> int:
+        """Replace many profiles in one transaction, e.g. when importing; returns the number written."""
+        now = time.time()
+        rows = [(user_id, now, json.dumps({**new_profile(), **profile})) for user_id, profile in profiles.items()]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO profiles (user_id, updated_at, payload) VALUES (?, ?, ?)", rows
+            )
+            self._db.commit()
+            for user_id in profiles:
+                self._cache.pop(user_id, None)
+        return len(rows)
+
+    def record_topics(self, user_id: str, topics: Iterable[str] = (), sub_topics: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Fold the topics of one classified turn into a user's profile.
+
+        Args:
+            user_id: User the turn belongs to
+            topics: The classifier's "topics"
+            sub_topics: The classifier's "sub-topics"
+
+        Returns:
+            Dict[str, Any]: The updated profile
+        """
+        profile = self.get(user_id)
+        with self._lock:
+            changed = _count(profile["topics"], topics)
+            changed = _count(profile["sub_topics"], sub_topics) or changed
+            if changed:
+                self._write(user_id, profile)
+                self._db.commit()
+        return profile
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def _remember(self, user_id: str, profile: Dict[str, Any]) -> None:
+        self._cache[user_id] = profile
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _write(self, user_id: str, profile: Dict[str, Any]) -> None:
+        profile["updated_at"] = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO profiles (user_id, updated_at, payload) VALUES (?, ?, ?)",
+            (user_id, profile["updated_at"], json.dumps(profile))
+        )
+
+
+_default_profiles: Optional[ProfileStore] = None
+_default_lock = threading.Lock()
+
+
+def get_default_profiles() -> ProfileStore:
+    """
+    Get the process-wide profile store.
+
+    Configured from ZENE_PROFILE_PATH (default conversations/profiles.db) and
+    ZENE_PROFILE_CACHE_SIZE; a new store is seeded with SEED_PROFILES.
+    """
+    global _default_profiles
+    with _default_lock:
+        if _default_profiles is None:
+            _default_profiles = ProfileStore(
+                os.getenv("ZENE_PROFILE_PATH", DEFAULT_PROFILE_PATH),
+                cache_size=int(os.getenv("ZENE_PROFILE_CACHE_SIZE", "10000")),
+                seed=SEED_PROFILES,
+            )
+    return _default_profiles
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("ZENE_PROFILE_PATH", DEFAULT_PROFILE_PATH), help="SQLite file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show = subparsers.add_parser("show", help="Print a profile and its prompt snippet")
+    show.add_argument("user_id")
+    show.add_argument("--max-tokens", type=int, default=120)
+
+    load = subparsers.add_parser("import", help="Import profiles from a JSON object keyed by user id")
+    load.add_argument("path")
+
+    args = parser.parse_args()
+    profiles = ProfileStore(args.db, seed=SEED_PROFILES)
+    if args.command == "show":
+        profile = profiles.get(args.user_id)
+        print(json.dumps(profile, indent=2))
+        print(profile_snippet(profile, args.max_tokens))
+    else:
+        with open(args.path) as f:
+            logger.info(f"Imported {profiles.put_many(json.load(f))} profiles into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Prompt assembly that keeps request prefixes byte-stable for provider prompt caching.
+
+OpenAI caches prompts automatically from 1024 tokens on, in 128-token
+increments, keyed on an exact prefix of the request. A request only hits the
+cache when everything before the changing part (static system prompt and
+schema first, then append-only history, then the new message) is
+byte-for-byte identical to an earlier request. Static parts are built once
+here and reused as the same objects on every call.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# Introduces the response schema in schema_system_prompt (the stub server looks for it too)
+SCHEMA_INSTRUCTIONS = "IMPORTANT: You must structure your responses as JSON following this exact schema:\n"
+
+
+@lru_cache(maxsize=256)
+def static_message(role: str, content: str) -> Dict[str, str]:
+    """
+    Get the shared message dict for a static prompt.
+
+    The returned dict is reused across requests and must not be mutated.
+    """
+    return {"role": role, "content": content}
+
+
+@lru_cache(maxsize=256)
+def schema_system_prompt(base_prompt: str, schema_json: str) -> str:
+    """
+    Combine a base system prompt with JSON schema instructions, once per prompt and schema.
+
+    Args:
+        base_prompt: Agent system prompt
+        schema_json: Response schema, already serialized for display
+
+    Returns:
+        The system prompt followed by the schema instructions
+    """
+    return (f"{base_prompt}\n\n"
+            f"{SCHEMA_INSTRUCTIONS}"
+            f"{schema_json}\n\n"
+            f"Make sure your response is valid JSON. Do not include any text outside the JSON object.")
+
+
+def assemble_messages(prefix: Iterable[Dict[str, str]], history: Iterable[Dict[str, str]],
+                      tail: Optional[Dict[str, str]] = None,
+                      context: Iterable[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+    """
+    Lay out a request as static prefix, then history, then the new message.
+
+    Args:
+        prefix: Static messages (system prompt, schema), identical on every call
+        history: Conversation so far, oldest first
+        tail: The new message, if any
+        context: Per-request messages (e.g. the user profile), placed after
+            the history so that changing them keeps the cached prefix intact
+
+    Returns:
+        Message list for the chat completions API
+    """
+    messages = [*prefix, *history, *context]
+    if tail is not None:
+        messages.append(tail)
+    return messages
+
+
+def cached_tokens(usage: Any) -> int:
+    """Read prompt_tokens_details.cached_tokens from a usage object or dict, 0 if absent."""
+    if usage is None:
+        return 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    value = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return value or 0
+
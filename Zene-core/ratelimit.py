@@ -0,0 +1,306 @@
+"""
+Client-side rate limiting shared by every OpenAI client in the process.
+
+Each model gets two token buckets, requests per minute and tokens per
+minute, sized from the `x-ratelimit-*` headers of its responses. Calls are
+admitted when both buckets can cover them and otherwise wait. Interactive
+calls go first: batch calls wait while any interactive call is queued and
+may not dip into a reserve of each bucket kept for interactive traffic. A
+429 pauses the model for everyone until its reset time.
+
+The scheduler is applied at the HTTP transport of the pooled clients (see
+clients.py), so SnowBlaze, batch classification and agentic-wars battles
+all go through it; bulk tools only ask for a client with batch priority.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Share of each bucket batch calls leave untouched for interactive calls
+BATCH_RESERVE = float(os.getenv("ZENE_BATCH_RESERVE", "0.2"))
+# Completion tokens assumed for requests without max_tokens
+DEFAULT_COMPLETION_ESTIMATE = 256
+# Paths whose requests count against the model limits
+LIMITED_PATHS = ("/chat/completions", "/completions", "/embeddings")
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse reset durations like "6m0s", "1.5s" or "120ms" into seconds."""
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; unlimited until a limit is known."""
+    def __init__(self, limit: Optional[float] = None):
+        self.limit = limit
+        self.level = limit
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if self.limit is not None:
+            self.level = min(self.limit, self.level + (now - self.updated) * self.limit / 60.0)
+        self.updated = now
+
+    def wait_for(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until the bucket can cover amount while keeping a reserve fraction, 0 if it can now."""
+        if self.limit is None:
+            return 0.0
+        # A call larger than the whole budget is admitted once the bucket is full
+        needed = min(amount, self.limit) + reserve * self.limit
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) * 60.0 / self.limit
+
+    def take(self, amount: float) -> None:
+        if self.limit is not None:
+            self.level -= amount
+
+    def update(self, limit: Optional[float], remaining: Optional[float]) -> None:
+        """Adopt the server's view of the budget from response headers."""
+        if limit:
+            if self.limit is None:
+                self.level = limit
+            self.limit = limit
+        if remaining is not None and self.limit is not None:
+            self.level = min(self.level, remaining)
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket admission for requests and tokens per minute, per model.
+    """
+    def __init__(self, batch_reserve: float = BATCH_RESERVE):
+        self.batch_reserve = batch_reserve
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "throttled": 0}
+
+    def _model_buckets(self, model: str) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            buckets = self._buckets[model] = {"requests": TokenBucket(), "tokens": TokenBucket()}
+        return buckets
+
+    def _try_acquire(self, model: str, tokens: int, priority: str) -> float:
+        """Admit the call and return 0, or return the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._blocked_until.get(model, 0.0) - now
+            buckets = self._model_buckets(model)
+            for bucket in buckets.values():
+                bucket.refill(now)
+            reserve = self.batch_reserve if priority == BATCH else 0.0
+            wait = max(wait, buckets["requests"].wait_for(1, reserve), buckets["tokens"].wait_for(tokens, reserve))
+            if priority == BATCH and self._waiting[INTERACTIVE]:
+                wait = max(wait, 0.05)
+            if wait > 0:
+                return wait
+            buckets["requests"].take(1)
+            buckets["tokens"].take(tokens)
+            self.stats["admitted"] += 1
+            return 0.0
+
+    def acquire(self, model: str, tokens: int, priority: str = INTERACTIVE) -> float:
+        """
+        Block until a call is admitted.
+
+        Args:
+            model: Model the call is for
+            tokens: Estimated prompt plus completion tokens
+            priority: INTERACTIVE or BATCH
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._try_acquire(model, tokens, priority)
+        if not wait:
+            return 0.0
+        start_time = time.monotonic()
+        self._enter(priority)
+        try:
+            while wait:
+                time.sleep(min(wait, 1.0))
+                wait = self._try_acquire(model, tokens, priority)
+        finally:
+            self._leave(priority, time.monotonic() - start_time)
+        return time.monotonic() - start_time
+
+    async def acquire_async(self, model: str, tokens: int, priority: str = INTERACTIVE) -> float:
+        """Async version of acquire() that waits without blocking the event loop."""
+        wait = self._try_acquire(model, tokens, priority)
+        if not wait:
+            return 0.0
+        start_time = time.monotonic()
+        self._enter(priority)
+        try:
+            while wait:
+                await asyncio.sleep(min(wait, 1.0))
+                wait = self._try_acquire(model, tokens, priority)
+        finally:
+            self._leave(priority, time.monotonic() - start_time)
+        return time.monotonic() - start_time
+
+    def _enter(self, priority: str) -> None:
+        with self._lock:
+            self._waiting[priority] += 1
+            self.stats["queued"] += 1
+
+    def _leave(self, priority: str, waited: float) -> None:
+        with self._lock:
+            self._waiting[priority] -= 1
+            self.stats["wait_seconds"] += waited
+
+    def observe(self, model: str, response: httpx.Response) -> None:
+        """Update a model's buckets from the x-ratelimit-* headers and 429s of a response."""
+        headers = response.headers
+
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        with self._lock:
+            buckets = self._model_buckets(model)
+            for kind in ("requests", "tokens"):
+                buckets[kind].update(number(f"x-ratelimit-limit-{kind}"), number(f"x-ratelimit-remaining-{kind}"))
+            if response.status_code == 429:
+                self.stats["throttled"] += 1
+                delay = (parse_duration(headers.get("retry-after"))
+                         or max(parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+                                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0)
+                         or 1.0)
+                self._blocked_until[model] = max(self._blocked_until.get(model, 0.0), time.monotonic() + delay)
+                logger.warning(f"Rate limited on {model}, pausing it for {delay:.1f}s")
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Current budget levels per model, for dashboards."""
+        with self._lock:
+            return {model: {f"{kind}_{field}": getattr(bucket, field)
+                            for kind, bucket in buckets.items() for field in ("limit", "level")}
+                    for model, buckets in self._buckets.items()}
+
+
+def estimate_tokens(body: dict) -> int:
+    """Estimate the tokens a request counts against the limit: prompt characters / 4 plus max tokens."""
+    text = json.dumps(body.get("messages") or body.get("input") or body.get("prompt") or "")
+    completion = body.get("max_completion_tokens") or body.get("max_tokens")
+    if completion is None and "messages" in body:
+        completion = DEFAULT_COMPLETION_ESTIMATE
+    return len(text) // 4 + (completion or 0)
+
+
+def _request_cost(request: httpx.Request):
+    """Return (model, estimated tokens) for rate-limited requests, None for others."""
+    if request.method != "POST" or not request.url.path.endswith(LIMITED_PATHS):
+        return None
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return None
+    return body.get("model", "default"), estimate_tokens(body)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    httpx transport that admits requests through the scheduler before sending them.
+
+    It also reports every model request to telemetry; without a scheduler it
+    only does that.
+    """
+    def __init__(self, transport: httpx.BaseTransport, scheduler: Optional[RateLimitScheduler],
+                 priority: str = INTERACTIVE):
+        self._transport = transport
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._scheduler is None and not telemetry.enabled():
+            return self._transport.handle_request(request)
+        cost = _request_cost(request)
+        if cost is None:
+            return self._transport.handle_request(request)
+        if self._scheduler is not None:
+            self._scheduler.acquire(*cost, priority=self._priority)
+        start_time = time.perf_counter()
+        response = self._transport.handle_request(request)
+        telemetry.record_request(cost[0], response.status_code, time.perf_counter() - start_time)
+        if self._scheduler is not None:
+            self._scheduler.observe(cost[0], response)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async version of RateLimitedTransport."""
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: Optional[RateLimitScheduler],
+                 priority: str = INTERACTIVE):
+        self._transport = transport
+        self._scheduler = scheduler
+        self._priority = priority
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._scheduler is None and not telemetry.enabled():
+            return await self._transport.handle_async_request(request)
+        cost = _request_cost(request)
+        if cost is None:
+            return await self._transport.handle_async_request(request)
+        if self._scheduler is not None:
+            await self._scheduler.acquire_async(*cost, priority=self._priority)
+        start_time = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        telemetry.record_request(cost[0], response.status_code, time.perf_counter() - start_time)
+        if self._scheduler is not None:
+            self._scheduler.observe(cost[0], response)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str = "default") -> RateLimitScheduler:
+    """
+    Get the process-wide scheduler for a rate-limit budget.
+
+    Args:
+        name: Budget the scheduler tracks; the pooled clients use the API key hash
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(name)
+        if scheduler is None:
+            scheduler = _schedulers[name] = RateLimitScheduler()
+    return scheduler
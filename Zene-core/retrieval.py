@@ -0,0 +1,446 @@
+"""
+Local retrieval index for the queries the Zene classifier generates.
+
+Usage:
+    python retrieval.py build curriculum/ index/ --nlist 256
+    python retrieval.py query index/ "Chola local self-government" "Chola revenue"
+
+The index is a directory holding a memory-mapped float32 embedding matrix,
+an optional IVF (inverted file) coarse quantizer for approximate search and
+hashed BM25 postings used as a lexical fallback.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Number of hash buckets for BM25 terms
+BM25_BUCKETS = 1 << 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+@lru_cache(maxsize=1 << 20)
+def _hash_token(token: str) -> int:
+    """Stable 32-bit hash of a token (Python's hash() is salted per process)."""
+    return zlib.crc32(token.encode())
+
+
+def _hash_tokens(tokens: List[str]) -> np.ndarray:
+    """Stable 32-bit hashes of tokens, memoized since curriculum vocabulary repeats heavily."""
+    return np.fromiter(map(_hash_token, tokens), dtype=np.uint32, count=len(tokens))
+
+
+def chunk_text(text: str, chunk_words: int = 200, overlap: int = 40) -> List[str]:
+    """
+    Split text into overlapping word windows.
+
+    Args:
+        text: Text to split
+        chunk_words: Words per chunk
+        overlap: Words shared by consecutive chunks
+
+    Returns:
+        List of chunk strings
+    """
+    words = text.split()
+    step = max(chunk_words - overlap, 1)
+    return [" ".join(words[i:i + chunk_words]) for i in range(0, max(len(words) - overlap, 1), step)]
+
+
+class HashingEmbedder:
+    """
+    CPU-only embedder using signed feature hashing of unigrams and bigrams.
+
+    Needs no model download or API call, which makes it suitable for
+    offline indexing and benchmarks. Swap in OpenAIEmbedder for semantic
+    quality.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors."""
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = _hash_tokens(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+            rows.append(np.full(len(features), row, dtype=np.int64))
+            hashes.append(features)
+
+        # One scatter-add for the whole batch instead of one per text
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            hashes = np.concatenate(hashes)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            flat = np.concatenate(rows) * self.dim + (hashes % self.dim)
+            vectors = np.bincount(flat, weights=signs, minlength=len(texts) * self.dim)
+            vectors = vectors.reshape(len(texts), self.dim).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OpenAIEmbedder:
+    """
+    Embedder backed by the OpenAI embeddings endpoint.
+    """
+    name = "openai"
+
+    def __init__(self, client=None, model: str = "text-embedding-3-small", batch_size: int = 256):
+        from clients import get_client
+        self.client = client or get_client()
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors."""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and values of the k largest scores along the last axis, sorted descending."""
+    k = min(k, scores.shape[-1])
+    if k == 0:
+        empty = np.zeros(scores.shape[:-1] + (0,))
+        return empty.astype(np.int64), empty
+    idx = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    values = np.take_along_axis(scores, idx, axis=-1)
+    order = np.argsort(-values, axis=-1)
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(values, order, axis=-1)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means returning L2-normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+class VectorIndex:
+    """
+    On-disk retrieval index with exact or IVF dense search and BM25 fallback.
+    """
+    def __init__(self, path: str, embedder: Optional[Any] = None):
+        """
+        Open an index built with VectorIndex.build.
+
+        Args:
+            path: Index directory
+            embedder: Embedder used at build time, defaults to HashingEmbedder
+        """
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.embedder = embedder or HashingEmbedder(dim=self.meta["dim"])
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.embeddings = load("embeddings.npy")
+        self.offsets = load("offsets.npy")
+        self.doc_len = load("doc_len.npy")
+        self.postings_indptr = load("postings_indptr.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_tf = load("postings_tf.npy")
+        self.ivf = None
+        if self.meta.get("nlist"):
+            self.ivf = (load("ivf_centroids.npy"), load("ivf_indptr.npy"), load("ivf_order.npy"))
+        self._chunks = open(os.path.join(path, "chunks.jsonl"), "rb")
+        # Router looks chunks up from worker threads; seek and read must not interleave
+        self._chunks_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict[str, str]], path: str, embedder: Optional[Any] = None,
+              nlist: Optional[int] = None, batch_size: int = 4096) -> "VectorIndex":
+        """
+        Build an index from chunks.
+
+        Chunks are streamed to disk first, then embedded in batches straight
+        into a memory-mapped matrix, so memory stays bounded by batch_size
+        plus the BM25 postings.
+
+        Args:
+            chunks: Iterable of {"text": ..., "source": ...} dicts
+            path: Index directory to create
+            embedder: Embedder to use, defaults to HashingEmbedder
+            nlist: Number of IVF lists, None for exact search only
+            batch_size: Chunks embedded per batch
+
+        Returns:
+            The opened index
+        """
+        embedder = embedder or HashingEmbedder()
+        os.makedirs(path, exist_ok=True)
+        start_time = time.time()
+
+        offsets = []
+        with open(os.path.join(path, "chunks.jsonl"), "wb") as f:
+            for chunk in chunks:
+                offsets.append(f.tell())
+                f.write(json.dumps({"text": chunk["text"], "source": chunk.get("source")}).encode() + b"\n")
+        count = len(offsets)
+        if count == 0:
+            raise ValueError("Cannot build an index without chunks")
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+        embeddings = None
+        doc_len = np.zeros(count, dtype=np.float32)
+        term_parts, doc_parts, tf_parts = [], [], []
+        with open(os.path.join(path, "chunks.jsonl"), "rb") as f:
+            for start in range(0, count, batch_size):
+                texts = [json.loads(f.readline())["text"] for _ in range(min(batch_size, count - start))]
+                vectors = embedder.embed(texts)
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(
+                        os.path.join(path, "embeddings.npy"), mode="w+", dtype=np.float32,
+                        shape=(count, vectors.shape[1])
+                    )
+                embeddings[start:start + len(texts)] = vectors
+
+                for row, text in enumerate(texts):
+                    terms, tf = np.unique(_hash_tokens(tokenize(text)) % BM25_BUCKETS, return_counts=True)
+                    doc_len[start + row] = tf.sum()
+                    term_parts.append(terms.astype(np.uint32))
+                    doc_parts.append(np.full(len(terms), start + row, dtype=np.uint32))
+                    tf_parts.append(tf.astype(np.uint16))
+        embeddings.flush()
+        np.save(os.path.join(path, "doc_len.npy"), doc_len)
+
+        # Term-major postings so a query term maps to one contiguous slice
+        terms = np.concatenate(term_parts)
+        order = np.argsort(terms, kind="stable")
+        np.save(os.path.join(path, "postings_docs.npy"), np.concatenate(doc_parts)[order])
+        np.save(os.path.join(path, "postings_tf.npy"), np.concatenate(tf_parts)[order])
+        indptr = np.zeros(BM25_BUCKETS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=BM25_BUCKETS), out=indptr[1:])
+        np.save(os.path.join(path, "postings_indptr.npy"), indptr)
+        del term_parts, doc_parts, tf_parts, terms, order
+
+        if nlist:
+            nlist = min(nlist, count)
+            sample = np.random.default_rng(0).choice(count, size=min(count, nlist * 64), replace=False)
+            centroids = _kmeans(np.asarray(embeddings[np.sort(sample)]), nlist)
+            assignment = np.concatenate([
+                np.argmax(embeddings[s:s + batch_size * 16] @ centroids.T, axis=1)
+                for s in range(0, count, batch_size * 16)
+            ])
+            ivf_indptr = np.zeros(nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignment, minlength=nlist), out=ivf_indptr[1:])
+            np.save(os.path.join(path, "ivf_centroids.npy"), centroids)
+            np.save(os.path.join(path, "ivf_indptr.npy"), ivf_indptr)
+            np.save(os.path.join(path, "ivf_order.npy"), np.argsort(assignment, kind="stable").astype(np.int64))
+
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "count": count,
+                "dim": int(embeddings.shape[1]),
+                "embedder": embedder.name,
+                "nlist": nlist,
+                "avg_doc_len": float(doc_len.mean()),
+            }, f)
+        logger.info(f"Built index of {count} chunks in {time.time() - start_time:.1f}s at {path}")
+        return cls(path, embedder=embedder)
+
+    def chunk(self, chunk_id: int) -> Dict[str, Any]:
+        """Read one chunk from disk."""
+        with self._chunks_lock:
+            self._chunks.seek(int(self.offsets[chunk_id]))
+            line = self._chunks.readline()
+        return json.loads(line)
+
+    def _dense_exact(self, queries: np.ndarray, k: int, block: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force inner product search, streaming the matrix in blocks."""
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), block):
+            scores = queries @ self.embeddings[start:start + block].T
+            ids, values = _top_k(scores, k)
+            best_ids, best_scores = np.hstack([best_ids, ids + start]), np.hstack([best_scores, values])
+            keep, best_scores = _top_k(best_scores, k)
+            best_ids = np.take_along_axis(best_ids, keep, axis=1)
+        return best_ids, best_scores
+
+    def _dense_ivf(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate search over the nprobe closest IVF lists of each query."""
+        centroids, indptr, order = self.ivf
+        probes, _ = _top_k(queries @ centroids.T, nprobe)
+        all_ids, all_scores = [], []
+        for query, lists in zip(queries, probes):
+            candidates = np.sort(np.concatenate([order[indptr[l]:indptr[l + 1]] for l in lists]))
+            idx, values = _top_k(self.embeddings[candidates] @ query, k)
+            ids = candidates[idx]
+            pad = k - len(ids)
+            all_ids.append(np.pad(ids, (0, pad), constant_values=-1))
+            all_scores.append(np.pad(values, (0, pad), constant_values=-np.inf))
+        return np.vstack(all_ids), np.vstack(all_scores)
+
+    def _bm25(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Lexical BM25 search over the hashed postings."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        avg_doc_len = self.meta["avg_doc_len"]
+        for term in np.unique(_hash_tokens(tokenize(query)) % BM25_BUCKETS):
+            start, end = self.postings_indptr[term], self.postings_indptr[term + 1]
+            if start == end:
+                continue
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            idf = np.log(1 + (len(self) - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / avg_doc_len)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / norm
+        return _top_k(scores, k)
+
+    def search(self, queries: List[str], k: int = 5, nprobe: int = 8, method: str = "auto",
+               min_score: float = 0.2) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Run several retrieval queries in one batched, vectorized search.
+
+        Args:
+            queries: Retrieval queries, e.g. vector_database_retrieval_queries
+            k: Passages to return per query
+            nprobe: IVF lists probed per query when the index has IVF
+            method: "auto" (dense, BM25 when the best dense score is below
+                min_score), "dense", "exact" (dense without IVF) or "bm25"
+            min_score: Dense similarity below which auto falls back to BM25
+
+        Returns:
+            Tuple of (top-k passages per query, latency metrics)
+        """
+        start_time = time.perf_counter()
+        methods = ["bm25" if method == "bm25" else "dense"] * len(queries)
+        ids = scores = None
+        embed_seconds = 0.0
+
+        if queries and method != "bm25":
+            vectors = self.embedder.embed(queries)
+            embed_seconds = time.perf_counter() - start_time
+            if self.ivf is not None and method != "exact":
+                ids, scores = self._dense_ivf(vectors, k, nprobe)
+                methods = ["ivf"] * len(queries)
+            else:
+                ids, scores = self._dense_exact(vectors, k)
+
+        results = []
+        for i, query in enumerate(queries):
+            if ids is None or (method == "auto" and (not len(scores[i]) or scores[i][0] < min_score)):
+                row_ids, row_scores = self._bm25(query, k)
+                methods[i] = "bm25"
+            else:
+                row_ids, row_scores = ids[i], scores[i]
+            passages = []
+            for chunk_id, score in zip(row_ids, row_scores):
+                if chunk_id < 0 or (methods[i] == "bm25" and score <= 0):
+                    continue
+                chunk = self.chunk(int(chunk_id))
+                passages.append({"chunk_id": int(chunk_id), "score": float(score),
+                                 "text": chunk["text"], "source": chunk["source"]})
+            results.append(passages)
+
+        total_seconds = time.perf_counter() - start_time
+        metrics = {
+            "queries": len(queries),
+            "embed_seconds": embed_seconds,
+            "search_seconds": total_seconds - embed_seconds,
+            "latency_seconds": total_seconds,
+            "methods": methods,
+        }
+        logger.info(f"Retrieval of {len(queries)} queries took {total_seconds * 1000:.1f} ms ({methods})")
+        return results, metrics
+
+    def retrieve_for_classification(self, classification: Dict[str, Any], k: int = 5,
+                                    **kwargs: Any) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Execute every vector_database_retrieval_queries entry of a Zene response.
+
+        Args:
+            classification: Parsed Zene classifier response
+            k: Passages to return per query
+            **kwargs: Extra arguments for search
+
+        Returns:
+            Tuple of (top-k passages per query, latency metrics)
+        """
+        return self.search(classification.get("vector_database_retrieval_queries") or [], k=k, **kwargs)
+
+
+def iter_corpus_chunks(corpus_path: str, chunk_words: int = 200, overlap: int = 40) -> Iterator[Dict[str, str]]:
+    """Chunk every .txt/.md file under a directory (or a single file)."""
+    if os.path.isfile(corpus_path):
+        paths = [corpus_path]
+    else:
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(corpus_path)
+            for name in names if name.endswith((".txt", ".md"))
+        )
+    for file_path in paths:
+        with open(file_path, encoding="utf-8") as f:
+            for text in chunk_text(f.read(), chunk_words, overlap):
+                yield {"text": text, "source": file_path}
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Ingest curriculum text into an index")
+    build.add_argument("corpus", help="Text file or directory of .txt/.md files")
+    build.add_argument("index", help="Index directory to create")
+    build.add_argument("--nlist", type=int, default=None, help="IVF lists for approximate search")
+    build.add_argument("--embedder", choices=["hashing", "openai"], default="hashing")
+
+    query = subparsers.add_parser("query", help="Query an index")
+    query.add_argument("index", help="Index directory")
+    query.add_argument("queries", nargs="+", help="Retrieval queries")
+    query.add_argument("-k", type=int, default=5, help="Passages per query")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        embedder = OpenAIEmbedder() if args.embedder == "openai" else HashingEmbedder()
+        VectorIndex.build(iter_corpus_chunks(args.corpus), args.index, embedder=embedder, nlist=args.nlist)
+    else:
+        with open(os.path.join(args.index, "meta.json")) as f:
+            embedder = OpenAIEmbedder() if json.load(f)["embedder"] == "openai" else None
+        results, metrics = VectorIndex(args.index, embedder=embedder).search(args.queries, k=args.k)
+        print(json.dumps({"results": results, "metrics": metrics}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import openai
+from clients import get_client
+from main import SnowBlaze
+from prompts import Comet, Milo, Thalia
+from retrieval import VectorIndex
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+AGENTS = {
+    "Comet": Comet,
+    "Thalia": Thalia,
+    "Milo": Milo,
+}
+
+# Agent the classifier is expected to pick for each query category
+CATEGORY_AGENTS = {
+    "chat": "Comet",
+    "question": "Thalia",
+    "concept": "Milo",
+}
+
+# Speculative retrieval and agent calls from every router share these workers
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="router")
+
+
+class AgentCancelled(Exception):
+    """Raised when a speculative agent call is cancelled after a misprediction."""
+
+
+def format_context(passages: List[List[Dict[str, Any]]], max_passages: int = 6) -> str:
+    """Flatten retrieved passages (best first, de-duplicated) into a reference block."""
+    seen, lines = set(), []
+    for passage in sorted((p for query in passages for p in query), key=lambda p: -p["score"]):
+        if passage["chunk_id"] in seen:
+            continue
+        seen.add(passage["chunk_id"])
+        lines.append(f"[{len(lines) + 1}] {passage['text']}")
+        if len(lines) == max_passages:
+            break
+    return "\n\n".join(lines)
+
+
+class Router:
+    """
+    Routes classified queries to the Comet, Thalia or Milo agent.
+
+    The Zene classification picks the agent, its retrieval queries are run
+    against the local index and the agent answers with that context. In
+    speculative mode, when one query category dominates the session so far,
+    the likely agent (with retrieval on the raw message) starts in parallel
+    with classification and is cancelled if the classifier disagrees.
+    """
+    def __init__(self, classifier: SnowBlaze, index: Optional[VectorIndex] = None,
+                 client: Optional[openai.OpenAI] = None, model_name: str = "gpt-4o",
+                 speculative: bool = False, speculation_threshold: float = 0.6,
+                 min_history: int = 2, k: int = 3):
+        """
+        Initialize the router.
+
+        Args:
+            classifier: SnowBlaze instance that classifies each message
+            index: Optional retrieval index for agent context
+            client: Optional OpenAI client, defaults to the pooled shared client
+            model_name: Model used by the downstream agents
+            speculative: Start the likely agent in parallel with classification
+            speculation_threshold: Minimum session prior of a category to speculate
+            min_history: Classified turns needed before speculating
+            k: Passages retrieved per retrieval query
+        """
+        self.classifier = classifier
+        self.index = index
+        self.client = client or get_client()
+        self.model_name = model_name
+        self.speculative = speculative
+        self.speculation_threshold = speculation_threshold
+        self.min_history = min_history
+        self.k = k
+        self.category_counts = Counter()
+        self.route_history = []
+        self.speculation_stats = {"hits": 0, "misses": 0, "skipped": 0}
+
+    def predict_agent(self) -> Optional[str]:
+        """Return the agent of the dominant query category if its prior is high enough."""
+        total = sum(self.category_counts.values())
+        if total < self.min_history:
+            return None
+        category, count = self.category_counts.most_common(1)[0]
+        if count / total < self.speculation_threshold:
+            return None
+        return CATEGORY_AGENTS.get(category)
+
+    def retrieve(self, queries: List[str]) -> Dict[str, Any]:
+        """Run retrieval queries against the index in one batched search."""
+        if self.index is None or not queries:
+            return {"passages": [], "metrics": {"latency_seconds": 0.0}}
+        with telemetry.span(telemetry.RETRIEVAL, **{"zene.queries": len(queries), "zene.k": self.k}) as trace:
+            passages, metrics = self.index.search(queries, k=self.k)
+            trace.set("zene.passages", sum(len(query_passages) for query_passages in passages))
+        return {"passages": passages, "metrics": metrics}
+
+    def run_agent(self, agent_name: str, message: str, retrieved: Dict[str, Any],
+                  cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Ask a downstream agent to answer the message with the retrieved context.
+
+        The completion is streamed so a cancelled speculative call stops
+        generating (and billing) tokens as soon as the misprediction is known.
+
+        Args:
+            agent_name: Comet, Thalia or Milo
+            message: User message
+            retrieved: Output of retrieve()
+            cancel_event: Optional event that aborts the call when set
+
+        Returns:
+            Dict with the agent name, answer and latency
+        """
+        messages = [{"role": "system", "content": AGENTS[agent_name]["system_prompt"]}]
+        context = format_context(retrieved["passages"])
+        if context:
+            messages.append({"role": "system", "content": f"Reference material:\n{context}"})
+        if self.classifier.summarizer.summary:
+            messages.append({"role": "system", "content": f"Previous conversation summary: {self.classifier.summarizer.summary}"})
+        messages.append({"role": "user", "content": message})
+
+        start_time = time.perf_counter()
+        with telemetry.span(telemetry.AGENT_TURN, **{telemetry.MODEL: self.model_name, "zene.agent": agent_name,
+                                                     "zene.speculative": cancel_event is not None}):
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=0.3,
+                stream=True,
+            )
+            parts = []
+            try:
+                for chunk in stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise AgentCancelled(agent_name)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+            finally:
+                stream.close()
+        return {"agent": agent_name, "answer": "".join(parts), "latency_seconds": time.perf_counter() - start_time}
+
+    def _speculate(self, agent_name: str, message: str, cancel_event: threading.Event) -> Dict[str, Any]:
+        """Speculative branch: retrieval on the raw message, then the predicted agent."""
+        retrieved = self.retrieve([message])
+        if cancel_event.is_set():
+            raise AgentCancelled(agent_name)
+        return {"retrieved": retrieved, "result": self.run_agent(agent_name, message, retrieved, cancel_event)}
+
+    def __call__(self, message: str) -> Dict[str, Any]:
+        """
+        Classify a message and answer it with the chosen agent.
+
+        Args:
+            message: User message
+
+        Returns:
+            Route record with the classification, agent answer, retrieval
+            metrics and timings
+        """
+        with telemetry.span(telemetry.ROUTE) as trace:
+            record = self._route(message)
+            trace.set_attributes(**{"zene.agent": record["agent"], "zene.speculation": record["speculation"] or "none"})
+        return record
+
+    def _route(self, message: str) -> Dict[str, Any]:
+        """Implementation of __call__, inside the route span."""
+        start_time = time.perf_counter()
+        predicted = self.predict_agent() if self.speculative else None
+        speculation: Optional[Future] = None
+        cancel_event = threading.Event()
+        if predicted:
+            # Run in a copy of this context so the branch's spans join the route's trace
+            speculation = _executor.submit(contextvars.copy_context().run, self._speculate, predicted, message,
+                                           cancel_event)
+        elif self.speculative:
+            self.speculation_stats["skipped"] += 1
+
+        classification = self.classifier(message)
+        classification_seconds = time.perf_counter() - start_time
+
+        agent_name = classification.get("next_agent")
+        if agent_name not in AGENTS:
+            logger.warning(f"No valid next_agent in classification, falling back to Comet: {classification}")
+            agent_name = "Comet"
+        category = classification.get("query_category")
+        if category:
+            self.category_counts[category] += 1
+
+        speculative_outcome = None
+        if speculation is not None:
+            if agent_name == predicted:
+                try:
+                    branch = speculation.result()
+                    retrieved, result = branch["retrieved"], branch["result"]
+                    speculative_outcome = "hit"
+                except Exception as e:
+                    logger.warning(f"Speculative {predicted} call failed, rerunning: {e}")
+                    speculative_outcome = "failed"
+                    speculation = None
+            else:
+                cancel_event.set()
+                speculation.cancel()
+                speculative_outcome = "miss"
+                speculation = None
+            self.speculation_stats["hits" if speculative_outcome == "hit" else "misses"] += 1
+            logger.info(f"Speculation {speculative_outcome}: predicted {predicted}, classified {agent_name}")
+
+        if speculation is None:
+            retrieved = self.retrieve(classification.get("vector_database_retrieval_queries") or [])
+            result = self.run_agent(agent_name, message, retrieved)
+
+        record = {
+            "query": message,
+            "classification": classification,
+            "agent": agent_name,
+            "answer": result["answer"],
+            "retrieval": retrieved["metrics"],
+            "speculation": speculative_outcome,
+            "timings": {
+                "classification_seconds": classification_seconds,
+                "agent_seconds": result["latency_seconds"],
+                "total_seconds": time.perf_counter() - start_time,
+            },
+        }
+        self.route_history.append(record)
+        logger.info(f"Routed to {agent_name} in {record['timings']['total_seconds']:.2f} seconds")
+        return record
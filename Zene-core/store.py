@@ -0,0 +1,298 @@
+"""
+Append-only conversation store backed by SQLite in WAL mode.
+
+Usage:
+    python store.py migrate conversations/          # import conversation_user_*.json files
+    python store.py compact --keep-last 500         # keep the newest 500 turns and events per user
+    python store.py tail user_20250320080831 -n 10  # print the last turns of a user
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join("conversations", "zene.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turns_user_timestamp ON turns(user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_turns_timestamp ON turns(timestamp);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_user_timestamp ON events(user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    imported_at REAL NOT NULL
+);
+"""
+
+
+class ConversationStore:
+    """
+    Persists conversation turns and output records one row at a time.
+
+    Each turn is a single INSERT, so saving never re-serializes earlier
+    history. Loading the last N turns of a user is an index range scan on
+    (user_id, timestamp).
+    """
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path: SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def append_turns(self, user_id: str, messages: Iterable[Dict[str, str]],
+                     timestamp: Optional[float] = None) -> List[int]:
+        """
+        Append conversation messages for a user.
+
+        Args:
+            user_id: User the messages belong to
+            messages: Chat messages with role and content
+            timestamp: Time of the turn, defaults to now
+
+        Returns:
+            Turn ids of the appended messages, in order
+        """
+        timestamp = timestamp or time.time()
+        with self._lock:
+            turn_ids = [self._db.execute(
+                "INSERT INTO turns (user_id, timestamp, role, content) VALUES (?, ?, ?, ?)",
+                (user_id, timestamp, m["role"], m["content"])
+            ).lastrowid for m in messages]
+            self._db.commit()
+        return turn_ids
+
+    def append_events(self, user_id: str, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Append output history records (usage, summaries, ...) for a user.
+
+        Args:
+            user_id: User the records belong to
+            records: Output history records
+        """
+        rows = [(user_id, record.get("timestamp") or time.time(), record.get("action", "response"),
+                 json.dumps(record)) for record in records]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO events (user_id, timestamp, kind, payload) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    def load_last_turns(self, user_id: str, n: int = 20) -> List[Dict[str, str]]:
+        """
+        Load the most recent turns of a user, oldest first.
+
+        Args:
+            user_id: User to load
+            n: Number of messages to return
+
+        Returns:
+            Chat messages with role and content
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM turns WHERE user_id = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?", (user_id, n)
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def load_events(self, user_id: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Load output history records of a user, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM events WHERE user_id = ? AND timestamp >= ? ORDER BY timestamp, id",
+                (user_id, since or 0)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def iter_exchanges(self) -> Iterator[Tuple[str, str]]:
+        """Yield (user message, assistant response) pairs of every user, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_id, role, content FROM turns ORDER BY user_id, timestamp, id"
+            ).fetchall()
+        previous = (None, None, None)
+        for row in rows:
+            user_id, role, content = row
+            if role == "assistant" and previous[0] == user_id and previous[1] == "user":
+                yield previous[2], content
+            previous = row
+
+    def iter_responses(self, after_id: int = 0) -> Iterator[Tuple[int, str, float, str]]:
+        """Yield (turn id, user id, timestamp, content) of assistant turns after a turn id, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, user_id, timestamp, content FROM turns WHERE role = 'assistant' AND id > ? ORDER BY id",
+                (after_id,)
+            ).fetchall()
+        yield from rows
+
+    def compact(self, keep_last: Optional[int] = None, older_than: Optional[float] = None) -> int:
+        """
+        Drop old turns and events and reclaim space.
+
+        Args:
+            keep_last: Keep only this many most recent turns, and as many
+                events, per user
+            older_than: Drop rows with timestamps before this time
+
+        Returns:
+            Number of rows deleted
+        """
+        deleted = 0
+        with self._lock:
+            if older_than is not None:
+                deleted += self._db.execute("DELETE FROM turns WHERE timestamp < ?", (older_than,)).rowcount
+                deleted += self._db.execute("DELETE FROM events WHERE timestamp < ?", (older_than,)).rowcount
+            if keep_last is not None:
+                for table in ("turns", "events"):
+                    deleted += self._db.execute(f"""
+                        DELETE FROM {table} WHERE id IN (
+                            SELECT id FROM (
+                                SELECT id, ROW_NUMBER() OVER (
+                                    PARTITION BY user_id ORDER BY timestamp DESC, id DESC
+                                ) AS position FROM {table}
+                            ) WHERE position > ?
+                        )""", (keep_last,)).rowcount
+            self._db.commit()
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._db.execute("VACUUM")
+        logger.info(f"Compacted conversation store, deleted {deleted} rows")
+        return deleted
+
+    def import_json_file(self, path: str) -> bool:
+        """
+        Import a legacy conversation_user_*.json file written by save_conversation.
+
+        Files are imported once; re-running the migration skips them.
+
+        Args:
+            path: JSON file to import
+
+        Returns:
+            True if the file was imported, False if it was already imported
+        """
+        source = os.path.abspath(path)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+                return False
+
+        with open(path) as f:
+            data = json.load(f)
+        try:
+            timestamp = time.mktime(time.strptime(data["timestamp"], "%Y-%m-%d %H:%M:%S"))
+        except (KeyError, ValueError):
+            timestamp = os.path.getmtime(path)
+
+        user_id = data.get("user_id", "unknown")
+        self.append_turns(user_id, [m for m in data.get("conversation", []) if m.get("content")], timestamp)
+        self.append_events(user_id, [{"timestamp": timestamp, **record} for record in data.get("usage_stats", [])])
+        with self._lock:
+            self._db.execute("INSERT INTO imports VALUES (?, ?)", (source, time.time()))
+            self._db.commit()
+        return True
+
+    def migrate_directory(self, directory: str = "conversations") -> int:
+        """
+        Import every conversation_user_*.json file in a directory.
+
+        Args:
+            directory: Directory written by save_conversation
+
+        Returns:
+            Number of newly imported files
+        """
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "conversation_*.json"))):
+            try:
+                if self.import_json_file(path):
+                    imported += 1
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to import {path}: {e}")
+        logger.info(f"Imported {imported} conversation files from {directory}")
+        return imported
+
+
+_default_store: Optional[ConversationStore] = None
+_default_lock = threading.Lock()
+
+
+def get_default_store() -> ConversationStore:
+    """Get the process-wide store at ZENE_STORE_PATH (default conversations/zene.db)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ConversationStore(os.getenv("ZENE_STORE_PATH", DEFAULT_STORE_PATH))
+    return _default_store
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("ZENE_STORE_PATH", DEFAULT_STORE_PATH), help="SQLite file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Import conversation_user_*.json files")
+    migrate.add_argument("directory", nargs="?", default="conversations")
+
+    compact = subparsers.add_parser("compact", help="Drop old turns and reclaim space")
+    compact.add_argument("--keep-last", type=int, default=None, help="Turns (and events) to keep per user")
+    compact.add_argument("--older-than-days", type=float, default=None, help="Drop rows older than this")
+
+    tail = subparsers.add_parser("tail", help="Print the last turns of a user")
+    tail.add_argument("user_id")
+    tail.add_argument("-n", type=int, default=10)
+
+    args = parser.parse_args()
+    store = ConversationStore(args.db)
+    if args.command == "migrate":
+        store.migrate_directory(args.directory)
+    elif args.command == "compact":
+        older_than = time.time() - args.older_than_days * 86400 if args.older_than_days else None
+        store.compact(keep_last=args.keep_last, older_than=older_than)
+    else:
+        for message in store.load_last_turns(args.user_id, args.n):
+            print(f"{message['role']}: {message['content']}")
+
+
+if __name__ == "__main__":
+    main()
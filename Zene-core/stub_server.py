@@ -0,0 +1,335 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from prompt_assembly import SCHEMA_INSTRUCTIONS
+
+# Canned classification that satisfies the Zene response schema
+STUB_CLASSIFICATION = {
+    "topics": ["Indian History"],
+    "sub-topics": ["Chola Administration"],
+    "core_topic": "Chola administration",
+    "user_intent": "Understand the administrative system of the Cholas",
+    "is_ambiguous": False,
+    "query_category": "concept",
+    "target": "curriculum",
+    "is_in_upsc_scope": True,
+    "next_agent": "Milo",
+    "vector_database_retrieval_queries": ["Chola local self-government", "Chola revenue administration"]
+}
+
+# Keys that mark a dict as a JSON Schema node rather than a field template like {"response": "string"}
+_SCHEMA_KEYWORDS = {"type", "properties", "items", "enum", "const", "anyOf", "oneOf"}
+_TEMPLATE_TYPES = {"string", "number", "integer", "boolean", "array", "object", "null"}
+
+
+def schema_instance(schema: Any) -> Any:
+    """
+    Smallest value matching a JSON Schema node or a field template.
+
+    Every property is filled in (strict schemas require them all), enums
+    take their first value and arrays hold one item.
+    """
+    if isinstance(schema, str):
+        schema = {"type": schema} if schema in _TEMPLATE_TYPES else {}
+    elif isinstance(schema, dict) and schema and not _SCHEMA_KEYWORDS & set(schema):
+        schema = {"type": "object", "properties": schema}
+    elif not isinstance(schema, dict):
+        schema = {}
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for keyword in ("anyOf", "oneOf"):
+        if schema.get(keyword):
+            return schema_instance(schema[keyword][0])
+    types = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(types, list):
+        types = next((t for t in types if t != "null"), "null")
+    if types == "object":
+        return {name: schema_instance(sub) for name, sub in schema.get("properties", {}).items()}
+    if types == "array":
+        return [schema_instance(schema.get("items", {}))] * max(schema.get("minItems", 1), 1)
+    if types in ("number", "integer"):
+        return schema.get("minimum", 0)
+    if types == "boolean":
+        return False
+    if types == "null":
+        return None
+    return "stub".ljust(schema.get("minLength", 0), "-")
+
+
+def response_schema(request: Dict[str, Any]) -> Optional[Any]:
+    """
+    Schema a request asks the reply to follow, None for the Zene classification.
+
+    Taken from a json_schema response_format, or else from the schema
+    instructions that schema_system_prompt puts in the system prompt.
+    """
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return (response_format.get("json_schema") or {}).get("schema")
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if message.get("role") == "system" and isinstance(content, str) and SCHEMA_INSTRUCTIONS in content:
+            try:
+                schema, _ = json.JSONDecoder().raw_decode(content, content.index(SCHEMA_INSTRUCTIONS)
+                                                          + len(SCHEMA_INSTRUCTIONS))
+            except ValueError:
+                return None
+            return schema.get("schema", schema) if isinstance(schema, dict) and "name" in schema else schema
+    return None
+
+
+def reply_content(request: Dict[str, Any]) -> str:
+    """
+    Canned reply: the classification, unless the request asks for a schema it does not fit.
+
+    The Zene and agentic-wars classifier schemas get STUB_CLASSIFICATION;
+    other schemas (e.g. a battle's aspirant) get a schema-shaped instance,
+    so replies pass validation without a repair call.
+    """
+    schema = response_schema(request)
+    properties = schema.get("properties") if isinstance(schema, dict) else None
+    if schema is None or (isinstance(properties, dict) and set(properties) <= set(STUB_CLASSIFICATION)):
+        return json.dumps(STUB_CLASSIFICATION)
+    return json.dumps(schema_instance(schema))
+
+
+class RateLimits:
+    """
+    Per-model requests and tokens per minute, refilled continuously like the API's limits.
+    """
+    def __init__(self, rpm: int, tpm: int):
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def admit(self, model: str, tokens: int):
+        """
+        Charge a request against a model's budgets.
+
+        Returns:
+            (admitted, x-ratelimit-* headers); rejected requests also get retry-after
+        """
+        with self._lock:
+            now = time.monotonic()
+            levels, updated = self._levels.get(model, (dict(self.limits), now))
+            levels = {kind: min(limit, levels[kind] + (now - updated) * limit / 60.0)
+                      for kind, limit in self.limits.items()}
+            cost = {"requests": 1, "tokens": min(tokens, self.limits["tokens"])}
+            admitted = all(levels[kind] >= cost[kind] for kind in cost)
+            if admitted:
+                levels = {kind: levels[kind] - cost[kind] for kind in cost}
+            self._levels[model] = (levels, now)
+
+        headers = {}
+        waits = {}
+        for kind, limit in self.limits.items():
+            waits[kind] = max(0.0, (cost[kind] if not admitted else limit) - levels[kind]) * 60.0 / limit
+            headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+            headers[f"x-ratelimit-remaining-{kind}"] = str(int(levels[kind]))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{waits[kind]:.3f}s"
+        if not admitted:
+            headers["retry-after"] = f"{max(waits.values()):.3f}"
+        return admitted, headers
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal emulation of the OpenAI `/chat/completions` and `/models` endpoints,
+    including the `x-ratelimit-*` headers and 429 responses of the real API.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _sleep(self, fraction: float = 1.0):
+        """Wait a share of the simulated latency, with the server's jitter."""
+        latency = self.server.latency
+        if self.server.jitter:
+            with self.server.random_lock:
+                latency = max(0.0, latency + self.server.random.uniform(-self.server.jitter, self.server.jitter))
+        if latency:
+            time.sleep(latency * fraction)
+
+    def do_GET(self):
+        self._sleep()
+        if not self.path.rstrip("/").endswith("/models"):
+            self.send_error(404)
+            return
+        body = json.dumps({
+            "object": "list",
+            "data": [{"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+                     for model in ("gpt-4o", "gpt-4o-mini", "o3-mini")]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        usage = self._usage(request)
+        admitted, limit_headers = self.server.rate_limits.admit(
+            request.get("model", "gpt-4o"), usage["prompt_tokens"] + (request.get("max_tokens") or 80)
+        )
+        if not admitted:
+            body = json.dumps({"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                         "code": "rate_limit_exceeded"}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in limit_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if request.get("stream"):
+            self._stream(request, usage, limit_headers)
+            return
+
+        self._sleep()
+
+        content = reply_content(request)
+        body = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": self._logprobs(request, [content]),
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in limit_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _logprobs(self, request, texts):
+        """Token logprobs (8-character tokens, all at the server's logprob) when the request asks for them."""
+        if not request.get("logprobs"):
+            return None
+        return {"content": [{"token": text[i:i + 8], "logprob": self.server.logprob, "bytes": None, "top_logprobs": []}
+                            for text in texts for i in range(0, len(text), 8)]}
+
+    def _usage(self, request):
+        """
+        Token usage with emulated prompt caching.
+
+        Prompt tokens are estimated at 4 characters per token. Like the real
+        API, the longest message prefix seen in an earlier request is reported
+        as cached, from 1024 tokens on in 128-token increments.
+        """
+        prefix = hashlib.sha256(json.dumps([request.get("model"), request.get("response_format")]).encode())
+        prompt_tokens = cached = 0
+        with self.server.prefix_lock:
+            for message in request.get("messages", []):
+                prompt_tokens += len(str(message.get("content", ""))) // 4 + 4
+                prefix.update(json.dumps(message, sort_keys=True).encode())
+                key = prefix.hexdigest()
+                if key in self.server.prefixes:
+                    cached = prompt_tokens
+                self.server.prefixes.add(key)
+        cached = cached // 128 * 128 if cached >= 1024 else 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 80,
+            "total_tokens": prompt_tokens + 80,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _stream(self, request, usage, limit_headers):
+        """Send the canned reply as server-sent events, spreading the latency over the chunks."""
+        content = reply_content(request)
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in limit_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        base = {"id": completion_id, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "gpt-4o")}
+        for piece in pieces:
+            self._sleep(1 / len(pieces))
+            send_event(json.dumps({**base, "choices": [
+                {"index": 0, "delta": {"content": piece}, "logprobs": self._logprobs(request, [piece]),
+                 "finish_reason": None}
+            ]}))
+        send_event(json.dumps({**base, "choices": [], "usage": usage}))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a deep accept backlog, for benchmarks opening many connections at once."""
+    request_queue_size = 512
+    daemon_threads = True
+
+
+def start_stub_server(latency: float = 0.05, port: int = 0, logprob: float = -0.01,
+                      jitter: float = 0.0, rpm: int = 10000, tpm: int = 30000000,
+                      seed: int = 0) -> Tuple[StubServer, str]:
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        latency: Simulated model latency in seconds per request
+        port: Port to bind, 0 picks a free one
+        logprob: Logprob reported for every token when logprobs are requested
+        jitter: Uniform jitter on the latency, in seconds either way
+        rpm: Requests per minute allowed per model before answering 429
+        tpm: Tokens per minute allowed per model before answering 429
+        seed: Seed of the jitter
+
+    Returns:
+        The running server and its OpenAI-compatible base URL
+    """
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    server.latency = latency
+    server.logprob = logprob
+    server.jitter = jitter
+    server.random = random.Random(seed)
+    server.random_lock = threading.Lock()
+    server.rate_limits = RateLimits(rpm, tpm)
+    server.prefixes = set()
+    server.prefix_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    server, base_url = start_stub_server()
+    print(f"Stub OpenAI server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
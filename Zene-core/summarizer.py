@@ -0,0 +1,160 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+from clients import get_client
+from prompts import summary as summary_prompts
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Background summaries for every agent in the process share these workers
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+
+class RollingSummarizer:
+    """
+    Maintains a running conversation summary by folding in only new turns.
+
+    Each update sends the current summary plus the turns evicted since the
+    last update, so summary prompts grow with the delta instead of the whole
+    history. Updates can run on a background thread; they are serialized per
+    summarizer so no evicted turn is lost or summarized twice. The state lock
+    is never held across the API call, so submit() and clear() return at once.
+    """
+    def __init__(self, client: Optional[openai.OpenAI] = None, model: str = "gpt-4o",
+                 max_tokens: int = 1000, on_update: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialize the summarizer.
+
+        Args:
+            client: Optional OpenAI client, defaults to the pooled shared client
+            model: Model used to generate summaries
+            max_tokens: Maximum length of the summary
+            on_update: Optional callback receiving a usage record per update
+        """
+        self.client = client or get_client()
+        self.model = model
+        self.max_tokens = max_tokens
+        self.on_update = on_update
+        self.summary = ""
+        self._pending: List[Dict[str, str]] = []
+        # _lock guards summary, _pending and _generation; _update_lock serializes updates
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        # Bumped by clear() so an update already in flight is discarded
+        self._generation = 0
+        self._future: Optional[Future] = None
+
+    def submit(self, turns: List[Dict[str, str]]) -> Future:
+        """
+        Queue evicted turns and fold them into the summary in the background.
+
+        Args:
+            turns: Conversation messages that left the context window
+
+        Returns:
+            Future resolving to the updated summary
+        """
+        with self._lock:
+            self._pending.extend(turns)
+        self._future = _executor.submit(self._drain)
+        return self._future
+
+    def fold(self, turns: List[Dict[str, str]]) -> str:
+        """
+        Fold turns into the summary and wait for the result.
+
+        Any background update still in flight is included.
+
+        Args:
+            turns: Conversation messages to add to the summary
+
+        Returns:
+            str: The updated summary
+        """
+        with self._lock:
+            self._pending.extend(turns)
+        return self._drain()
+
+    def wait(self) -> str:
+        """Block until queued background updates have finished."""
+        future = self._future
+        if future is not None and future.exception() is not None:
+            logger.warning(f"Background summary update failed: {future.exception()}")
+        return self.summary
+
+    def clear(self) -> None:
+        """Forget the summary and any queued turns; an update in flight is discarded."""
+        with self._lock:
+            self.summary = ""
+            self._pending = []
+            self._generation += 1
+
+    def _drain(self) -> str:
+        """Fold every pending turn into the summary (serialized by the update lock)."""
+        with self._update_lock:
+            with self._lock:
+                turns = [turn for turn in self._pending if turn.get("content")]
+                self._pending = []
+                summary, generation = self.summary, self._generation
+            if not turns:
+                return summary
+
+            messages = [
+                {"role": "system", "content": summary_prompts["system_prompt"]},
+                {"role": "user", "content": summary_prompts["incremental_prompt"].format(
+                    summary=summary or "(no summary yet)",
+                    turns=json.dumps(turns)
+                )}
+            ]
+
+            start_time = time.perf_counter()
+            with telemetry.span(telemetry.SUMMARY, **{telemetry.MODEL: self.model,
+                                                      "zene.summarized_messages": len(turns)}) as trace:
+                try:
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.0,
+                        max_tokens=self.max_tokens
+                    )
+                except Exception as e:
+                    # Keep the turns so the next update retries them, unless they were cleared meanwhile
+                    with self._lock:
+                        if self._generation == generation:
+                            self._pending = turns + self._pending
+                    logger.error(f"Failed to update summary: {str(e)}", exc_info=True)
+                    raise
+                trace.set_attributes(**{telemetry.INPUT_TOKENS: response.usage.prompt_tokens,
+                                        telemetry.OUTPUT_TOKENS: response.usage.completion_tokens})
+            latency = time.perf_counter() - start_time
+
+            summary = response.choices[0].message.content
+            with self._lock:
+                if self._generation != generation:
+                    logger.info("Discarding summary update finished after the summarizer was cleared")
+                    return self.summary
+                self.summary = summary
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+                "latency_seconds": latency,
+                "summarized_messages": len(turns)
+            }
+            logger.info(f"Summary update - Token usage: {usage}")
+            logger.info(f"Summary update - Latency: {latency:.2f} seconds")
+
+            if self.on_update:
+                self.on_update({
+                    "action": "summary_update",
+                    "summary": summary,
+                    "usage": usage,
+                    "timestamp": time.time()
+                })
+            return summary
@@ -0,0 +1,347 @@
+"""
+Tracing spans and Prometheus metrics for Zene.
+
+Usage:
+    ZENE_TELEMETRY=1 ZENE_METRICS_PORT=9464 streamlit run app.py
+    curl localhost:9464/metrics
+
+Spans follow the OpenTelemetry model (trace and span ids, parent links
+through contextvars, attributes named after the gen_ai semantic
+conventions) without requiring the SDK. Finished spans are kept in a small
+in-memory buffer, optionally appended to ZENE_TRACE_FILE as JSON lines, and
+folded into Prometheus counters and histograms served at /metrics.
+
+Telemetry is off unless ZENE_TELEMETRY or ZENE_METRICS_PORT is set. While
+off, span() returns one shared no-op object, so instrumented code pays a
+function call and an attribute check per span.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Span names
+CLASSIFICATION = "zene.classification"
+SUMMARY = "zene.summary"
+RETRIEVAL = "zene.retrieval"
+AGENT_TURN = "zene.agent_turn"
+ROUTE = "zene.route"
+
+# Span attributes (gen_ai.* from the OpenTelemetry semantic conventions)
+MODEL = "gen_ai.request.model"
+INPUT_TOKENS = "gen_ai.usage.input_tokens"
+OUTPUT_TOKENS = "gen_ai.usage.output_tokens"
+CACHED_TOKENS = "gen_ai.usage.cached_input_tokens"
+CACHE_HIT = "zene.cache_hit"
+RETRIES = "zene.retries"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = bool(os.getenv("ZENE_TELEMETRY", "").lower() in ("1", "true", "yes") or os.getenv("ZENE_METRICS_PORT"))
+_current_span: contextvars.ContextVar = contextvars.ContextVar("zene_span", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(flag: bool = True) -> None:
+    """Turn span recording on or off for the process."""
+    global _enabled
+    _enabled = flag
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in Prometheus layout."""
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip((*self.buckets, "+Inf"), series):
+                    cumulative += count
+                    le = 'le="{}"'.format(bound if bound == "+Inf" else f"{bound:g}")
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative:g}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]:g}")
+        return lines
+
+
+SPAN_DURATION = Histogram("zene_span_duration_seconds", "Duration of Zene spans")
+SPAN_ERRORS = Counter("zene_span_errors_total", "Spans that ended with an exception")
+TOKENS = Counter("zene_tokens_total", "Tokens used by Zene spans, by model and kind")
+CACHE_HITS = Counter("zene_cache_hits_total", "Classifications answered without an API call, by tier")
+LLM_REQUESTS = Counter("zene_llm_requests_total", "HTTP requests to the OpenAI API, by model and status")
+LLM_REQUEST_DURATION = Histogram("zene_llm_request_duration_seconds", "OpenAI API request latency")
+LLM_RETRIES = Counter("zene_llm_retries_total", "Repeated OpenAI API requests within one span")
+METRICS = [SPAN_DURATION, SPAN_ERRORS, TOKENS, CACHE_HITS, LLM_REQUESTS, LLM_REQUEST_DURATION, LLM_RETRIES]
+
+_finished = deque(maxlen=1000)
+_trace_file_lock = threading.Lock()
+
+
+class Span:
+    """
+    A timed operation with attributes; use as a context manager.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "start_time",
+                 "attributes", "status", "attempts", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.status = "ok"
+        # API requests per model made while the span was current
+        self.attempts: Dict[str, int] = {}
+        self.start = self.end = None
+        self.start_time = None
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end = time.perf_counter()
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a generator closed elsewhere)
+            pass
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.status = "error"
+            self.attributes["error.type"] = exc_type.__name__
+        retries = sum(count - 1 for count in self.attempts.values())
+        if retries:
+            self.attributes[RETRIES] = retries
+        _finish(self)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_seconds": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while telemetry is off."""
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Start a span, e.g. `with telemetry.span(CLASSIFICATION, **{MODEL: "gpt-4o"}) as trace:`.
+
+    Returns:
+        A Span, or the shared no-op span while telemetry is off
+    """
+    if not _enabled:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def current_span():
+    """The innermost open span of this context, or the no-op span."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def _finish(finished: Span) -> None:
+    """Fold a finished span into the metrics and the exporters."""
+    attributes = finished.attributes
+    model = attributes.get(MODEL, "")
+    SPAN_DURATION.observe(finished.duration, span=finished.name, model=model)
+    if finished.status == "error":
+        SPAN_ERRORS.inc(span=finished.name, model=model)
+    for kind, key in (("input", INPUT_TOKENS), ("output", OUTPUT_TOKENS), ("cached_input", CACHED_TOKENS)):
+        if attributes.get(key):
+            TOKENS.inc(attributes[key], span=finished.name, model=model, kind=kind)
+    if attributes.get(CACHE_HIT):
+        CACHE_HITS.inc(tier=attributes[CACHE_HIT])
+    if attributes.get(RETRIES):
+        LLM_RETRIES.inc(attributes[RETRIES], span=finished.name, model=model)
+
+    _finished.append(finished)
+    path = os.getenv("ZENE_TRACE_FILE")
+    if path:
+        line = json.dumps(finished.to_dict(), default=str)
+        with _trace_file_lock, open(path, "a") as f:
+            f.write(line + "\n")
+
+
+def record_request(model: str, status: int, seconds: float) -> None:
+    """
+    Record one HTTP request to the API; called by the pooled clients' transport.
+
+    Requests for the same model inside one span count as attempts, so the
+    openai client's own retries show up as the span's retry count.
+    """
+    if not _enabled:
+        return
+    LLM_REQUESTS.inc(model=model, status=status)
+    LLM_REQUEST_DURATION.observe(seconds, model=model)
+    current = _current_span.get()
+    if current is not None:
+        current.attempts[model] = current.attempts.get(model, 0) + 1
+
+
+def recent_spans(name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Finished spans kept in memory (newest last), optionally filtered by name."""
+    return [s.to_dict() for s in list(_finished) if name is None or s.name == name]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1") -> Optional[str]:
+    """
+    Serve /metrics on a background thread, once per process.
+
+    Args:
+        port: Port to bind, defaults to ZENE_METRICS_PORT; 0 picks a free one
+        host: Interface to bind
+
+    Returns:
+        The metrics URL, or None when no port is configured
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            if port is None:
+                configured = os.getenv("ZENE_METRICS_PORT")
+                if not configured:
+                    return None
+                port = int(configured)
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                # Another process (e.g. a second Streamlit session) already serves this port
+                logger.warning(f"Metrics server not started on port {port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True, name="zene-metrics").start()
+            enable()
+            logger.info(f"Serving metrics on http://{host}:{_server.server_address[1]}/metrics")
+        return f"http://{host}:{_server.server_address[1]}/metrics"
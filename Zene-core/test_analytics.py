@@ -0,0 +1,39 @@
+"""
+Backfill must not re-count classifications already recorded live.
+
+Usage:
+    python -m pytest test_analytics.py
+"""
+import os
+
+from analytics import AnalyticsStore
+from clients import configure_transport
+from main import SnowBlaze
+from store import ConversationStore
+
+
+def test_backfill_after_live_record_keeps_totals(tmp_path):
+    configure_transport("stub")
+    store = ConversationStore(os.path.join(tmp_path, "zene.db"))
+    analytics = AnalyticsStore(os.path.join(tmp_path, "analytics.db"))
+    agent = SnowBlaze(user_id="u1", cache=False, store=store, profiles=False, analytics=analytics,
+                      fast_path=False)
+    for query in ["Explain the Chola administration", "What is the fiscal deficit?"]:
+        assert "error" not in agent(query)
+
+    live = analytics.summary("u1")
+    live_topics = analytics.top("topic", "u1")
+    assert live["queries"] == 2
+
+    assert analytics.backfill(store) == 0
+    assert analytics.backfill(store) == 0
+    assert analytics.summary("u1") == live
+    assert analytics.top("topic", "u1") == live_topics
+
+    # Turns stored without live analytics are still picked up, once
+    store.append_turns("u2", [{"role": "user", "content": "q"},
+                              {"role": "assistant", "content": agent.conversations[-1]["content"]}])
+    assert analytics.backfill(store) == 1
+    assert analytics.backfill(store) == 0
+    assert analytics.summary("u2")["queries"] == 1
+    assert analytics.summary("u1") == live
@@ -0,0 +1,71 @@
+"""
+Response cache: exact and similarity tiers, LRU and TTL eviction, persistence.
+
+Usage:
+    python -m pytest test_cache.py
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import cache
+from cache import ResponseCache
+from main import SnowBlaze
+
+REPLY = json.dumps({"response": "ok"})
+
+
+def keys(query, history=()):
+    messages = [*history, {"role": "user", "content": query}]
+    return ResponseCache.make_keys("system", {"type": "object"}, "gpt-4o", messages)
+
+
+def test_exact_tier_ignores_case_and_whitespace():
+    responses = ResponseCache()
+    responses.set(keys("What is the  Preamble?"), REPLY)
+
+    assert responses.get(keys("what is the preamble? ")) == (REPLY, "exact")
+    assert responses.get(keys("What is the Preamble?", history=[{"role": "user", "content": "hi"}])) == (None, None)
+    assert responses.stats["exact_hits"] == 1 and responses.stats["misses"] == 1
+
+
+def test_similar_tier_needs_the_same_context_and_threshold():
+    responses = ResponseCache(similarity_threshold=0.8)
+    responses.set(keys("explain the fundamental rights"), REPLY)
+
+    assert responses.get(keys("explain the fundamental right")) == (REPLY, "similar")
+    assert responses.get(keys("who wrote the constitution")) == (None, None)
+    assert responses.get(keys("explain the fundamental right", history=[{"role": "user", "content": "hi"}])) == (None, None)
+    assert ResponseCache().get(keys("explain the fundamental right")) == (None, None)
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: now[0]))
+    responses = ResponseCache(max_entries=2, ttl_seconds=60)
+    responses.set(keys("a"), REPLY)
+    responses.set(keys("b"), REPLY)
+    responses.get(keys("a"))
+    responses.set(keys("c"), REPLY)
+
+    assert responses.get(keys("b")) == (None, None)
+    assert responses.stats["evictions"] == 1
+    now[0] += 61
+    assert responses.get(keys("a")) == (None, None)
+    assert len(responses._entries) == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = os.path.join(tmp_path, "cache.db")
+    ResponseCache(path=path).set(keys("a"), REPLY)
+
+    assert ResponseCache(path=path).get(keys("a")) == (REPLY, "exact")
+    assert ResponseCache(path=path, ttl_seconds=-1).get(keys("a")) == (None, None)
+
+
+def test_only_json_objects_are_cached():
+    agent = SimpleNamespace(cache=ResponseCache())
+    for n, content in enumerate([None, "", "not json", '{"response": "cut', "[1, 2]", '"text"', REPLY]):
+        SnowBlaze._store_in_cache(agent, keys(str(n)), content)
+
+    assert [entry[2] for entry in agent.cache._entries.values()] == [REPLY]
@@ -0,0 +1,47 @@
+"""
+A recorded script replays any number of times, whatever the profile store holds.
+
+Usage:
+    python -m pytest test_cassette.py
+"""
+import os
+
+import pytest
+
+from clients import TRANSPORT_SETTINGS, configure_transport
+from main import SnowBlaze
+from profiles import ProfileStore
+from stub_server import start_stub_server
+
+SCRIPT = ["Explain the Chola administration", "What is the fiscal deficit?", "thanks, that helps"]
+
+
+@pytest.fixture
+def transport_settings():
+    saved = dict(TRANSPORT_SETTINGS)
+    yield
+    TRANSPORT_SETTINGS.update(saved)
+
+
+def run_script(profiles):
+    agent = SnowBlaze(user_id="u1", cache=False, store=False, profiles=profiles, analytics=False, fast_path=False)
+    return [agent(query) for query in SCRIPT]
+
+
+def test_replay_twice_with_shared_profiles(tmp_path, monkeypatch, transport_settings):
+    server, base_url = start_stub_server(latency=0)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    profiles = ProfileStore(os.path.join(tmp_path, "profiles.db"))
+    cassette = os.path.join(tmp_path, "cassette.db")
+
+    configure_transport("record", cassette)
+    recorded = run_script(profiles)
+    server.shutdown()
+    assert all("error" not in response for response in recorded)
+    # Every turn folded its topics into the profile, so the next runs send a different snippet
+    assert profiles.get("u1")["topics"]
+
+    configure_transport("replay", cassette, latency=0)
+    assert run_script(profiles) == recorded
+    assert run_script(profiles) == recorded
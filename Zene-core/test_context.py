@@ -0,0 +1,62 @@
+"""
+Context window: token budgets, exchange-wise eviction and watermarks.
+
+Usage:
+    python -m pytest test_context.py
+"""
+from context import ContextWindow, count_message_tokens
+
+SUMMARY = {"role": "system", "content": "Summary of earlier turns"}
+
+
+def exchange(n):
+    return [{"role": "user", "content": f"question number {n}"},
+            {"role": "assistant", "content": f"answer number {n}"}]
+
+
+def history(turns):
+    return [message for n in range(turns) for message in exchange(n)]
+
+
+def pair_tokens():
+    return sum(count_message_tokens(message) for message in exchange(0))
+
+
+def test_history_under_budget_is_untouched():
+    messages = [SUMMARY, *history(3)]
+    kept, evicted, stats = ContextWindow(default_budget=10000).fit(messages, model="unknown")
+
+    assert kept == messages and evicted == []
+    assert stats["evicted_tokens"] == 0
+    assert stats["history_tokens"] == ContextWindow().count(messages)
+
+
+def test_oldest_exchanges_are_evicted_whole_and_summary_is_kept():
+    budget = count_message_tokens(SUMMARY) + 3 * pair_tokens()
+    kept, evicted, stats = ContextWindow(default_budget=budget).fit([SUMMARY, *history(5)], model="unknown")
+
+    assert kept == [SUMMARY, *exchange(2), *exchange(3), *exchange(4)]
+    assert evicted == [*exchange(0), *exchange(1)]
+    assert stats["evicted_messages"] == 4
+    assert stats["history_tokens"] <= budget
+
+
+def test_reserve_leaves_room_for_the_prompt():
+    budget = 3 * pair_tokens()
+    kept, _, stats = ContextWindow(default_budget=budget).fit(history(3), model="unknown", reserve=pair_tokens())
+
+    assert kept == history(3)[2:]
+    assert stats["budget"] == 2 * pair_tokens()
+
+
+def test_watermarks_evict_in_batches():
+    window = ContextWindow(default_budget=10 * pair_tokens(), high_watermark=1.0, low_watermark=0.5)
+
+    kept, evicted, _ = window.fit(history(10), model="unknown")
+    assert evicted == []
+    kept, evicted, stats = window.fit(history(11), model="unknown")
+    # Trimmed to half the budget at once rather than one exchange per turn
+    assert evicted + kept == history(11) and len(evicted) >= 2 * 6 and len(evicted) % 2 == 0
+    assert stats["history_tokens"] <= 5 * pair_tokens()
+    kept, evicted, _ = window.fit(kept + exchange(11), model="unknown")
+    assert evicted == []
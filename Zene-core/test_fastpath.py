@@ -0,0 +1,71 @@
+"""
+Offline fast path: training, local answers, fallbacks and the model file.
+
+Usage:
+    python -m pytest test_fastpath.py
+"""
+import json
+import os
+
+import pytest
+
+from bench_fastpath import synthetic_examples
+from fastpath import FastPathClassifier, hashed_features, iter_examples, label_of
+
+BUCKETS = 1 << 14
+
+
+@pytest.fixture(scope="module")
+def model():
+    return FastPathClassifier.train(synthetic_examples(600), buckets=BUCKETS, epochs=100, threshold=0.8)
+
+
+def test_label_and_features():
+    assert label_of({"next_agent": "Comet", "query_category": "chat", "target": "other"}) == "Comet/chat/other"
+    assert label_of({"next_agent": "Comet", "query_category": None, "target": "other"}) is None
+    features = hashed_features("Hello  THERE", BUCKETS)
+    assert list(features) == sorted(set(features)) and features.max() < BUCKETS
+    assert list(features) == list(hashed_features("hello there", BUCKETS))
+
+
+def test_chit_chat_is_answered_from_the_template(model):
+    content, meta = model.classify("hello!")
+    assert meta["label"] == "Comet/chat/other" and meta["confidence"] >= 0.8
+    assert json.loads(content) == model.templates["Comet/chat/other"]
+    assert json.loads(content)["query_category"] == "chat"
+
+
+def test_unserved_long_and_uncertain_queries_fall_back(model):
+    assert model.classify("explain fiscal deficit in detail") is None
+    assert model.classify(" ".join(["hello"] * (model.max_words + 1))) is None
+    model.threshold = 1.0
+    try:
+        assert model.classify("hello!") is None
+    finally:
+        model.threshold = 0.8
+    assert model.stats["fallbacks"] == 3
+
+
+def test_save_and_load_keep_predictions(model, tmp_path):
+    path = os.path.join(tmp_path, "fastpath.npz")
+    model.save(path)
+    loaded = FastPathClassifier.load(path)
+
+    assert (loaded.labels, loaded.threshold, loaded.buckets) == (model.labels, 0.8, BUCKETS)
+    for text in ["hi", "thanks", "who are you", "what is monsoon"]:
+        label, confidence = model.predict(text)
+        assert loaded.predict(text)[0] == label
+        assert loaded.predict(text)[1] == pytest.approx(confidence, abs=0.01)
+    assert FastPathClassifier.load(path, threshold=0.5).threshold == 0.5
+
+
+def test_iter_examples_dedupes_and_skips_unparsable_responses(tmp_path):
+    path = os.path.join(tmp_path, "results.jsonl")
+    chat = {"next_agent": "Comet", "query_category": "chat", "target": "other"}
+    with open(path, "w") as f:
+        for record in [{"query": "Hi", "response": json.dumps(chat)}, {"query": "hi ", "response": chat},
+                       {"query": "hello", "response": "Error: timeout"}, {"query": "", "response": chat}]:
+            f.write(json.dumps(record) + "\n")
+        f.write("not json\n")
+
+    assert list(iter_examples(label_files=[path])) == [("Hi", chat)]
@@ -0,0 +1,66 @@
+"""
+Output history: bounded ring buffer, payload off-loading and aggregates.
+
+Usage:
+    python -m pytest test_history.py
+"""
+from history import LATENCY_BOUNDS, LatencyHistogram, OutputHistory
+
+
+def response(n, latency=0.5, **extra):
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "latency_seconds": latency}
+    return {"query": f"q{n}", "response": f"a{n}", "usage": usage, "timestamp": 100.0 + n, **extra}
+
+
+def test_ring_buffer_keeps_recent_records_and_totals_over_all():
+    history = OutputHistory(capacity=3)
+    history.extend(response(n) for n in range(10))
+
+    assert len(history) == 3
+    assert [record["query"] for record in history] == ["q7", "q8", "q9"]
+    assert history[-1].get("usage")["total_tokens"] == 15
+    summary = history.summary()
+    assert summary["responses"] == summary["calls"] == 10
+    assert summary["total_tokens"] == 150
+    assert history.total_records == 10
+
+
+def test_cache_hits_and_fast_path_stay_out_of_latency():
+    history = OutputHistory()
+    history.append(response(0, latency=2.0))
+    history.append(response(1, latency=0.001, cache_hit=True))
+    history.append(response(2, latency=0.001, fast_path="greeting"))
+    history.append({"action": "summary_update", "summary": "s", "usage": {"total_tokens": 40}})
+
+    summary = history.summary()
+    assert (summary["responses"], summary["calls"], summary["cache_hits"], summary["fast_path_answers"]) == (3, 1, 1, 1)
+    assert summary["total_summary_tokens"] == 40
+    assert summary["max_latency_seconds"] == summary["total_latency_seconds"] == 2.0
+    assert history.kinds == {"response": 3, "summary_update": 1}
+
+
+def test_payload_is_dropped_once_the_sink_persists_it():
+    persisted = []
+    history = OutputHistory(sink=persisted.extend)
+    history.append(response(0))
+    assert persisted == [response(0)]
+    assert "query" not in history[0].as_dict()
+
+    def failing_sink(records):
+        raise OSError("disk full")
+
+    history = OutputHistory(sink=failing_sink)
+    history.append(response(0))
+    assert (history[0]["query"], history[0]["response"]) == ("q0", "a0")
+
+
+def test_percentiles_are_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    for seconds in [0.1] * 98 + [5.0, 8.0]:
+        histogram.add(seconds)
+
+    assert 0.1 <= histogram.percentile(50) < 0.1 * 1.34
+    assert histogram.percentile(50) in LATENCY_BOUNDS
+    assert 5.0 <= histogram.percentile(99) <= 8.0
+    assert histogram.percentile(100) == 8.0
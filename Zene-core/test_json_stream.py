@@ -0,0 +1,49 @@
+"""
+Incremental JSON parser: top-level fields surface as soon as they complete.
+
+Usage:
+    python -m pytest test_json_stream.py
+"""
+import json
+
+from json_stream import IncrementalJSONParser
+
+DOCUMENT = {
+    "next_agent": "History",
+    "topics": ["Mughal Empire", "Akbar, the Great"],
+    "meta": {"nested": {"a": [1, {"b": "}"}]}},
+    "response": "Quotes \" and braces { ] inside strings",
+    "confidence": 0.9,
+}
+
+
+def test_fields_complete_in_order_for_any_chunking():
+    text = json.dumps(DOCUMENT, indent=2)
+    for size in (1, 3, 7, len(text)):
+        parser = IncrementalJSONParser()
+        completed = []
+        for start in range(0, len(text), size):
+            completed.extend(parser.feed(text[start:start + size]))
+
+        assert completed == list(DOCUMENT.items())
+        assert parser.fields == DOCUMENT
+
+
+def test_field_is_returned_by_the_chunk_that_completes_it():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"next_agent": "Hist') == []
+    assert parser.feed('ory", "topics": [') == [("next_agent", "History")]
+    assert parser.feed('"Polity"]') == []
+    assert parser.feed("}") == [("topics", ["Polity"])]
+
+
+def test_escaped_quote_at_a_chunk_boundary():
+    parser = IncrementalJSONParser()
+    parser.feed('{"response": "say \\')
+    assert parser.feed('"hi\\"", "x": 1}') == [("response", 'say "hi"'), ("x", 1)]
+
+
+def test_truncated_stream_yields_only_complete_fields():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"next_agent": "General", "response": "The Preamble') == [("next_agent", "General")]
+    assert parser.fields == {"next_agent": "General"}
@@ -0,0 +1,44 @@
+"""
+Profile store: seeding, topic updates and the prompt snippet.
+
+Usage:
+    python -m pytest test_profiles.py
+"""
+import os
+
+from context import count_text_tokens
+from profiles import MAX_TOPICS, PROFILE_HEADER, SEED_PROFILES, ProfileStore, profile_snippet
+
+
+def test_seed_only_fills_an_empty_store(tmp_path):
+    path = os.path.join(tmp_path, "profiles.db")
+    store = ProfileStore(path, seed=SEED_PROFILES)
+    assert store.get("user123")["user_name"] == "Ajay"
+
+    store.put("user123", {**store.get("user123"), "user_name": "Ajay K"})
+    assert ProfileStore(path, seed=SEED_PROFILES).get("user123")["user_name"] == "Ajay K"
+    assert len(ProfileStore(os.path.join(tmp_path, "unseeded.db"))) == 0
+
+
+def test_record_topics_persists_and_bounds_counts(tmp_path):
+    path = os.path.join(tmp_path, "profiles.db")
+    store = ProfileStore(path)
+    store.record_topics("u1", ["Polity", "History"], ["Federalism"])
+    profile = store.record_topics("u1", ["Polity"], [])
+    assert profile["topics"] == {"History": 1, "Polity": 2}
+
+    # A new store reads the profile back from SQLite
+    assert ProfileStore(path).get("u1")["sub_topics"] == {"Federalism": 1}
+
+    store.record_topics("u1", [f"topic {i}" for i in range(MAX_TOPICS + 10)])
+    assert len(store.get("u1")["topics"]) == MAX_TOPICS
+    assert store.get("u1")["topics"]["Polity"] == 2
+
+
+def test_snippet_stays_within_budget():
+    profile = {"user_name": "Ajay", "topics": {f"topic {i}": i for i in range(50)}, "sub_topics": {},
+               "score": {"mock_tests": [{"score": 85}]}}
+    snippet = profile_snippet(profile, max_tokens=40)
+    assert snippet.startswith(PROFILE_HEADER + "Name: Ajay; Most explored topics: topic 49")
+    assert count_text_tokens(snippet) <= 40
+    assert profile_snippet({"topics": {}}) == ""
@@ -0,0 +1,98 @@
+"""
+Rate limiting: token buckets, batch reserve, 429 pauses and the transport.
+
+Usage:
+    python -m pytest test_ratelimit.py
+"""
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import ratelimit
+from ratelimit import BATCH, RateLimitScheduler, RateLimitedTransport, TokenBucket, parse_duration
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it."""
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=lambda: now[0], perf_counter=lambda: now[0],
+                                                           sleep=sleep))
+    return now
+
+
+def limits(requests, tokens, status_code=200, **headers):
+    return httpx.Response(status_code, headers={
+        "x-ratelimit-limit-requests": str(requests), "x-ratelimit-remaining-requests": str(requests),
+        "x-ratelimit-limit-tokens": str(tokens), "x-ratelimit-remaining-tokens": str(tokens), **headers,
+    })
+
+
+def test_parse_duration():
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("1.5s") == 1.5
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("2") == 2.0
+    assert parse_duration("") is None and parse_duration("soon") is None
+
+
+def test_bucket_refills_continuously_and_admits_oversized_calls_when_full(clock):
+    bucket = TokenBucket()
+    assert bucket.wait_for(10 ** 9) == 0.0
+    bucket.update(600, 600)
+    bucket.take(600)
+
+    assert bucket.wait_for(60) == pytest.approx(6.0)
+    bucket.refill(clock[0] + 6.0)
+    assert bucket.wait_for(60) == 0.0
+    bucket.refill(clock[0] + 600.0)
+    assert bucket.level == 600
+    assert bucket.wait_for(10 ** 6) == 0.0
+
+
+def test_batch_calls_leave_the_reserve_to_interactive_calls(clock):
+    scheduler = RateLimitScheduler(batch_reserve=0.2)
+    scheduler.observe("gpt-4o", limits(60, 100000))
+    # Batch calls stop with 12 requests (20%) left in the bucket
+    for _ in range(48):
+        assert scheduler.acquire("gpt-4o", 10, priority=BATCH) == 0.0
+
+    assert scheduler._try_acquire("gpt-4o", 10, BATCH) > 0
+    for _ in range(12):
+        assert scheduler.acquire("gpt-4o", 10) == 0.0
+    # The bucket is empty now; the next call waits for one request's refill
+    assert scheduler.acquire("gpt-4o", 10) == pytest.approx(1.0)
+    assert scheduler.stats["admitted"] == 61 and scheduler.stats["queued"] == 1
+
+
+def test_429_pauses_the_model_until_reset(clock):
+    scheduler = RateLimitScheduler()
+    scheduler.observe("gpt-4o", limits(1000, 100000, status_code=429, **{"retry-after": "3"}))
+
+    assert scheduler.acquire("gpt-4o", 10) == pytest.approx(3.0)
+    assert scheduler.acquire("gpt-4o-mini", 10) == 0.0
+    assert scheduler.stats["throttled"] == 1
+
+
+def test_transport_admits_model_requests_only(clock):
+    scheduler = RateLimitScheduler()
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return limits(60, 100000)
+
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handler), scheduler))
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 50}
+    client.post("https://api.test/v1/chat/completions", content=json.dumps(body))
+    client.get("https://api.test/v1/models")
+
+    assert seen == ["/v1/chat/completions", "/v1/models"]
+    assert scheduler.stats["admitted"] == 1
+    assert scheduler.snapshot()["gpt-4o"]["requests_limit"] == 60
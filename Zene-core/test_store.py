@@ -0,0 +1,51 @@
+"""
+Conversation store: appends, per-user reads and compaction.
+
+Usage:
+    python -m pytest test_store.py
+"""
+import os
+
+from store import ConversationStore
+
+
+def exchange(n):
+    return [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}]
+
+
+def test_append_and_load_last_turns(tmp_path):
+    store = ConversationStore(os.path.join(tmp_path, "zene.db"))
+    ids = [store.append_turns("u1", exchange(n), timestamp=100.0 + n) for n in range(3)]
+    store.append_turns("u2", exchange(9), timestamp=200.0)
+
+    assert [turn_id for pair in ids for turn_id in pair] == sorted(turn_id for pair in ids for turn_id in pair)
+    assert store.load_last_turns("u1", 3) == [exchange(1)[1], *exchange(2)]
+    assert [content for _, _, _, content in store.iter_responses(after_id=ids[0][1])] == ["a1", "a2", "a9"]
+    assert list(store.iter_exchanges()) == [("q0", "a0"), ("q1", "a1"), ("q2", "a2"), ("q9", "a9")]
+
+
+def test_compact_keep_last_trims_turns_and_events_per_user(tmp_path):
+    store = ConversationStore(os.path.join(tmp_path, "zene.db"))
+    for n in range(5):
+        store.append_turns("u1", exchange(n), timestamp=100.0 + n)
+        store.append_events("u1", [{"action": "response", "n": n, "timestamp": 100.0 + n}])
+    store.append_turns("u2", exchange(0), timestamp=100.0)
+    store.append_events("u2", [{"action": "response", "n": 0, "timestamp": 100.0}])
+
+    # u1 keeps 2 of 10 turns and 2 of 5 events; u2 is under the limit
+    assert store.compact(keep_last=2) == 8 + 3
+    assert store.load_last_turns("u1", 10) == exchange(4)
+    assert [event["n"] for event in store.load_events("u1")] == [3, 4]
+    assert store.load_last_turns("u2", 10) == exchange(0)
+    assert len(store.load_events("u2")) == 1
+
+
+def test_compact_older_than(tmp_path):
+    store = ConversationStore(os.path.join(tmp_path, "zene.db"))
+    store.append_turns("u1", exchange(0), timestamp=100.0)
+    store.append_turns("u1", exchange(1), timestamp=300.0)
+    store.append_events("u1", [{"action": "response", "timestamp": 100.0}])
+
+    assert store.compact(older_than=200.0) == 3
+    assert store.load_last_turns("u1") == exchange(1)
+    assert store.load_events("u1") == []
@@ -0,0 +1,35 @@
+"""
+Stub replies match the schema a request asks for.
+
+Usage:
+    python -m pytest test_stub_server.py
+"""
+import json
+
+from prompt_assembly import schema_system_prompt
+from prompts import Zene
+from stub_server import STUB_CLASSIFICATION, reply_content, schema_instance
+
+
+def test_classifier_schema_gets_the_classification():
+    request = {"response_format": {"type": "json_schema", "json_schema": Zene["response_schema"]}}
+    assert json.loads(reply_content(request)) == STUB_CLASSIFICATION
+    assert json.loads(reply_content({"messages": [{"role": "user", "content": "hi"}]})) == STUB_CLASSIFICATION
+
+
+def test_schema_in_system_prompt_shapes_the_reply():
+    template = {"response": "string", "thoughts": "string", "confidence": "number"}
+    request = {"messages": [{"role": "system", "content": schema_system_prompt("You are an aspirant",
+                                                                              json.dumps(template, indent=2))}],
+               "response_format": {"type": "json_object"}}
+    assert json.loads(reply_content(request)) == {"response": "stub", "thoughts": "stub", "confidence": 0}
+
+
+def test_schema_instance_honours_constraints():
+    schema = {"type": "object", "properties": {
+        "mood": {"type": "string", "enum": ["calm", "angry"]},
+        "scores": {"type": "array", "items": {"type": "integer", "minimum": 3}, "minItems": 2},
+        "note": {"type": ["null", "string"], "minLength": 6},
+        "kind": {"const": "reply"},
+    }}
+    assert schema_instance(schema) == {"mood": "calm", "scores": [3, 3], "note": "stub--", "kind": "reply"}
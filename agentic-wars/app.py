@@ -1,14 +1,15 @@
 import streamlit as st
 import os
-import dotenv
-import openai
 import json
-import time
 import logging
 import traceback
-from typing import List, Dict, Any, Optional
-import uuid
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+# Shared infrastructure (pooled OpenAI clients) lives in Zene-core
+import zene_core  # noqa: F401
+from clients import get_client, validate_api_key as check_api_key
+from engine import Agent, CONTEXT_MODES, DEFAULT_RESPONSE_SCHEMA, battle_speakers, iter_battle
+import telemetry
+from jobs import CANCELLED, FAILED, get_default_executor
 
 
 # Configure logging
@@ -18,8 +19,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("agentic-wars")
 
-# Load environment variables
-dotenv.load_dotenv()
+# Serves /metrics when ZENE_METRICS_PORT is set (once per process)
+telemetry.start_metrics_server()
 
 # Set page configuration
 st.set_page_config(
@@ -203,122 +204,15 @@ def mira_schema():
 })
 @st.cache_data
 def get_default_schema():
-    return json.dumps({
-        "response": "string",
-        "thoughts": "string",
-        "emotion": "string"
-    }, indent=2)
-
-class Agent:
-    def __init__(self, name: str, system_prompt: str, model: str, response_schema: Optional[Dict] = None):
-        self.name = name
-        self.base_system_prompt = system_prompt
-        self.model = model
-        self.response_schema = response_schema
-        self.messages_history = []
-        self.id = str(uuid.uuid4())[:8]  # Generate a unique ID for the agent
-        logger.info(f"Agent '{name}' (ID: {self.id}) initialized with model {model}")
-        
-    def get_system_prompt(self):
-        """Combine base system prompt with response schema instructions if provided"""
-        if self.response_schema:
-            schema_str = json.dumps(self.response_schema, indent=2)
-            return (f"{self.base_system_prompt}\n\n"
-                   f"IMPORTANT: You must structure your responses as JSON following this exact schema:\n"
-                   f"{schema_str}\n\n"
-                   f"Make sure your response is valid JSON. Do not include any text outside the JSON object.")
-        return self.base_system_prompt
-        
-    def initialize_chat(self):
-        """Reset chat history and initialize with system prompt"""
-        self.messages_history = [{"role": "system", "content": self.get_system_prompt()}]
-        logger.info(f"Initialized chat for agent {self.name}")
-        
-    def add_message(self, role: str, content: str):
-        """Add a message to the agent's conversation history"""
-        self.messages_history.append({"role": role, "content": content})
-        logger.debug(f"Added {role} message to {self.name}'s history")
-        
-    def get_message_for_display(self, message_content):
-        """Format message for display based on whether it's JSON or not"""
-        if self.response_schema:
-            try:
-                # Try to parse as JSON
-                parsed = json.loads(message_content)
-                return parsed
-            except json.JSONDecodeError as e:
-                # If not valid JSON, return as is
-                logger.warning(f"Invalid JSON response from {self.name}: {e}")
-                return {"error": "Invalid JSON response", "raw_content": message_content}
-        return message_content
-    
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
-    )    
-    def generate_response(self, client):
-        """Generate a response from the agent using the OpenAI API with retry logic"""
-        try:
-            logger.info(f"Generating response for {self.name} using {self.model}")
-            kwargs = {
-                "model": self.model,
-                "messages": self.messages_history,
-                "temperature": 0.7,
-                "timeout": 30,  # Add timeout to prevent hanging requests
-            }
-            
-            # Add response format if schema is provided
-            if self.response_schema:
-                kwargs["response_format"] = {"type": "json_object"}
-            
-            response = client.chat.completions.create(**kwargs)
-            
-            message = response.choices[0].message.content
-            self.add_message("assistant", message)
-            
-            # Validate JSON if using schema
-            if self.response_schema:
-                try:
-                    json.loads(message)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Model returned invalid JSON: {e}")
-                    # Return a valid JSON error message
-                    fallback_message = json.dumps({"error": "Model returned invalid JSON response", 
-                                                  "response": "I'm sorry, I encountered an error in my formatting. Let me try again with a proper response."})
-                    self.messages_history[-1]["content"] = fallback_message
-                    return fallback_message
-                    
-            return message
-        except openai.RateLimitError as e:
-            logger.error(f"Rate limit exceeded: {e}")
-            raise
-        except openai.APITimeoutError as e:
-            logger.error(f"API timeout: {e}")
-            raise
-        except openai.APIConnectionError as e:
-            logger.error(f"API connection error: {e}")
-            raise
-        except Exception as e:
-            error_msg = f"Error generating response: {str(e)}"
-            logger.error(f"{error_msg}\n{traceback.format_exc()}")
-            # Return a valid error message in the expected format
-            if self.response_schema:
-                return json.dumps({"error": error_msg, "response": "I encountered an error. Please try again."})
-            return error_msg
+    return json.dumps(DEFAULT_RESPONSE_SCHEMA, indent=2)
 
 def validate_api_key(api_key):
     """Validate the OpenAI API key by making a simple request"""
     if not api_key or api_key.strip() == "":
         return False, "API key cannot be empty"
     
-    try:
-        client = openai.OpenAI(api_key=api_key)
-        models = client.models.list()
-        return True, "API key is valid"
-    except Exception as e:
-        logger.error(f"API key validation failed: {e}")
-        return False, f"Invalid API key: {str(e)}"
+    # Cached by key hash, so reruns do not call the API again
+    return check_api_key(api_key=api_key)
 
 def display_message(agent_name, message_content, agent_id, response_schema=None):
     """Display a message in the chat interface"""
@@ -347,110 +241,55 @@ def display_message(agent_name, message_content, agent_id, response_schema=None)
         with st.chat_message(agent_name, avatar=f"{'🔵' if agent_id == st.session_state.agent1.id else '🔴'}"):
             st.markdown(message_content)
 
-def extract_main_content(message_content, response_schema):
-    """Extract the main content/response from a JSON response"""
-    if not response_schema:
-        return message_content
-    
-    try:
-        message_obj = json.loads(message_content)
-        # Look for common response fields
-        for key in ["response", "message", "content", "answer"]:
-            if key in message_obj:
-                return message_obj[key]
-        # If no standard response field found, return the first value
-        return next(iter(message_obj.values()))
-    except (json.JSONDecodeError, StopIteration):
-        logger.warning(f"Failed to extract main content from: {message_content[:100]}...")
-        return message_content
+def start_conversation(agent1, agent2, client, threshold, context_mode="incremental", window=8):
+    """Run the conversation on the background executor and return the job id"""
+    # Fresh copies per battle: a stopped battle may still be finishing a call on its agents
+    job = get_default_executor().submit(iter_battle, agent1.copy(), agent2.copy(), client, threshold, context_mode,
+                                        window, kind="battle")
+    logger.info(f"Started battle {job.id} ({context_mode})")
+    return job.id
+
+def display_log(conversation_log):
+    """Display the turns of a conversation log"""
+    for entry in conversation_log:
+        speaker = st.session_state.agent1 if entry["agent_id"] == st.session_state.agent1.id else st.session_state.agent2
+        display_message(entry["agent"], entry["message"], entry["agent_id"], speaker.response_schema)
 
-def run_conversation(agent1, agent2, client, threshold):
-    """Run the conversation between two agents"""
-    conversation_log = []
-    full_conversation_text = ""  # Track the full conversation as text
+@st.fragment(run_every=1.0)
+def show_running_conversation():
+    """Poll the running battle, displaying each turn as soon as it is generated"""
+    executor = get_default_executor()
+    job = executor.get(st.session_state.battle_job)
+    if job is None:
+        # Expired while the session was away
+        st.session_state.battle_job = None
+        st.rerun()
     
-    # Initialize both agents
-    agent1.initialize_chat()
-    agent2.initialize_chat()
+    conversation_log = job.events_since(0)
+    display_log(conversation_log)
     
-    try:
-        # First message from agent1 to start the conversation
-        with st.spinner(f"{agent1.name} is thinking..."):
-            agent1_response = agent1.generate_response(client)
-        
-        conversation_log.append({"agent": agent1.name, "message": agent1_response, "agent_id": agent1.id})
-        
-        # Extract the main content if using schema
-        main_content = extract_main_content(agent1_response, agent1.response_schema)
-        
-        # Update the full conversation text
-        full_conversation_text += f"{agent1.name}: {main_content}\n\n"
-        
-        # Pass the full conversation to agent2 instead of just the last message
-        agent2.add_message("user", full_conversation_text)
-        
-        # Display the message
-        display_message(agent1.name, agent1_response, agent1.id, agent1.response_schema)
-        
-        # Run the conversation for the specified number of turns
-        for i in range(threshold - 1):
-            # Add progress indicator
-            progress_text = f"Conversation progress: {i+1}/{threshold-1} rounds"
-            progress_bar = st.progress(0)
-            progress_bar.progress((i+1)/(threshold-1))
-            st.text(progress_text)
-            
-            # Agent 2's turn
-            with st.spinner(f"{agent2.name} is thinking..."):
-                agent2_response = agent2.generate_response(client)
-            
-            conversation_log.append({"agent": agent2.name, "message": agent2_response, "agent_id": agent2.id})
-            
-            # Extract the main content if using schema
-            main_content = extract_main_content(agent2_response, agent2.response_schema)
-            
-            # Update the full conversation text
-            full_conversation_text += f"{agent2.name}: {main_content}\n\n"
-            
-            # Pass the full conversation to agent1
-            agent1.add_message("user", full_conversation_text)
-            
-            # Display the message
-            display_message(agent2.name, agent2_response, agent2.id, agent2.response_schema)
-            
-            # If this is the last turn, break after agent2's response
-            if i == threshold - 2:
-                break
-            
-            # Agent 1's turn
-            with st.spinner(f"{agent1.name} is thinking..."):
-                agent1_response = agent1.generate_response(client)
-            
-            conversation_log.append({"agent": agent1.name, "message": agent1_response, "agent_id": agent1.id})
-            
-            # Extract the main content if using schema
-            main_content = extract_main_content(agent1_response, agent1.response_schema)
-            
-            # Update the full conversation text
-            full_conversation_text += f"{agent1.name}: {main_content}\n\n"
-            
-            # Pass the full conversation to agent2
-            agent2.add_message("user", full_conversation_text)
-            
-            # Display the message
-            display_message(agent1.name, agent1_response, agent1.id, agent1.response_schema)
-            
-            # Update progress
-            progress_bar.progress((i+2)/(threshold-1))
-            
-        # Clear progress bar when done
-        st.empty()
-        
-    except Exception as e:
-        logger.error(f"Error in conversation: {e}\n{traceback.format_exc()}")
-        st.error(f"Error during conversation: {str(e)}")
+    if not job.done:
+        speakers = battle_speakers(st.session_state.agent1, st.session_state.agent2, st.session_state.threshold)
+        st.progress(min(len(conversation_log) / len(speakers), 1.0))
+        if len(conversation_log) < len(speakers):
+            st.text(f"{speakers[len(conversation_log)].name} is thinking... "
+                    f"({len(conversation_log)}/{len(speakers)} messages)")
+        if st.button("⏹️ Stop Conversation", key="stop_button"):
+            job.cancel()
+        return
     
-    return conversation_log
+    # Collect the finished battle; the turns completed before an error are kept
+    executor.forget(job.id)
+    st.session_state.battle_job = None
+    st.session_state.conversation_log = list(conversation_log)
+    st.session_state.battle_status = job.status
+    if job.status == FAILED:
+        st.session_state.battle_error = f"Error during conversation: {str(job.error)}"
+    
+    prompt_tokens = [entry["prompt_tokens"] or 0 for entry in conversation_log]
+    logger.info(f"Conversation ({conversation_log[0]['context_mode'] if conversation_log else '-'}) used "
+                f"{sum(prompt_tokens)} prompt tokens, per turn: {prompt_tokens}")
+    st.rerun()
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -468,6 +307,9 @@ def initialize_session_state():
     
     if 'api_key_valid' not in st.session_state:
         st.session_state.api_key_valid = False
+    
+    if 'battle_job' not in st.session_state:
+        st.session_state.battle_job = None
 
 def main():
     try:
@@ -493,7 +335,6 @@ def main():
                     is_valid, message = validate_api_key(api_key)
                     if is_valid:
                         st.success("✅ API key from environment is valid")
-                        client = openai.OpenAI(api_key=api_key)
                         st.session_state.api_key_valid = True
                     else:
                         st.error(f"❌ {message}")
@@ -504,7 +345,6 @@ def main():
                     is_valid, message = validate_api_key(api_key)
                     if is_valid:
                         st.success("✅ API key is valid")
-                        client = openai.OpenAI(api_key=api_key)
                         st.session_state.api_key_valid = True
                     else:
                         st.error(f"❌ {message}")
@@ -518,7 +358,8 @@ def main():
                     st.session_state.api_key_valid = False
             
             if st.session_state.api_key_valid:
-                client = openai.OpenAI(api_key=api_key)
+                # The one pooled client for this key, shared across reruns and sessions
+                client = get_client(api_key=api_key)
                 
                 st.header("📊 Metrics")
                 st.metric("Current User", "🧙‍♂️ SnowBlaze 🧙‍♂️")
@@ -526,6 +367,10 @@ def main():
                 
                 st.header("🔄 Reset")
                 if st.button("Reset Conversation", use_container_width=True):
+                    running = get_default_executor().get(st.session_state.battle_job)
+                    if running:
+                        running.cancel()
+                    st.session_state.battle_job = None
                     st.session_state.conversation_started = False
                     st.session_state.conversation_log = []
                     st.rerun()
@@ -720,6 +565,19 @@ def main():
                 st.markdown(f"Agent 1 messages: {threshold}")
                 st.markdown(f"Agent 2 messages: {threshold - 1}")
             
+            context_col1, context_col2 = st.columns([3, 1])
+            
+            with context_col1:
+                context_mode = st.selectbox("Context Mode", CONTEXT_MODES, index=0,
+                                         help="incremental: send only the new opponent message; "
+                                              "window: also keep only the last messages of history; "
+                                              "full: resend the whole transcript every turn")
+            
+            with context_col2:
+                context_window = st.number_input("History Window", min_value=2, max_value=40, value=8,
+                                              disabled=context_mode != "window",
+                                              help="Messages kept per agent in window mode")
+            
             # Initialize the agents
             init_disabled = False
             
@@ -744,6 +602,8 @@ def main():
                     
                     st.success(f"✅ Agents {agent1_name} and {agent2_name} are ready for conversation!")
                     st.session_state.threshold = threshold
+                    st.session_state.context_mode = context_mode
+                    st.session_state.context_window = context_window
                 except Exception as e:
                     logger.error(f"Error initializing agents: {e}\n{traceback.format_exc()}")
                     st.error(f"Error initializing agents: {str(e)}")
@@ -786,27 +646,59 @@ def main():
                                help="Begin the conversation between the two agents"):
                         try:
                             st.session_state.conversation_started = True
+                            st.session_state.conversation_log = []
                             
-                            # Start conversation with a topic if provided
-
-                            # Run the conversation
-                            with st.spinner("Starting conversation..."):
-                                st.session_state.conversation_log = run_conversation(
-                                    st.session_state.agent1,
-                                    st.session_state.agent2,
-                                    client,
-                                    st.session_state.threshold
-                                )
-                            
-                            # Display completion message
-                            st.success("✅ Conversation completed!")
+                            # Run the conversation in the background; reruns and other sessions do not block it
+                            st.session_state.battle_job = start_conversation(
+                                st.session_state.agent1,
+                                st.session_state.agent2,
+                                client,
+                                st.session_state.threshold,
+                                st.session_state.get("context_mode", "incremental"),
+                                st.session_state.get("context_window", 8)
+                            )
                         except Exception as e:
                             logger.error(f"Error in conversation: {e}\n{traceback.format_exc()}")
                             st.error(f"Error starting conversation: {str(e)}")
                             st.session_state.conversation_started = False
             
+            # Follow the running battle, or show the finished one
+            if st.session_state.battle_job:
+                show_running_conversation()
+            elif st.session_state.conversation_started:
+                display_log(st.session_state.conversation_log)
+                if "battle_error" in st.session_state:
+                    st.error(st.session_state.pop("battle_error"))
+                elif st.session_state.get("battle_status") == CANCELLED:
+                    st.warning(f"⏹️ Conversation stopped after {len(st.session_state.conversation_log)} messages")
+                else:
+                    st.success("✅ Conversation completed!")
+            
             # Display download button if conversation is complete
-            if st.session_state.conversation_started and st.session_state.conversation_log:
+            if st.session_state.conversation_started and st.session_state.conversation_log and not st.session_state.battle_job:
+                # Per-turn prompt tokens show how the context mode scales with turns
+                prompt_tokens = [entry.get("prompt_tokens") or 0 for entry in st.session_state.conversation_log]
+                token_col1, token_col2 = st.columns([3, 1])
+                with token_col1:
+                    st.markdown("#### Prompt Tokens per Turn")
+                    st.line_chart(prompt_tokens)
+                with token_col2:
+                    st.metric("Context Mode", st.session_state.conversation_log[0].get("context_mode", "full"))
+                    st.metric("Total Prompt Tokens", f"{sum(prompt_tokens):,}")
+                    st.metric("Last Turn Prompt Tokens", f"{prompt_tokens[-1]:,}")
+                    cached = sum(entry.get("cached_tokens") or 0 for entry in st.session_state.conversation_log)
+                    st.metric("Cached Prompt Tokens", f"{cached:,}",
+                              help="Prompt tokens served from OpenAI's prompt cache")
+                    
+                    # Schema validation: responses that failed the schema and how many one repair request fixed
+                    checked = [entry for entry in st.session_state.conversation_log if "schema_errors" in entry]
+                    invalid = [entry for entry in checked if entry["schema_errors"]]
+                    if checked:
+                        repaired = sum(1 for entry in invalid if entry["repaired"])
+                        st.metric("Schema Repair Rate", f"{len(invalid) / len(checked):.0%}",
+                                  help=f"{repaired}/{len(invalid)} invalid responses repaired")
+                        st.metric("Repair Latency", f"{sum(e['repair_seconds'] for e in invalid):.2f}s")
+                
                 # Option to download the conversation
                 col1, col2, col3 = st.columns([1, 2, 1])
                 
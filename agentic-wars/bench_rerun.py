@@ -0,0 +1,61 @@
+"""
+Benchmark the sidebar work of one Streamlit rerun: API key validation and
+client setup, before and after caching validations by key hash.
+
+Usage:
+    python bench_rerun.py --reruns 50 --latency 0.15
+"""
+import argparse
+import logging
+import statistics
+import time
+
+import openai
+
+# Shared infrastructure (pooled OpenAI clients, stub server) lives in Zene-core
+import zene_core  # noqa: F401
+from clients import get_client, validate_api_key
+from stub_server import start_stub_server
+
+
+def uncached_rerun(api_key: str, base_url: str):
+    """Sidebar work as it was: a fresh client and models.list() on every rerun, then another client."""
+    openai.OpenAI(api_key=api_key, base_url=base_url).models.list()
+    return openai.OpenAI(api_key=api_key, base_url=base_url)
+
+
+def cached_rerun(api_key: str, base_url: str):
+    """Sidebar work now: a cached validation and the pooled client."""
+    is_valid, message = validate_api_key(api_key, base_url)
+    return get_client(api_key, base_url)
+
+
+def measure(rerun, reruns: int, api_key: str, base_url: str):
+    """Return per-rerun latencies in ms."""
+    latencies = []
+    for _ in range(reruns):
+        start_time = time.perf_counter()
+        rerun(api_key, base_url)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=50, help="Number of simulated reruns")
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated models.list() latency in seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    server, base_url = start_stub_server(latency=args.latency)
+    try:
+        for label, rerun in (("uncached", uncached_rerun), ("cached", cached_rerun)):
+            latencies = measure(rerun, args.reruns, "sk-bench", base_url)
+            print(f"{label:9s} first={latencies[0]:8.2f} ms  median={statistics.median(latencies):8.2f} ms  "
+                  f"p95={sorted(latencies)[int(0.95 * (len(latencies) - 1))]:8.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
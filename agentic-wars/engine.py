@@ -0,0 +1,346 @@
+"""
+Battle engine for agentic-wars, independent of the Streamlit UI.
+
+The app and the headless runner (runner.py) both drive battles through
+iter_battle(), which yields one log entry per turn.
+"""
+import copy
+import json
+import logging
+import time
+import traceback
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import openai
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from validation import compile_schema, response_format_for, validate_response
+
+# Shared infrastructure (prompt assembly, telemetry) lives in Zene-core
+import zene_core  # noqa: F401
+from prompt_assembly import cached_tokens, schema_system_prompt, static_message
+import telemetry
+
+logger = logging.getLogger("agentic-wars")
+
+# Default response schema for the aspirant agent
+DEFAULT_RESPONSE_SCHEMA = {
+    "response": "string",
+    "thoughts": "string",
+    "emotion": "string"
+}
+
+# How each agent sees the opponent's turns:
+#   full        - the whole transcript so far is appended every turn (prompt grows quadratically)
+#   incremental - only the new opponent message is appended (prompt grows linearly)
+#   window      - only the new opponent message, keeping the last N history messages (prompt is bounded)
+CONTEXT_MODES = ["incremental", "window", "full"]
+
+# Repair requests carry only the broken response and its errors, not the conversation
+REPAIR_PROMPT = ("You fix JSON responses that do not match their schema. Reply with the corrected JSON "
+                 "object only, keeping the original content wherever it is valid.")
+
+class Agent:
+    def __init__(self, name: str, system_prompt: str, model: str, response_schema: Optional[Dict] = None):
+        self.name = name
+        self.base_system_prompt = system_prompt
+        self.model = model
+        self.response_schema = response_schema
+        # Serialized once so the system prompt is byte-identical on every battle
+        self.schema_json = json.dumps(response_schema, indent=2) if response_schema else None
+        self.messages_history = []
+        self.last_usage = {}
+        # Compile the schema once; every response is checked against it
+        self.validator = compile_schema(response_schema) if response_schema else None
+        self.response_format = response_format_for(response_schema)
+        self.last_validation = {}
+        self.validation_stats = {"responses": 0, "invalid": 0, "repaired": 0, "repair_failed": 0,
+                                 "validation_seconds": 0.0, "repair_seconds": 0.0}
+        self.id = str(uuid.uuid4())[:8]  # Generate a unique ID for the agent
+        logger.info(f"Agent '{name}' (ID: {self.id}) initialized with model {model}")
+        
+    def get_system_prompt(self):
+        """Combine base system prompt with response schema instructions if provided"""
+        if self.schema_json:
+            return schema_system_prompt(self.base_system_prompt, self.schema_json)
+        return self.base_system_prompt
+        
+    def initialize_chat(self):
+        """Reset chat history and initialize with system prompt"""
+        self.messages_history = [static_message("system", self.get_system_prompt())]
+        self.last_usage = {}
+        logger.info(f"Initialized chat for agent {self.name}")
+        
+    def copy(self):
+        """
+        Same agent (configuration, compiled schema and id) with its own chat history and stats.
+        
+        A battle runs on copies, so a cancelled battle still finishing its
+        in-flight call never writes into the agents of the next one.
+        """
+        agent = copy.copy(self)
+        agent.messages_history = []
+        agent.last_usage = {}
+        agent.last_validation = {}
+        agent.validation_stats = {name: type(value)() for name, value in self.validation_stats.items()}
+        return agent
+        
+    def add_message(self, role: str, content: str):
+        """Add a message to the agent's conversation history"""
+        self.messages_history.append({"role": role, "content": content})
+        logger.debug(f"Added {role} message to {self.name}'s history")
+
+    def trim_history(self, window: int):
+        """
+        Keep the system prompt and at most the last `window` messages.
+        
+        Once the window is exceeded the history drops back to half of it, so the
+        prompt prefix stays unchanged (and cacheable) for several turns between trims.
+        """
+        if len(self.messages_history) > window + 1:
+            keep = max(window // 2, 1)
+            self.messages_history = self.messages_history[:1] + self.messages_history[-keep:]
+        
+    def get_message_for_display(self, message_content):
+        """Format message for display based on whether it's JSON or not"""
+        if self.response_schema:
+            try:
+                # Try to parse as JSON
+                parsed = json.loads(message_content)
+                return parsed
+            except json.JSONDecodeError as e:
+                # If not valid JSON, return as is
+                logger.warning(f"Invalid JSON response from {self.name}: {e}")
+                return {"error": "Invalid JSON response", "raw_content": message_content}
+        return message_content
+    
+    def _add_usage(self, response):
+        """Accumulate the token usage of a completion into last_usage"""
+        if response.usage:
+            self.last_usage["prompt_tokens"] = self.last_usage.get("prompt_tokens", 0) + response.usage.prompt_tokens
+            self.last_usage["completion_tokens"] = (self.last_usage.get("completion_tokens", 0)
+                                                    + response.usage.completion_tokens)
+            self.last_usage["cached_tokens"] = self.last_usage.get("cached_tokens", 0) + cached_tokens(response.usage)
+    
+    def validate_or_repair(self, client, message):
+        """Check a response against the compiled schema and make one targeted repair request if it fails"""
+        start_time = time.perf_counter()
+        errors = validate_response(self.validator, message)
+        self.validation_stats["validation_seconds"] += time.perf_counter() - start_time
+        self.validation_stats["responses"] += 1
+        self.last_validation = {"errors": errors, "repaired": False, "repair_seconds": 0.0}
+        if not errors:
+            return message
+        
+        self.validation_stats["invalid"] += 1
+        logger.warning(f"Response from {self.name} does not match its schema: {errors}")
+        start_time = time.perf_counter()
+        try:
+            kwargs = {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": REPAIR_PROMPT},
+                    {"role": "user", "content": "Errors:\n- " + "\n- ".join(errors) + f"\n\nResponse:\n{message}"},
+                ],
+                "temperature": 0.0,
+                "timeout": 30,
+                "response_format": self.response_format,
+            }
+            # Own span, so the repair request is not counted as a retry of the turn
+            with telemetry.span("agentic_wars.schema_repair", **{telemetry.MODEL: self.model,
+                                                                 "zene.agent": self.name}):
+                response = client.chat.completions.create(**kwargs)
+            self._add_usage(response)
+            repaired = response.choices[0].message.content
+            repair_errors = validate_response(self.validator, repaired)
+        except openai.OpenAIError as e:
+            repair_errors = [f"repair request failed: {e}"]
+        repair_seconds = time.perf_counter() - start_time
+        self.validation_stats["repair_seconds"] += repair_seconds
+        self.last_validation["repair_seconds"] = repair_seconds
+        
+        if not repair_errors:
+            self.validation_stats["repaired"] += 1
+            self.last_validation["repaired"] = True
+            return repaired
+        
+        self.validation_stats["repair_failed"] += 1
+        logger.error(f"Repair of {self.name}'s response failed: {repair_errors}")
+        # Return a valid JSON error message
+        return json.dumps({"error": "Model returned a response that does not match the schema",
+                           "response": "I'm sorry, I encountered an error in my formatting. Let me try again with a proper response."})
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+    )    
+    def generate_response(self, client):
+        """Generate a response from the agent using the OpenAI API with retry logic"""
+        try:
+            logger.info(f"Generating response for {self.name} using {self.model}")
+            kwargs = {
+                "model": self.model,
+                "messages": self.messages_history,
+                "temperature": 0.7,
+                "timeout": 30,  # Add timeout to prevent hanging requests
+            }
+            
+            # Add response format if schema is provided (strict json_schema for full JSON Schemas)
+            if self.response_format:
+                kwargs["response_format"] = self.response_format
+            
+            response = client.chat.completions.create(**kwargs)
+            self.last_usage = {}
+            self._add_usage(response)
+            
+            message = response.choices[0].message.content
+            
+            # Validate against the schema if using one, repairing once on failure
+            if self.validator:
+                message = self.validate_or_repair(client, message)
+            
+            self.add_message("assistant", message)
+            return message
+        except openai.RateLimitError as e:
+            logger.error(f"Rate limit exceeded: {e}")
+            raise
+        except openai.APITimeoutError as e:
+            logger.error(f"API timeout: {e}")
+            raise
+        except openai.APIConnectionError as e:
+            logger.error(f"API connection error: {e}")
+            raise
+        except Exception as e:
+            error_msg = f"Error generating response: {str(e)}"
+            logger.error(f"{error_msg}\n{traceback.format_exc()}")
+            # Return a valid error message in the expected format
+            if self.response_schema:
+                return json.dumps({"error": error_msg, "response": "I encountered an error. Please try again."})
+            return error_msg
+
+def extract_main_content(message_content, response_schema):
+    """Extract the main content/response from a JSON response"""
+    if not response_schema:
+        return message_content
+    
+    try:
+        message_obj = json.loads(message_content)
+        # Look for common response fields
+        for key in ["response", "message", "content", "answer"]:
+            if key in message_obj:
+                return message_obj[key]
+        # If no standard response field found, return the first value
+        return next(iter(message_obj.values()))
+    except (json.JSONDecodeError, StopIteration):
+        logger.warning(f"Failed to extract main content from: {message_content[:100]}...")
+        return message_content
+
+def battle_speakers(agent1, agent2, threshold: int) -> List["Agent"]:
+    """Order in which the agents speak: agent1 opens, then the agents alternate, ending with agent2"""
+    speakers = [agent1]
+    for i in range(threshold - 1):
+        speakers.append(agent2)
+        if i < threshold - 2:
+            speakers.append(agent1)
+    return speakers
+
+def iter_battle(agent1, agent2, client, threshold: int, context_mode: str = "incremental",
+                window: int = 8) -> Iterator[Dict[str, Any]]:
+    """
+    Run a conversation between two agents, yielding a log entry after each turn.
+    
+    Args:
+        agent1: Agent that opens the conversation
+        agent2: Agent that answers
+        client: OpenAI client used for both agents
+        threshold: Number of conversation rounds
+        context_mode: One of CONTEXT_MODES
+        window: Messages kept per agent in window mode
+    
+    Yields:
+        Dict with the agent, raw message, token usage and latency of the turn
+    """
+    if context_mode not in CONTEXT_MODES:
+        raise ValueError(f"Unknown context mode: {context_mode}")
+    
+    transcript = []  # Track the conversation as text, one entry per turn
+    
+    # Initialize both agents
+    agent1.initialize_chat()
+    agent2.initialize_chat()
+    
+    for speaker in battle_speakers(agent1, agent2, threshold):
+        listener = agent2 if speaker is agent1 else agent1
+        if context_mode == "window":
+            speaker.trim_history(window)
+        
+        start_time = time.perf_counter()
+        with telemetry.span(telemetry.AGENT_TURN, **{telemetry.MODEL: speaker.model, "zene.agent": speaker.name,
+                                                     "zene.context_mode": context_mode}) as trace:
+            response = speaker.generate_response(client)
+            trace.set_attributes(**{
+                telemetry.INPUT_TOKENS: speaker.last_usage.get("prompt_tokens", 0),
+                telemetry.OUTPUT_TOKENS: speaker.last_usage.get("completion_tokens", 0),
+                telemetry.CACHED_TOKENS: speaker.last_usage.get("cached_tokens", 0),
+            })
+        entry = {
+            "agent": speaker.name,
+            "message": response,
+            "agent_id": speaker.id,
+            "prompt_tokens": speaker.last_usage.get("prompt_tokens"),
+            "completion_tokens": speaker.last_usage.get("completion_tokens"),
+            "cached_tokens": speaker.last_usage.get("cached_tokens"),
+            "latency_seconds": time.perf_counter() - start_time,
+            "context_mode": context_mode,
+        }
+        if speaker.validator:
+            entry["schema_errors"] = speaker.last_validation.get("errors", [])
+            entry["repaired"] = speaker.last_validation.get("repaired", False)
+            entry["repair_seconds"] = speaker.last_validation.get("repair_seconds", 0.0)
+            entry["valid_json"] = not entry["schema_errors"] or entry["repaired"]
+        
+        # Extract the main content if using schema
+        main_content = extract_main_content(response, speaker.response_schema)
+        turn_text = f"{speaker.name}: {main_content}\n\n"
+        transcript.append(turn_text)
+        
+        if context_mode == "full":
+            # Legacy behaviour: pass the full conversation instead of just the last message
+            listener.add_message("user", "".join(transcript))
+        else:
+            listener.add_message("user", turn_text)
+        
+        yield entry
+
+def run_battle(agent1, agent2, client, threshold: int, context_mode: str = "incremental",
+               window: int = 8) -> Dict[str, Any]:
+    """
+    Run a whole battle and summarize it.
+    
+    Errors end the battle early; the turns completed so far are kept.
+    
+    Returns:
+        Dict with the turns, token totals, latency and error (if any)
+    """
+    start_time = time.perf_counter()
+    turns, error = [], None
+    try:
+        for entry in iter_battle(agent1, agent2, client, threshold, context_mode, window):
+            turns.append(entry)
+    except Exception as e:
+        logger.error(f"Error in conversation: {e}\n{traceback.format_exc()}")
+        error = str(e)
+    
+    return {
+        "turns": turns,
+        "prompt_tokens": sum(entry["prompt_tokens"] or 0 for entry in turns),
+        "completion_tokens": sum(entry["completion_tokens"] or 0 for entry in turns),
+        "cached_tokens": sum(entry["cached_tokens"] or 0 for entry in turns),
+        "invalid_responses": sum(1 for entry in turns if entry.get("schema_errors")),
+        "repaired_responses": sum(1 for entry in turns if entry.get("repaired")),
+        "unrepaired_responses": sum(1 for entry in turns if entry.get("valid_json") is False),
+        "repair_seconds": sum(entry.get("repair_seconds", 0.0) for entry in turns),
+        "latency_seconds": time.perf_counter() - start_time,
+        "error": error,
+    }
@@ -0,0 +1,209 @@
+"""
+Headless agentic-wars battles for regression-testing the Zene classifier.
+
+Usage:
+    python runner.py battles.jsonl --models gpt-4o-mini gpt-4o --repeats 50 --workers 16
+    python runner.py battles.jsonl --classifier-prompts prompt2.txt prompt2_v2.txt \
+        --schemas schema.json none --context-modes incremental full --threshold 10
+
+Every combination of aspirant prompt, classifier prompt, classifier model,
+classifier schema and context mode is run --repeats times. Each battle is
+written to the output as one JSON line as soon as it finishes. Runs are
+resumable: battles already in the output file without an error are
+skipped, failed ones are run again, and the file is compacted to the last
+record of each battle, so every battle_id appears once.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import openai
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Shared infrastructure (pooled OpenAI clients) lives in Zene-core
+import zene_core  # noqa: F401
+from clients import get_client
+from ratelimit import BATCH
+from engine import Agent, CONTEXT_MODES, DEFAULT_RESPONSE_SCHEMA, run_battle
+import telemetry
+
+logger = logging.getLogger("agentic-wars")
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def _read_schema(path: str) -> Optional[Dict[str, Any]]:
+    """Load a response schema file; "none" disables the schema."""
+    if path == "none":
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def battle_matrix(aspirant_prompts: List[str], classifier_prompts: List[str], models: List[str],
+                  schemas: List[str], context_modes: List[str], repeats: int) -> Iterator[Dict[str, Any]]:
+    """
+    Expand the variant lists into battle configurations.
+
+    Yields:
+        Battle configs with a stable battle_id derived from the variants and repeat
+    """
+    for aspirant, classifier, model, schema, mode in itertools.product(
+            aspirant_prompts, classifier_prompts, models, schemas, context_modes):
+        for repeat in range(repeats):
+            config = {
+                "aspirant_prompt": aspirant,
+                "classifier_prompt": classifier,
+                "model": model,
+                "schema": schema,
+                "context_mode": mode,
+                "repeat": repeat,
+            }
+            config["battle_id"] = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+            yield config
+
+
+def _run_one(client: openai.OpenAI, config: Dict[str, Any], aspirant_model: str,
+             threshold: int, window: int) -> Dict[str, Any]:
+    """Run one battle: the aspirant (agent 1) against the classifier (agent 2)."""
+    aspirant = Agent("Aspirant", _read_text(config["aspirant_prompt"]), aspirant_model, DEFAULT_RESPONSE_SCHEMA)
+    classifier = Agent("Zene", _read_text(config["classifier_prompt"]), config["model"],
+                       _read_schema(config["schema"]))
+    result = run_battle(aspirant, classifier, client, threshold, config["context_mode"], window)
+    return {**config, "aspirant_model": aspirant_model, "threshold": threshold, **result}
+
+
+def compact_results(output_path: str) -> Set[str]:
+    """
+    Keep only the last record of each battle in the output file.
+
+    Retried battles append a new record after the failed one, and a crash
+    can leave a truncated last line; both are dropped, in two passes over
+    the file so memory holds only the battle ids.
+
+    Returns:
+        Ids of the battles whose last record has no error
+    """
+    if not os.path.exists(output_path):
+        return set()
+    last_line, succeeded = {}, {}
+    lines = 0
+    with open(output_path) as f:
+        for index, line in enumerate(f):
+            lines += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            last_line[record["battle_id"]] = index
+            succeeded[record["battle_id"]] = record.get("error") is None
+
+    if len(last_line) < lines:
+        kept = set(last_line.values())
+        with open(output_path) as f, open(output_path + ".tmp", "w") as out:
+            for index, line in enumerate(f):
+                if index in kept:
+                    out.write(line if line.endswith("\n") else line + "\n")
+        os.replace(output_path + ".tmp", output_path)
+        logger.info(f"Compacted {output_path}: dropped {lines - len(kept)} superseded or truncated lines")
+    return {battle_id for battle_id, ok in succeeded.items() if ok}
+
+
+def run_battles(configs: Iterator[Dict[str, Any]], output_path: str, aspirant_model: str = "gpt-4o-mini",
+                threshold: int = 5, window: int = 8, max_workers: int = 8,
+                client: Optional[openai.OpenAI] = None) -> Dict[str, int]:
+    """
+    Run battles concurrently and stream the results to a JSONL file.
+
+    Configs are pulled lazily, with at most 2 * max_workers battles queued at
+    a time, so very large sweeps stream through in constant memory.
+
+    Args:
+        configs: Battle configs from battle_matrix()
+        output_path: JSONL results file, appended to when resuming
+        aspirant_model: Model of the aspirant agent
+        threshold: Conversation rounds per battle
+        window: Messages kept per agent in window mode
+        max_workers: Maximum number of concurrent battles
+        client: Optional OpenAI client, defaults to the pooled batch-priority client
+
+    Returns:
+        Counts of finished, failed and skipped battles
+    """
+    client = client or get_client(priority=BATCH)
+    done = compact_results(output_path)
+    stats = {"finished": 0, "failed": 0, "skipped": 0}
+    start_time = time.time()
+
+    with open(output_path, "a") as out, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="battle") as executor:
+        def write(futures):
+            for future in futures:
+                result = future.result()
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                stats["failed" if result["error"] else "finished"] += 1
+
+        pending = set()
+        for config in configs:
+            if config["battle_id"] in done:
+                stats["skipped"] += 1
+                continue
+            pending.add(executor.submit(_run_one, client, config, aspirant_model, threshold, window))
+            if len(pending) >= 2 * max_workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+                if stats["finished"] and stats["finished"] % 100 == 0:
+                    elapsed = time.time() - start_time
+                    logger.info(f"Progress: {stats} ({stats['finished'] / elapsed:.2f} battles/s)")
+        write(pending)
+
+    # Retried battles were appended after their failed records
+    compact_results(output_path)
+    logger.info(f"Battles finished in {time.time() - start_time:.1f}s: {stats}")
+    return stats
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", help="JSONL results file, appended to when resuming")
+    parser.add_argument("--aspirant-prompts", nargs="+", default=[os.path.join(HERE, "prompt1.txt")],
+                        help="System prompt files for the aspirant agent")
+    parser.add_argument("--classifier-prompts", nargs="+", default=[os.path.join(HERE, "prompt2.txt")],
+                        help="System prompt files for the classifier agent")
+    parser.add_argument("--models", nargs="+", default=["gpt-4o-mini"], help="Classifier models")
+    parser.add_argument("--schemas", nargs="+", default=[os.path.join(HERE, "schema.json")],
+                        help="Classifier response schema files, or none")
+    parser.add_argument("--context-modes", nargs="+", choices=CONTEXT_MODES, default=["incremental"])
+    parser.add_argument("--aspirant-model", default="gpt-4o-mini", help="Model of the aspirant agent")
+    parser.add_argument("--threshold", type=int, default=5, help="Conversation rounds per battle")
+    parser.add_argument("--window", type=int, default=8, help="Messages kept per agent in window mode")
+    parser.add_argument("--repeats", type=int, default=1, help="Battles per variant combination")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent battles")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+    if args.metrics_port is not None:
+        telemetry.start_metrics_server(args.metrics_port)
+
+    configs = battle_matrix(args.aspirant_prompts, args.classifier_prompts, args.models,
+                            args.schemas, args.context_modes, args.repeats)
+    run_battles(configs, args.output, args.aspirant_model, args.threshold, args.window, args.workers)
+
+
+if __name__ == "__main__":
+    main()
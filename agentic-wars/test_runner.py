@@ -0,0 +1,51 @@
+"""
+Resumed runs retry failed battles and keep one record per battle.
+
+Usage:
+    python -m pytest test_runner.py
+"""
+import json
+import os
+
+import runner
+
+
+def read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_retries_failures_without_duplicates(tmp_path, monkeypatch):
+    output = os.path.join(tmp_path, "battles.jsonl")
+    configs = [{"battle_id": f"b{i}"} for i in range(4)]
+    attempts = {}
+
+    def run_one(client, config, aspirant_model, threshold, window):
+        attempts[config["battle_id"]] = attempts.get(config["battle_id"], 0) + 1
+        # b1 fails on its first run only
+        error = "timeout" if config["battle_id"] == "b1" and attempts["b1"] == 1 else None
+        return {**config, "attempt": attempts[config["battle_id"]], "error": error}
+
+    monkeypatch.setattr(runner, "_run_one", run_one)
+    assert runner.run_battles(iter(configs), output, client=object()) == {"finished": 3, "failed": 1, "skipped": 0}
+    assert runner.run_battles(iter(configs), output, client=object()) == {"finished": 1, "failed": 0, "skipped": 3}
+
+    records = read(output)
+    assert sorted(record["battle_id"] for record in records) == ["b0", "b1", "b2", "b3"]
+    assert all(record["error"] is None for record in records)
+    assert attempts == {"b0": 1, "b1": 2, "b2": 1, "b3": 1}
+
+
+def test_compact_keeps_last_record_and_drops_truncated_lines(tmp_path):
+    output = os.path.join(tmp_path, "battles.jsonl")
+    with open(output, "w") as f:
+        f.write(json.dumps({"battle_id": "a", "error": "boom"}) + "\n")
+        f.write(json.dumps({"battle_id": "b", "error": None}) + "\n")
+        f.write(json.dumps({"battle_id": "a", "error": None, "n": 2}) + "\n")
+        f.write('{"battle_id": "c", "err')
+
+    assert runner.compact_results(output) == {"a", "b"}
+    assert read(output) == [{"battle_id": "b", "error": None}, {"battle_id": "a", "error": None, "n": 2}]
+    # Already compact: nothing changes
+    assert runner.compact_results(output) == {"a", "b"}
+    assert len(read(output)) == 2
@@ -0,0 +1,153 @@
+"""
+Compiled response-schema validators for agentic-wars agents.
+
+Two schema forms are accepted:
+    - a field template like {"response": "string", "thoughts": "string"},
+      where every field is required and values name the expected type
+    - a JSON Schema, bare or wrapped as {"name": ..., "strict": ..., "schema": {...}}
+      like schema.json, which can also be sent as a strict json_schema
+      response format
+
+compile_schema() turns either form into a plain function once, so checking a
+response is a walk over the parsed object with no schema interpretation.
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+Validator = Callable[[Any], List[str]]
+
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+
+
+def json_schema_of(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return the JSON Schema inside a response schema, or None for field templates."""
+    if not isinstance(schema, dict):
+        return None
+    if isinstance(schema.get("schema"), dict) and "name" in schema:
+        return schema["schema"]
+    if schema.get("type") == "object" and isinstance(schema.get("properties"), dict):
+        return schema
+    return None
+
+
+def response_format_for(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Build the response_format for a response schema.
+
+    Full JSON Schemas use json_schema mode (strict when the schema asks for
+    it, as schema.json does); field templates fall back to json_object.
+    """
+    if schema is None:
+        return None
+    json_schema = json_schema_of(schema)
+    if json_schema is None:
+        return {"type": "json_object"}
+    if json_schema is schema:
+        schema = {"name": "response_schema", "schema": json_schema}
+    return {"type": "json_schema", "json_schema": schema}
+
+
+def _compile(schema: Dict[str, Any], path: str) -> Validator:
+    """Compile one JSON Schema node into a validator returning error messages."""
+    checks: List[Validator] = []
+
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[t] for t in types if t in _TYPE_CHECKS]
+        expected = " or ".join(types)
+
+        def check_type(value, type_checks=type_checks):
+            if type_checks and not any(check(value) for check in type_checks):
+                return [f"{path or 'response'} must be {expected}, got {type(value).__name__}"]
+            return []
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value):
+            if value not in allowed:
+                return [f"{path} must be one of {allowed}, got {value!r}"]
+            return []
+        checks.append(check_enum)
+
+    properties = {name: _compile(sub, f"{path}.{name}" if path else name)
+                  for name, sub in schema.get("properties", {}).items()}
+    required = [(name, schema.get("properties", {}).get(name, {}).get("type")) for name in schema.get("required", [])]
+    closed = schema.get("additionalProperties") is False
+    if properties or required or closed:
+        def check_object(value):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"missing required field {path + '.' if path else ''}{name}"
+                      + (f" ({expected})" if expected else "")
+                      for name, expected in required if name not in value]
+            for name, item in value.items():
+                validator = properties.get(name)
+                if validator is not None:
+                    errors.extend(validator(item))
+                elif closed:
+                    errors.append(f"unexpected field {path + '.' if path else ''}{name}")
+            return errors
+        checks.append(check_object)
+
+    if isinstance(schema.get("items"), dict):
+        item_validator = _compile(schema["items"], f"{path}[]")
+
+        def check_items(value):
+            if not isinstance(value, list):
+                return []
+            return [error for item in value for error in item_validator(item)]
+        checks.append(check_items)
+
+    def validate(value):
+        errors = []
+        for check in checks:
+            errors.extend(check(value))
+        return errors
+    return validate
+
+
+def _template_schema(template: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a field template into an equivalent JSON Schema (all fields required)."""
+    properties = {}
+    for name, expected in template.items():
+        if isinstance(expected, str) and expected in _TYPE_CHECKS:
+            properties[name] = {"type": expected}
+        elif isinstance(expected, dict):
+            properties[name] = _template_schema(expected)
+        else:
+            properties[name] = {}
+    return {"type": "object", "properties": properties, "required": list(template)}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile a response schema into a validator.
+
+    Args:
+        schema: Field template or JSON Schema (bare or wrapped)
+
+    Returns:
+        Function taking a parsed response and returning a list of errors,
+        empty when the response is valid
+    """
+    return _compile(json_schema_of(schema) or _template_schema(schema), "")
+
+
+def validate_response(validator: Validator, content: str) -> List[str]:
+    """Parse a raw response and validate it, returning the errors."""
+    try:
+        parsed = json.loads(content)
+    except (TypeError, json.JSONDecodeError) as e:
+        return [f"response is not valid JSON: {e}"]
+    return validator(parsed)
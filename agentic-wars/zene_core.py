@@ -0,0 +1,28 @@
+"""
+Makes the shared Zene-core modules (clients, ratelimit, jobs, telemetry,
+prompt_assembly, stub_server, ...) importable from agentic-wars.
+
+Zene-core is a directory of flat modules rather than an installed package,
+so importing this module puts it on sys.path once. Every agentic-wars
+module imports it before the shared modules:
+
+    import zene_core  # noqa: F401
+    from clients import get_client
+
+The checkout next to agentic-wars is used unless ZENE_CORE_PATH points
+elsewhere. Zene-core's dependencies are installed through
+agentic-wars/requirements.txt, which includes ../Zene-core/requirements.txt.
+"""
+import os
+import sys
+
+ZENE_CORE_PATH = os.path.abspath(
+    os.getenv("ZENE_CORE_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Zene-core")
+)
+
+if not os.path.isfile(os.path.join(ZENE_CORE_PATH, "clients.py")):
+    raise ImportError(f"Zene-core not found at {ZENE_CORE_PATH}; set ZENE_CORE_PATH to the Zene-core directory")
+
+# Appended, not prepended, so agentic-wars' own modules (app, engine, ...) win name clashes
+if ZENE_CORE_PATH not in sys.path:
+    sys.path.append(ZENE_CORE_PATH)